@@ -2,12 +2,13 @@ import threading
 import logging
 from flask import Flask, request, jsonify, Response
 import queue
+import Publisher
 
 
 
 class ApiServer:
 
-	def __init__(self, host, port, peers_provider, pending_provider, status_provider, start_call_fn, accept_fn, reject_fn, hangup_fn, trigger_discovery_fn=None, get_volume_fn=None, set_volume_fn=None, toggle_mute_fn=None, devices_provider=None, set_devices_fn=None, get_username_fn=None, set_username_fn=None, get_mic_level_fn=None, test_output_fn=None, get_selected_devices_fn=None, set_ui_state_fn=None, window_minimize_fn=None, window_maximize_fn=None, window_close_fn=None, window_resize_fn=None):
+	def __init__(self, host, port, peers_provider, pending_provider, status_provider, start_call_fn, accept_fn, reject_fn, hangup_fn, trigger_discovery_fn=None, get_volume_fn=None, set_volume_fn=None, toggle_mute_fn=None, devices_provider=None, set_devices_fn=None, get_username_fn=None, set_username_fn=None, get_mic_level_fn=None, test_output_fn=None, get_selected_devices_fn=None, set_ui_state_fn=None, window_minimize_fn=None, window_maximize_fn=None, window_close_fn=None, window_resize_fn=None, relay_status_fn=None, set_relay_fn=None, call_stats_fn=None, subscribe_mic_level_fn=None, unsubscribe_mic_level_fn=None, setup_stats_fn=None, cancel_call_fn=None, publish_window=Publisher.COALESCE_WINDOW):
 		self.host = host
 		self.port = port
 		self._thread = threading.Thread(target=self._run)
@@ -36,9 +37,17 @@ class ApiServer:
 		self._window_maximize = window_maximize_fn or (lambda: False)
 		self._window_close = window_close_fn or (lambda: False)
 		self._window_resize = window_resize_fn or (lambda *_: False)
+		self._relay_status = relay_status_fn or (lambda: {"hosting": False, "preferred": None, "elected": None})
+		self._set_relay = set_relay_fn or (lambda **_kwargs: (False, "Relay not supported"))
+		self._call_stats = call_stats_fn or (lambda: None)
+		self._setup_stats = setup_stats_fn or (lambda: {})
+		self._cancel_call = cancel_call_fn or (lambda _call_id=None: False)
+		self._subscribe_mic_level = subscribe_mic_level_fn
+		self._unsubscribe_mic_level = unsubscribe_mic_level_fn or (lambda _q: None)
+		# Peers e status só vão para o SSE quando mudam, com as rajadas de avisos juntadas em publish_window
+		self.peers_publisher = Publisher.Publisher(self._peers_provider, key="id", window=publish_window)
+		self.status_publisher = Publisher.Publisher(self._status_provider, window=publish_window)
 		self._register_routes()
-		self._peer_event_subs = []
-		self._status_event_subs = []
 
 	def _register_routes(self):
 		app = self._app
@@ -60,43 +69,17 @@ class ApiServer:
 
 		@app.get('/events/peers')
 		def peers_events():
-			# Filtra por rede se o parâmetro 'network' for fornecido
-			network_filter = request.args.get('network')
-			q = queue.Queue()
-			self._peer_event_subs.append(q)
-			def stream():
-				try:
-					while True:
-						data = self._peers_provider(network_filter) if network_filter else q.get()
-						yield f"data: {data}\n\n"
-				except GeneratorExit:
-					pass
-				finally:
-					try:
-						self._peer_event_subs.remove(q)
-					except Exception:
-						pass
-			return Response(stream(), mimetype='text/event-stream')
+			# Filtra por rede se o parâmetro 'network' for fornecido; deltas=1 recebe só as mudanças após o snapshot
+			network_filter = request.args.get('network') or None
+			deltas = request.args.get('deltas', '0') not in ('', '0')
+			q = self.peers_publisher.subscribe(network_filter, deltas=deltas)
+			return Response(self._event_stream(self.peers_publisher, q), mimetype='text/event-stream')
 		
 		@app.get('/events/status')
 		def status_events():
-			q = queue.Queue()
-			self._status_event_subs.append(q)
-			def stream():
-				try:
-					# Send initial state
-					yield f"data: {self.publish_status_update(q)}\n\n"
-					while True:
-						data = q.get()
-						yield f"data: {data}\n\n"
-				except GeneratorExit:
-					pass
-				finally:
-					try:
-						self._status_event_subs.remove(q)
-					except Exception:
-						pass
-			return Response(stream(), mimetype='text/event-stream')
+			# O primeiro evento é o estado atual
+			q = self.status_publisher.subscribe()
+			return Response(self._event_stream(self.status_publisher, q), mimetype='text/event-stream')
 
 		@app.post('/peers/discover')
 		def discover_peers():
@@ -110,19 +93,67 @@ class ApiServer:
 			control_port = int(data.get('control_port', 38020))
 			if not peer_ip:
 				return jsonify({"error": "Missing ip"}), 400
-			ok, info = self._start_call(peer_ip, control_port)
+			# Opções de mídia por chamada
+			options = {k: data[k] for k in ('codec', 'codec_rate', 'plc', 'fec_group', 'engine', 'frame_ms', 'dtx', 'relay', 'agc') if k in data}
+			# A discagem segue em segundo plano: a resposta traz o call_id e o progresso sai em /events/status
+			ok, info = self._start_call(peer_ip, control_port, **options)
 			if not ok:
 				logging.error("API /call failed: %s", info)
 				return jsonify({"error": info or "Call failed"}), 409
-			return jsonify(info)
+			return jsonify(info), 202
+
+		@app.post('/call/cancel')
+		def call_cancel():
+			data = request.get_json(silent=True) or {}
+			ok = self._cancel_call(data.get('call_id'))
+			if not ok:
+				return jsonify({"error": "No call being set up"}), 409
+			return jsonify({"ok": True})
+
+		@app.route('/call/cancel', methods=['OPTIONS'])
+		def call_cancel_options():
+			return ('', 204)
+
+		@app.get('/call/stats')
+		def call_stats():
+			# Perda, jitter, RTT, bitrate, atraso de reprodução e MOS da chamada atual
+			stats = self._call_stats()
+			if stats is None:
+				return jsonify({"error": "Not in call"}), 409
+			return jsonify(stats)
+
+		@app.get('/call/setup-latency')
+		def call_setup_latency():
+			# Histogramas de OFFER -> RINGING, OFFER -> ACCEPT, ACCEPT -> primeira mídia e total
+			return jsonify(self._setup_stats())
 
 		@app.route('/call', methods=['OPTIONS'])
 		def call_options():
 			return ('', 204)
 
+		@app.get('/relay')
+		def relay_get():
+			return jsonify(self._relay_status())
+
+		@app.post('/relay')
+		def relay_set():
+			# {"host": bool} liga/desliga o relay local; {"preferred": {"ip", "port"} | null} fixa a escolha do usuário
+			data = request.get_json(silent=True) or {}
+			options = {k: data[k] for k in ('host', 'preferred') if k in data}
+			ok, info = self._set_relay(**options)
+			if not ok:
+				return jsonify({"error": info or "Invalid relay payload"}), 400
+			return jsonify(info)
+
+		@app.route('/relay', methods=['OPTIONS'])
+		def relay_options():
+			return ('', 204)
+
 		@app.post('/accept')
 		def accept():
-			ok, info = self._accept()
+			# {"tid": ...} escolhe a oferta; sem ele atende a mais antiga
+			data = request.get_json(silent=True) or {}
+			ok, info = self._accept(data.get('tid'))
 			if not ok:
 				logging.error("API /accept failed: %s", info)
 				return jsonify({"error": info or "No pending call"}), 409
@@ -134,7 +165,8 @@ class ApiServer:
 
 		@app.post('/reject')
 		def reject():
-			ok = self._reject()
+			data = request.get_json(silent=True) or {}
+			ok = self._reject(data.get('tid'))
 			if not ok:
 				logging.error("API /reject failed: no pending call")
 				return jsonify({"error": "No pending call"}), 409
@@ -227,6 +259,34 @@ class ApiServer:
 			except Exception:
 				return jsonify({"level": 0})
 
+		@app.get('/events/mic-level')
+		def mic_level_events():
+			# Nível do microfone (RMS/pico) empurrado pelo medidor; ?input=<índice> escolhe o dispositivo fora de chamada
+			if self._subscribe_mic_level is None:
+				return jsonify({"error": "Mic level not supported"}), 404
+			inp = request.args.get('input')
+			try:
+				device = None if inp is None else int(inp)
+			except ValueError:
+				return jsonify({"error": "Invalid input device"}), 400
+			q = self._subscribe_mic_level(device)
+			def stream():
+				import json
+				try:
+					while True:
+						try:
+							data = q.get(timeout=5.0)
+						except queue.Empty:
+							# Comentário SSE: mantém a conexão e detecta clientes que saíram
+							yield ": keepalive\n\n"
+							continue
+						yield f"data: {json.dumps(data)}\n\n"
+				except GeneratorExit:
+					pass
+				finally:
+					self._unsubscribe_mic_level(q)
+			return Response(stream(), mimetype='text/event-stream')
+
 		@app.post('/test-output')
 		def test_output():
 			data = request.get_json(silent=True) or {}
@@ -276,29 +336,19 @@ class ApiServer:
 		# debug=False, use_reloader=False for thread mode
 		self._app.run(host=self.host, port=self.port, debug=False, use_reloader=False)
 
-	def publish_peers_update(self):
+	@staticmethod
+	def _event_stream(publisher, q):
 		try:
-			import json
-			payload = json.dumps(self._peers_provider())
-			for q in list(self._peer_event_subs):
-				try:
-					q.put(payload, block=False)
-				except Exception:
-					pass
-		except Exception:
+			while True:
+				data = q.get()
+				yield f"data: {data}\n\n"
+		except GeneratorExit:
 			pass
+		finally:
+			publisher.unsubscribe(q)
 
-	def publish_status_update(self, single_q=None):
-		try:
-			import json
-			payload = json.dumps(self._status_provider())
-			subs = [single_q] if single_q else list(self._status_event_subs)
-			for q in subs:
-				if not q: continue
-				try:
-					q.put(payload, block=False)
-				except Exception:
-					pass
-			return payload
-		except Exception:
-			return "{}"
+	def publish_peers_update(self):
+		self.peers_publisher.notify()
+
+	def publish_status_update(self):
+		self.status_publisher.notify()
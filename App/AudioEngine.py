@@ -0,0 +1,218 @@
+"""Contexto de áudio único do processo.
+
+Inicializar o PortAudio (pyaudio.PyAudio()) custa centenas de milissegundos no
+Windows, e enumerar dispositivos também. O AudioEngine mantém um contexto vivo
+durante toda a execução, guarda as informações dos dispositivos e reaproveita
+streams: ao devolver um stream ele só é parado, e o próximo pedido com os mesmos
+parâmetros o recebe de volta já aberto. Streams em modo callback passam por um
+despachante, então o callback pode trocar entre usos.
+"""
+import threading
+import time
+import logging
+
+try:
+	import pyaudio
+except ImportError:  # ambientes sem PortAudio ainda podem usar um backend injetado (ex: AudioIO.LoopbackAudio)
+	pyaudio = None
+
+PA_CONTINUE = 0  # pyaudio.paContinue
+PA_COMPLETE = 1  # pyaudio.paComplete
+PA_INT16 = 8  # pyaudio.paInt16
+MAX_IDLE_PER_KEY = 2
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared():
+	"""O engine do processo, criado no primeiro uso."""
+	global _shared
+	with _shared_lock:
+		if _shared is None:
+			_shared = AudioEngine()
+		return _shared
+
+
+class _Dispatcher:
+	"""Callback fixo registrado no PortAudio que repassa para o dono atual do stream."""
+
+	def __init__(self, frame_bytes, output):
+		self.target = None
+		self._silence = b"\x00" * frame_bytes if output else None
+
+	def __call__(self, in_data, frame_count, time_info, status):
+		target = self.target
+		if target is None:
+			return self._silence, PA_COMPLETE
+		return target(in_data, frame_count, time_info, status)
+
+
+class AudioEngine:
+
+	def __init__(self, backend=None):
+		# backend: objeto compatível com pyaudio.PyAudio; None cria o PortAudio real sob demanda
+		self._backend = backend
+		self._owns_backend = backend is None
+		self._lock = threading.RLock()
+		self._devices = None
+		self._default_host_api = None
+		self._idle = {}  # chave dos parâmetros -> [(stream, dispatcher)]
+		self._checked_out = {}  # id(stream) -> (chave, dispatcher)
+		self.init_ms = None
+		self.opened = 0
+		self.reused = 0
+
+	@property
+	def pa(self):
+		with self._lock:
+			if self._backend is None:
+				if pyaudio is None:
+					raise RuntimeError("PyAudio não está disponível")
+				start = time.perf_counter()
+				self._backend = pyaudio.PyAudio()
+				self.init_ms = (time.perf_counter() - start) * 1000.0
+				logging.info("PortAudio inicializado em %.0f ms", self.init_ms)
+			return self._backend
+
+	# ------ Dispositivos ------
+	def devices(self, refresh=False):
+		"""Informações de todos os dispositivos (cópia do cache; refresh reenumera)."""
+		with self._lock:
+			if refresh:
+				self._reinitialize()
+			if self._devices is None:
+				self._devices = self._scan()
+			return [dict(d) for d in self._devices]
+
+	def device_info(self, index):
+		if index is None:
+			return None
+		for info in self.devices():
+			if info.get("index") == int(index):
+				return info
+		return None
+
+	def default_host_api(self):
+		with self._lock:
+			if self._devices is None:
+				self._devices = self._scan()
+			return self._default_host_api
+
+	def _scan(self):
+		pa = self.pa
+		try:
+			self._default_host_api = pa.get_default_host_api_info().get("index")
+		except Exception:
+			self._default_host_api = None
+		devices = []
+		for i in range(pa.get_device_count()):
+			try:
+				info = dict(pa.get_device_info_by_index(i))
+			except Exception:
+				# Pula entradas problemáticas em vez de falhar toda a listagem
+				continue
+			info["index"] = i
+			devices.append(info)
+		return devices
+
+	def _reinitialize(self):
+		# O PortAudio só enxerga dispositivos novos após reinicializar; só é seguro sem streams em uso
+		self._devices = None
+		if not self._owns_backend or self._backend is None or self._checked_out:
+			return
+		self._close_idle()
+		try:
+			self._backend.terminate()
+		except Exception:
+			pass
+		self._backend = None
+
+	# ------ Streams ------
+	def open(self, **kwargs):
+		"""Abre (ou reaproveita) um stream com os mesmos argumentos de pyaudio.PyAudio.open."""
+		callback = kwargs.pop("stream_callback", None)
+		key = tuple(sorted(kwargs.items())) + (("callback", callback is not None),)
+		with self._lock:
+			pool = self._idle.get(key)
+			while pool:
+				stream, dispatcher = pool.pop()
+				try:
+					if dispatcher is not None:
+						dispatcher.target = callback
+						if stream.is_active():
+							stream.stop_stream()
+					stream.start_stream()
+				except Exception:
+					self._close(stream)
+					continue
+				self._checked_out[id(stream)] = (key, dispatcher)
+				self.reused += 1
+				return stream
+			dispatcher = None
+			if callback is not None:
+				frame_bytes = int(kwargs.get("frames_per_buffer", 1024)) * 2 * int(kwargs.get("channels", 1))
+				dispatcher = _Dispatcher(frame_bytes, bool(kwargs.get("output")))
+				dispatcher.target = callback
+				kwargs["stream_callback"] = dispatcher
+			stream = self.pa.open(**kwargs)
+			self._checked_out[id(stream)] = (key, dispatcher)
+			self.opened += 1
+			return stream
+
+	def release(self, stream):
+		"""Devolve um stream: fica parado no pool para o próximo uso com os mesmos parâmetros."""
+		with self._lock:
+			entry = self._checked_out.pop(id(stream), None)
+			if entry is None:
+				self._close(stream)
+				return
+			key, dispatcher = entry
+			if dispatcher is not None:
+				dispatcher.target = None
+			try:
+				stream.stop_stream()
+			except Exception:
+				self._close(stream)
+				return
+			pool = self._idle.setdefault(key, [])
+			if len(pool) >= MAX_IDLE_PER_KEY:
+				self._close(stream)
+				return
+			pool.append((stream, dispatcher))
+
+	def _close(self, stream):
+		try:
+			stream.close()
+		except Exception:
+			pass
+
+	def _close_idle(self):
+		for pool in self._idle.values():
+			for stream, _dispatcher in pool:
+				self._close(stream)
+		self._idle = {}
+
+	def stats(self):
+		with self._lock:
+			return {
+				"init_ms": round(self.init_ms, 1) if self.init_ms is not None else None,
+				"opened": self.opened,
+				"reused": self.reused,
+				"idle": sum(len(p) for p in self._idle.values()),
+				"in_use": len(self._checked_out),
+			}
+
+	def terminate(self):
+		"""Fecha os streams ociosos e encerra o PortAudio (fim do processo)."""
+		with self._lock:
+			self._close_idle()
+			for stream_id in list(self._checked_out):
+				self._checked_out.pop(stream_id, None)
+			if self._owns_backend and self._backend is not None:
+				try:
+					self._backend.terminate()
+				except Exception:
+					pass
+				self._backend = None
+			self._devices = None
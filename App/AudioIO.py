@@ -0,0 +1,173 @@
+import threading
+import time
+
+PA_CONTINUE = 0  # valores de pyaudio.paContinue / pyaudio.paComplete
+PA_COMPLETE = 1
+
+
+class RingBuffer:
+	"""Buffer circular de bytes pré-alocado, seguro entre uma thread produtora e uma consumidora.
+
+	Usado entre o callback de captura do PortAudio e a thread que envia para a rede,
+	e entre os quadros decodificados e o callback de reprodução. Em caso de estouro
+	os dados mais antigos são descartados (o áudio mais recente importa mais).
+	"""
+
+	def __init__(self, capacity):
+		self.capacity = int(capacity)
+		self._buf = bytearray(self.capacity)
+		self._read = 0
+		self._size = 0
+		self._cond = threading.Condition()
+		self.overruns = 0
+
+	def __len__(self):
+		with self._cond:
+			return self._size
+
+	def write(self, data):
+		data = memoryview(data)
+		n = len(data)
+		with self._cond:
+			if n > self.capacity:
+				data = data[n - self.capacity:]
+				n = self.capacity
+			free = self.capacity - self._size
+			if n > free:
+				# Descarta o mais antigo para abrir espaço
+				drop = n - free
+				self._read = (self._read + drop) % self.capacity
+				self._size -= drop
+				self.overruns += 1
+			start = (self._read + self._size) % self.capacity
+			first = min(n, self.capacity - start)
+			self._buf[start:start + first] = data[:first]
+			if first < n:
+				self._buf[0:n - first] = data[first:]
+			self._size += n
+			self._cond.notify()
+
+	def read(self, n, timeout=None):
+		"""Retorna exatamente n bytes, ou None se não houver dados suficientes dentro do timeout."""
+		with self._cond:
+			if self._size < n:
+				if timeout is None or timeout <= 0:
+					return None
+				self._cond.wait_for(lambda: self._size >= n, timeout)
+				if self._size < n:
+					return None
+			start = self._read
+			first = min(n, self.capacity - start)
+			out = bytes(self._buf[start:start + first])
+			if first < n:
+				out += bytes(self._buf[0:n - first])
+			self._read = (self._read + n) % self.capacity
+			self._size -= n
+			return out
+
+	def clear(self):
+		with self._cond:
+			self._read = 0
+			self._size = 0
+
+
+class LoopbackAudio:
+	"""Backend de áudio falso com a mesma interface do pyaudio.PyAudio.
+
+	Não precisa de placa de som: um relógio em software marca o ritmo dos
+	streams. A entrada vem de `source(samples, t) -> bytes` (silêncio por padrão)
+	e tudo o que é reproduzido é entregue a `sink(bytes, t)`. Suporta tanto o
+	modo bloqueante (read/write) quanto o modo callback (stream_callback).
+	"""
+
+	def __init__(self, source=None, sink=None, sample_width=2):
+		self.source = source or (lambda samples, t: b"\x00" * (samples * sample_width))
+		self.sink = sink or (lambda data, t: None)
+		self.sample_width = sample_width
+		self._streams = []
+
+	def open(self, rate=44100, channels=1, format=None, input=False, output=False, frames_per_buffer=1024, stream_callback=None, **_kwargs):
+		stream = LoopbackStream(self, int(rate), int(frames_per_buffer), bool(input), bool(output), stream_callback)
+		self._streams.append(stream)
+		return stream
+
+	def terminate(self):
+		for stream in list(self._streams):
+			stream.close()
+		self._streams = []
+
+
+class LoopbackStream:
+
+	def __init__(self, backend, rate, frames_per_buffer, is_input, is_output, callback):
+		self._backend = backend
+		self._rate = rate
+		self._frames = frames_per_buffer
+		self._is_input = is_input
+		self._is_output = is_output
+		self._callback = callback
+		self._start = time.monotonic()
+		self._clock = 0  # amostras já consumidas/produzidas
+		self._active = True
+		self._thread = None
+		if callback is not None:
+			self._thread = threading.Thread(target=self._run_callbacks)
+			self._thread.daemon = True
+			self._thread.start()
+
+	def _wait_for(self, samples):
+		# Dorme até o instante em que `samples` amostras teriam passado pelo dispositivo
+		deadline = self._start + samples / self._rate
+		delay = deadline - time.monotonic()
+		if delay > 0:
+			time.sleep(delay)
+
+	def read(self, num_frames, exception_on_overflow=True):
+		self._clock += num_frames
+		self._wait_for(self._clock)
+		return self._backend.source(num_frames, time.monotonic())
+
+	def write(self, data):
+		samples = len(data) // self._backend.sample_width
+		self._wait_for(self._clock)
+		self._backend.sink(bytes(data), time.monotonic())
+		self._clock += samples
+
+	def _run_callbacks(self):
+		while self._active:
+			self._clock += self._frames
+			self._wait_for(self._clock)
+			if not self._active:
+				break
+			now = time.monotonic()
+			in_data = self._backend.source(self._frames, now) if self._is_input else None
+			out_data, flag = self._callback(in_data, self._frames, {"current_time": now}, 0)
+			if self._is_output and out_data is not None:
+				self._backend.sink(bytes(out_data), now)
+			if flag != PA_CONTINUE:
+				self._active = False
+
+	def is_active(self):
+		return self._active
+
+	def start_stream(self):
+		if self._active:
+			return
+		# Reinício após stop_stream (streams reaproveitados pelo AudioEngine): o relógio recomeça
+		self._start = time.monotonic()
+		self._clock = 0
+		self._active = True
+		if self._callback is not None:
+			self._thread = threading.Thread(target=self._run_callbacks)
+			self._thread.daemon = True
+			self._thread.start()
+
+	def stop_stream(self):
+		self._active = False
+		if self._thread is not None and self._thread is not threading.current_thread():
+			self._thread.join(timeout=1.0)
+
+	def close(self):
+		self._active = False
+		if self._thread is not None and self._thread is not threading.current_thread():
+			self._thread.join(timeout=1.0)
@@ -0,0 +1,125 @@
+import struct
+import socket
+import zlib
+
+# Beacon binário da descoberta (substitui o JSON, que continua aceito e enviado para versões antigas):
+#   magic (1) | versão (1) | tipo (1) | flags (1) | porta de controle (2) | porta do relay (2, 0 = nenhum)
+#   id, nome e usuário: comprimento (1) + UTF-8 | nº de redes (1) + cada rede: endereço (4) + prefixo (1)
+#   [ttl em s (2)] [nº de peers conhecidos (2) + hash de cada id (4)] -- opcionais, no fim (o QUERY leva os dois)
+# O magic é diferente do de mídia (Packet.MAGIC) e de '{', então tráfego estranho é descartado no primeiro byte.
+HEADER = struct.Struct("!BBBBHH")
+NET = struct.Struct("!4sB")
+U16 = struct.Struct("!H")
+HASH = struct.Struct("!I")
+MAGIC = 0xC5
+VERSION = 1
+KIND_BEACON = 1
+KIND_BYE = 2
+KIND_QUERY = 3
+FLAG_REPLY = 0x01
+MAX_NETS = 255
+MAX_KNOWN = 256  # hashes de peers conhecidos num QUERY (~1 KB; o resto responde e só custa um unicast)
+
+_KINDS = {KIND_BEACON: "BEACON", KIND_BYE: "BYE", KIND_QUERY: "QUERY"}
+
+
+def peer_hash(peer_id):
+	"""Hash de 32 bits do id, usado na lista de peers conhecidos de um QUERY."""
+	return zlib.crc32(peer_id.encode("utf-8"))
+
+
+def _pack_str(value):
+	data = (value or "").encode("utf-8")[:255]
+	# Corte no meio de um caractere multibyte: descarta o pedaço incompleto
+	data = data.decode("utf-8", "ignore").encode("utf-8")
+	return bytes((len(data),)) + data
+
+
+def _pack_net(network):
+	address, _, prefix = network.partition("/")
+	return NET.pack(socket.inet_aton(address), int(prefix or 32))
+
+
+def encode_beacon(peer_id, name, username, control_port, nets=(), relay_port=None, reply=False, ttl=None, known=None, kind=KIND_BEACON):
+	parts = [
+		HEADER.pack(MAGIC, VERSION, kind, FLAG_REPLY if reply else 0, int(control_port), int(relay_port or 0)),
+		_pack_str(peer_id), _pack_str(name), _pack_str(username),
+	]
+	nets = list(nets)[:MAX_NETS]
+	parts.append(bytes((len(nets),)))
+	parts.extend(_pack_net(net) for net in nets)
+	if ttl is not None or known is not None:
+		parts.append(U16.pack(max(0, min(0xFFFF, int(ttl or 0)))))
+	if known is not None:
+		known = list(known)[:MAX_KNOWN]
+		parts.append(U16.pack(len(known)))
+		parts.extend(HASH.pack(h) for h in known)
+	return b"".join(parts)
+
+
+def encode_query(peer_id, name, username, control_port, nets=(), relay_port=None, ttl=None, known=()):
+	"""Pergunta quem está na rede; também anuncia quem pergunta. Quem está em `known` (hashes) não responde."""
+	return encode_beacon(peer_id, name, username, control_port, nets, relay_port, ttl=ttl, known=known, kind=KIND_QUERY)
+
+
+def encode_bye(peer_id):
+	return HEADER.pack(MAGIC, VERSION, KIND_BYE, 0, 0, 0) + _pack_str(peer_id) + _pack_str("") + _pack_str("") + b"\x00"
+
+
+def is_beacon(data):
+	return len(data) > 0 and data[0] == MAGIC
+
+
+def decode(data):
+	"""Decodifica um beacon binário no mesmo formato da mensagem JSON. Retorna None se não for um beacon válido."""
+	if len(data) < HEADER.size or data[0] != MAGIC:
+		return None
+	_magic, version, kind, flags, control_port, relay_port = HEADER.unpack_from(data)
+	if version != VERSION or kind not in _KINDS:
+		return None
+	offset = HEADER.size
+	fields = []
+	try:
+		for _ in range(3):
+			length = data[offset]
+			fields.append(bytes(data[offset + 1:offset + 1 + length]).decode("utf-8", "replace"))
+			offset += 1 + length
+		count = data[offset]
+		offset += 1
+		nets = []
+		for _ in range(count):
+			address, prefix = NET.unpack_from(data, offset)
+			nets.append("%s/%d" % (socket.inet_ntoa(address), prefix))
+			offset += NET.size
+		ttl = None
+		known = None
+		# Campos opcionais: ausentes ou inteiros. Um pedaço de campo é um datagrama truncado.
+		if 0 < len(data) - offset < U16.size:
+			return None
+		if len(data) >= offset + U16.size:
+			ttl = U16.unpack_from(data, offset)[0] or None
+			offset += U16.size
+		if 0 < len(data) - offset < U16.size:
+			return None
+		if len(data) >= offset + U16.size:
+			count = U16.unpack_from(data, offset)[0]
+			offset += U16.size
+			known = [HASH.unpack_from(data, offset + i * HASH.size)[0] for i in range(count)]
+	except (IndexError, struct.error):
+		return None
+	peer_id, name, username = fields
+	if not peer_id:
+		return None
+	if kind == KIND_BYE:
+		return {"type": "BYE", "id": peer_id}
+	msg = {"type": _KINDS[kind], "id": peer_id, "name": name, "username": username, "control_port": control_port, "nets": nets}
+	if relay_port:
+		msg["relay_port"] = relay_port
+	if flags & FLAG_REPLY:
+		msg["reply"] = True
+	if ttl:
+		msg["ttl"] = ttl
+	if known is not None:
+		msg["known"] = known
+	return msg
+
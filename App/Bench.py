@@ -0,0 +1,536 @@
+"""Benchmarks do caminho de mídia do Concord.
+
+Uso: python Bench.py [nome ...]   (sem argumentos roda todos)
+"""
+import sys
+import time
+import math
+import array
+import random
+import socket
+import tracemalloc
+
+import Codec
+import Packet
+import Jitter
+import Fec
+import Concealment
+import AudioIO
+import Conference
+import Relay
+import Dsp
+import AudioEngine
+import Discovery
+import Beacon
+
+DEVICE_RATE = 44100
+CHUNK = 1024
+UDP_IP_OVERHEAD = 28  # cabeçalhos IPv4 (20) + UDP (8)
+MAX_DATAGRAM = 4096  # mesmo limite de Voip.MAX_DATAGRAM (Voip importa pyaudio)
+
+
+def speech_like_frames(count, chunk=CHUNK, rate=DEVICE_RATE, seed=1):
+	"""Gera quadros PCM 16 bits com uma mistura de harmônicos modulados e ruído, parecida com voz."""
+	rnd = random.Random(seed)
+	frames = []
+	n = 0
+	for _ in range(count):
+		samples = array.array("h")
+		for _ in range(chunk):
+			t = n / rate
+			envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 3.0 * t)
+			value = envelope * (0.3 * math.sin(2 * math.pi * 180 * t) + 0.15 * math.sin(2 * math.pi * 360 * t) + 0.08 * math.sin(2 * math.pi * 1250 * t))
+			value += rnd.uniform(-0.02, 0.02)
+			samples.append(int(max(-1.0, min(1.0, value)) * 32767))
+			n += 1
+		frames.append(samples.tobytes())
+	return frames
+
+
+def _timeit(fn, items):
+	start = time.perf_counter()
+	out = [fn(item) for item in items]
+	return (time.perf_counter() - start) / max(1, len(items)), out
+
+
+def bench_codecs(frames=200):
+	"""Custo de CPU por quadro e bytes no fio para cada codec/taxa."""
+	pcm = speech_like_frames(frames)
+	frame_s = CHUNK / DEVICE_RATE
+	print(f"{'codec':<8}{'taxa':>7}{'enc us/q':>10}{'dec us/q':>10}{'payload B':>11}{'fio B':>7}{'kbit/s':>9}")
+	for name in Codec.CODECS:
+		for rate in sorted(Codec.RATE_IDS, reverse=True):
+			encoder = Codec.create(name, rate)
+			decoder = Codec.create(name, rate)
+			enc_s, payloads = _timeit(encoder.encode, pcm)
+			dec_s, _ = _timeit(decoder.decode, payloads)
+			payload_bytes = sum(len(p) for p in payloads) / len(payloads)
+			wire = payload_bytes + Packet.HEADER_SIZE + UDP_IP_OVERHEAD
+			kbps = wire * 8 / frame_s / 1000.0
+			print(f"{name:<8}{rate:>7}{enc_s * 1e6:>10.1f}{dec_s * 1e6:>10.1f}{payload_bytes:>11.1f}{wire:>7.0f}{kbps:>9.1f}")
+
+
+def lossy_trace(count, loss=0.05, burst=0.3, seed=7):
+	"""Traço de perdas Gilbert-Elliott: True onde o pacote se perde."""
+	rnd = random.Random(seed)
+	lost = []
+	in_burst = False
+	for _ in range(count):
+		in_burst = rnd.random() < (burst if in_burst else loss)
+		lost.append(in_burst)
+	return lost
+
+
+def _snr_db(reference, produced):
+	ref = array.array("h")
+	out = array.array("h")
+	ref.frombytes(b"".join(reference))
+	out.frombytes(b"".join(produced))
+	n = min(len(ref), len(out))
+	signal = sum(ref[i] * ref[i] for i in range(n)) or 1
+	noise = sum((ref[i] - out[i]) ** 2 for i in range(n)) or 1
+	return 10 * math.log10(signal / noise)
+
+
+def replay_lossy_trace(frames, lost, plc="fade", fec_group=0, jitter_s=0.01, seed=3):
+	"""Reproduz um traço com perdas pelo caminho de recepção (FEC, buffer de jitter, ocultação)."""
+	rnd = random.Random(seed)
+	frame_s = CHUNK / DEVICE_RATE
+	encoder = Fec.FecEncoder(fec_group)
+	decoder = Fec.FecDecoder()
+	jitter = Jitter.JitterBuffer(frame_ms=frame_s * 1000)
+	concealer = Concealment.LossConcealer(plc, rate=DEVICE_RATE)
+	# Pacotes que sobrevivem à rede, com horário de chegada
+	arrivals = []
+	for seq, pcm in enumerate(frames):
+		ts = seq * CHUNK
+		if not lost[seq]:
+			arrivals.append((seq * frame_s + rnd.uniform(0, jitter_s), "media", seq, ts, pcm))
+		parity = encoder.add(seq, Packet.PT_PCM, ts, pcm)
+		if parity is not None:
+			arrivals.append((seq * frame_s + rnd.uniform(0, jitter_s), "fec", parity[0], ts, parity[1]))
+	arrivals.sort(key=lambda a: a[0])
+
+	def recover(seq):
+		recovered = decoder.recover(seq)
+		return (seq, recovered[3]) if recovered is not None else None
+
+	reference = []
+	produced = []
+	expected = None
+	i = 0
+	step = 0
+	while expected is None or expected < len(frames):
+		now = step * frame_s
+		step += 1
+		while i < len(arrivals) and arrivals[i][0] <= now:
+			arrival, kind, seq, ts, data = arrivals[i]
+			if kind == "media":
+				jitter.put(seq, (seq, data), timestamp_ms=ts * 1000.0 / DEVICE_RATE, arrival=arrival)
+				decoder.add_media(seq, Packet.PT_PCM, ts, data)
+			else:
+				decoder.add_parity(seq, data)
+			i += 1
+		frame = jitter.get(recover=recover)
+		if frame is not None:
+			expected = frame[0]
+			produced.append(concealer.good(frame[1]))
+		elif expected is not None:
+			produced.append(concealer.conceal(CHUNK))
+		else:
+			continue  # ainda no pré-buffer
+		reference.append(frames[expected])
+		expected += 1
+	stats = jitter.stats()
+	return {
+		"lost": sum(lost),
+		"recovered": decoder.recovered,
+		"concealed": concealer.concealed,
+		"late": stats["late"],
+		"snr_db": _snr_db(reference, produced),
+	}
+
+
+def bench_loss(frames=300):
+	"""Reproduz um traço de perdas em rajada com cada modo de ocultação, com e sem FEC."""
+	pcm = speech_like_frames(frames)
+	lost = lossy_trace(frames)
+	print(f"{'plc':<9}{'fec':>5}{'perdidos':>10}{'recup.':>8}{'ocult.':>8}{'SNR dB':>9}{'us/q':>8}")
+	for fec_group in (0, 4):
+		for plc in Concealment.MODES:
+			start = time.perf_counter()
+			r = replay_lossy_trace(pcm, lost, plc=plc, fec_group=fec_group)
+			per_frame = (time.perf_counter() - start) / frames
+			print(f"{plc:<9}{fec_group:>5}{r['lost']:>10}{r['recovered']:>8}{r['concealed']:>8}{r['snr_db']:>9.2f}{per_frame * 1e6:>8.0f}")
+
+
+def _free_port():
+	s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	s.bind(("127.0.0.1", 0))
+	port = s.getsockname()[1]
+	s.close()
+	return port
+
+
+def measure_engine_latency(engine="blocking", frame_ms=None, seconds=3.0, click_every=0.5):
+	"""Latência boca-ouvido entre duas VoipRooms locais usando o backend de loopback (sem placa de som).
+
+	A origem emite um clique periódico; o destino registra quando ele aparece na saída.
+	"""
+	import Voip
+	clicks = []
+	heard = []
+	state = {"next_click": time.monotonic() + 0.5}
+
+	def source(samples, t):
+		if t >= state["next_click"]:
+			state["next_click"] = t + click_every
+			clicks.append(t)
+			return array.array("h", [30000] * samples).tobytes()
+		return b"\x00" * (samples * 2)
+
+	def sink(data, t):
+		samples = array.array("h")
+		samples.frombytes(data[:len(data) - len(data) % 2])
+		if samples and max(samples) > 15000 and (not heard or t - heard[-1] > click_every / 2):
+			heard.append(t)
+
+	port_a, port_b = _free_port(), _free_port()
+	room_a = Voip.VoipRoom(LOCAL_IP="127.0.0.1", LOCAL_PORT=port_a, REMOTE_IP="127.0.0.1", REMOTE_PORT=port_b, engine=engine, frame_ms=frame_ms, audio=AudioIO.LoopbackAudio(source=source))
+	room_b = Voip.VoipRoom(LOCAL_IP="127.0.0.1", LOCAL_PORT=port_b, REMOTE_IP="127.0.0.1", REMOTE_PORT=port_a, engine=engine, frame_ms=frame_ms, audio=AudioIO.LoopbackAudio(sink=sink))
+	room_a.start()
+	room_b.start()
+	time.sleep(seconds)
+	room_a.stop()
+	room_b.stop()
+	delays = []
+	for c in clicks:
+		later = [h for h in heard if h >= c]
+		if later and later[0] - c < click_every:
+			delays.append(later[0] - c)
+	return {"frame_ms": room_a.frame_ms, "clicks": len(clicks), "delays_ms": [d * 1000 for d in delays]}
+
+
+def bench_engine(seconds=3.0):
+	"""Compara a latência das engines bloqueante e callback com quadros de 23, 20 e 10 ms."""
+	print(f"{'engine':<10}{'quadro ms':>10}{'cliques':>9}{'média ms':>10}{'máx ms':>9}")
+	for engine in ("blocking", "callback"):
+		for frame_ms in (None, 20, 10):
+			r = measure_engine_latency(engine, frame_ms, seconds)
+			delays = r["delays_ms"] or [float("nan")]
+			print(f"{engine:<10}{r['frame_ms']:>10.1f}{len(r['delays_ms']):>9}{sum(delays) / len(delays):>10.1f}{max(delays):>9.1f}")
+
+
+def bench_mixer(frames=200, codec="pcmu", frame_ms=20):
+	"""Custo de CPU da reprodução em conferência (recepção, decodificação, buffers e mixagem) por participante."""
+	chunk = int(DEVICE_RATE * frame_ms / 1000)
+	pcm = speech_like_frames(frames, chunk=chunk)
+	encoder = Codec.create(codec)
+	payloads = [encoder.encode(f) for f in pcm]
+	frame_s = chunk / DEVICE_RATE
+	print(f"{'particip.':<10}{'us/quadro':>11}{'us/particip.':>14}{'% de um núcleo':>16}{'tocados':>9}{'ocult.':>8}")
+	for n in (1, 2, 5, 10, 15):
+		mixer = Conference.Mixer(chunk)
+		participants = [Conference.Participant(("10.0.0.%d" % i, 5000), chunk) for i in range(n)]
+		# Pré-buffer cheio antes de medir; depois, como numa chamada, um pacote chega e um quadro toca por período
+		prime = participants[0].jitter.target_frames
+		for p in participants:
+			for seq in range(prime):
+				p.receive(encoder.payload_type, False, seq, seq * chunk, 1, payloads[seq])
+		start = time.perf_counter()
+		for seq in range(prime, frames):
+			for p in participants:
+				p.receive(encoder.payload_type, False, seq, seq * chunk, 1, payloads[seq])
+			mixer.mix([p.next_frame() for p in participants])
+		per_frame = (time.perf_counter() - start) / (frames - prime)
+		played = sum(p.jitter.played for p in participants) // n
+		concealed = sum(p.concealer.concealed for p in participants) // n
+		print(f"{n:<10}{per_frame * 1e6:>11.1f}{per_frame * 1e6 / n:>14.1f}{per_frame / frame_s * 100:>16.2f}{played:>9}{concealed:>8}")
+
+
+def _relay_second(relay, members, speakers, packet_rate, dtx, t0):
+	# Um segundo simulado de tráfego: locutores a packet_rate, os demais em DTX (ruído de conforto a cada 0,5 s)
+	speech = Packet.pack(Packet.PT_PCM, 0, 0, 1, b"\x00" * 160, level=Packet.level_byte(-20))
+	quiet = Packet.pack(Packet.PT_PCM, 0, 0, 1, b"\x00" * 160, level=Packet.level_byte(-70))
+	cn = Packet.pack(Packet.PT_CN, 0, 0, 1, b"\x46")
+	handled = 0
+	for tick in range(packet_rate):
+		now = t0 + tick / packet_rate
+		for i, addr in enumerate(members):
+			if i < speakers:
+				relay.handle(speech, addr, now)
+			elif not dtx:
+				relay.handle(quiet, addr, now)
+			elif tick % (packet_rate // 2) == 0:
+				relay.handle(cn, addr, now)
+			else:
+				continue
+			handled += 1
+	return handled
+
+
+def bench_relay(packet_rate=50, speakers=3):
+	"""CPU do relay por pacote e quantos participantes (a packet_rate pacotes/s) um núcleo sustenta."""
+	print(f"{'particip.':<10}{'modo':<8}{'pkt/s in':>10}{'pkt/s out':>11}{'us/pkt':>9}{'% de um núcleo':>16}")
+	capacity = {}
+	for dtx in (True, False):
+		for n in (10, 25, 50, 100):
+			relay = Relay.RelayServer("127.0.0.1", 0, top_k=speakers)
+			relay._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+			relay._sock.bind(("127.0.0.1", 0))
+			members = [("127.0.0.1", 40000 + i) for i in range(n)]
+			for i, addr in enumerate(members):
+				relay.handle(Packet.pack_control({"type": "JOIN", "stream_id": i, "username": f"user{i}"}, 0, 0, i), addr, 0.0)
+			_relay_second(relay, members, speakers, packet_rate, dtx, 1.0)  # aquecimento e ranking inicial
+			relay.forwarded = 0
+			start = time.process_time()
+			handled = _relay_second(relay, members, speakers, packet_rate, dtx, 2.0)
+			cpu = time.process_time() - start
+			relay._sock.close()
+			capacity[dtx] = n / cpu if cpu > 0 else float("inf")
+			mode = "dtx" if dtx else "contínuo"
+			print(f"{n:<10}{mode:<8}{handled:>10}{relay.forwarded:>11}{cpu / handled * 1e6:>9.1f}{cpu * 100:>16.2f}")
+	print(f"Participantes por núcleo a {packet_rate} pkt/s (top-{speakers}): ~{capacity[True]:.0f} com DTX, ~{capacity[False]:.0f} sem DTX")
+
+
+def bench_dsp(frames=2000):
+	"""Custo por quadro da cadeia de DSP NumPy comparada ao caminho antigo com audioop."""
+	try:
+		import audioop
+	except ImportError:
+		audioop = None
+	print(f"{'quadro':<8}{'caminho':<34}{'us/quadro':>11}")
+	for chunk in (441, 1024):
+		pcm = speech_like_frames(8, chunk=chunk)
+		items = [pcm[i % len(pcm)] for i in range(frames)]
+		paths = []
+		if audioop is not None:
+			paths.append(("audioop.mul (volume)", lambda d: audioop.mul(d, 2, 0.8)))
+			paths.append(("audioop.mul + rms + max", lambda d: (audioop.mul(d, 2, 0.8), audioop.rms(d, 2), audioop.max(d, 2))))
+		gain = Dsp.DspChain(chunk, gain=0.8, limiter=False)
+		paths.append(("Dsp: ganho + medição", gain.process))
+		limited = Dsp.DspChain(chunk, gain=0.8)
+		paths.append(("Dsp: ganho + limitador + medição", limited.process))
+		full = Dsp.DspChain(chunk, gain=3.0, agc=True, gate_dbov=-50.0)
+		paths.append(("Dsp: cadeia completa (AGC, gate)", full.process))
+		for name, fn in paths:
+			per_frame, _ = _timeit(fn, items)
+			print(f"{chunk:<8}{name:<34}{per_frame * 1e6:>11.2f}")
+
+
+def _percentile(values, pct):
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))] if ordered else 0.0
+
+
+def _receive_load(streams, rounds, mode, trace=False):
+	# Uma rodada = um pacote de cada stream chegando pelo socket + um quadro de reprodução misturado
+	rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	rx.bind(("127.0.0.1", 0))
+	rx.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+	rx.settimeout(1.0)
+	senders = []
+	for _ in range(streams):
+		tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		tx.bind(("127.0.0.1", 0))
+		senders.append(tx)
+	roster = Conference.Roster(CHUNK, DEVICE_RATE, "fade", max_participants=streams)
+	for tx in senders:
+		roster.add(*tx.getsockname())
+	mixer = Conference.Mixer(CHUNK)
+	output = Dsp.DspChain(CHUNK, gain=0.8)
+	pcm = speech_like_frames(4)
+	buf = bytearray(MAX_DATAGRAM)
+	view = memoryview(buf)
+	per_packet, per_frame, alloc_packet, alloc_frame = [], [], 0, 0
+	for r in range(rounds):
+		for i, tx in enumerate(senders):
+			tx.sendto(Packet.pack(Packet.PT_PCM, r, r * CHUNK, i + 1, pcm[(r + i) % len(pcm)]), rx.getsockname())
+		for _ in range(streams):
+			if trace:
+				tracemalloc.reset_peak()
+				base = tracemalloc.get_traced_memory()[0]
+			start = time.perf_counter()
+			if mode == "recvfrom":
+				data, addr = rx.recvfrom(MAX_DATAGRAM)
+			else:
+				nbytes, addr = rx.recvfrom_into(buf)
+				data = view[:nbytes]
+			pt, marker, seq, ts, stream_id, _level, payload = Packet.unpack(data)
+			roster.get(addr).receive(pt, marker, seq, ts, stream_id, payload)
+			elapsed = time.perf_counter() - start
+			if trace:
+				alloc_packet += tracemalloc.get_traced_memory()[1] - base
+			per_packet.append(elapsed)
+		if trace:
+			tracemalloc.reset_peak()
+			base = tracemalloc.get_traced_memory()[0]
+		start = time.perf_counter()
+		out = output.process(mixer.mix([p.next_frame() for p in roster.all()]))
+		per_frame.append(time.perf_counter() - start)
+		if trace:
+			alloc_frame += tracemalloc.get_traced_memory()[1] - base
+	rx.close()
+	for tx in senders:
+		tx.close()
+	return per_packet, per_frame, alloc_packet / (rounds * streams), alloc_frame / rounds
+
+
+def bench_receive(streams=50, rounds=200):
+	"""Caminho de recepção sob carga de `streams` streams: bytes alocados e p99 por pacote, recvfrom vs recv_into + pool."""
+	packet_rate = streams * DEVICE_RATE / CHUNK
+	frame_rate = DEVICE_RATE / CHUNK
+	print(f"{streams} streams, {packet_rate:.0f} pacotes/s")
+	print(f"{'caminho':<20}{'us/pkt p50':>11}{'p99':>8}{'KB aloc./s (rx)':>17}{'us/quadro p99':>15}{'KB aloc./s (mix)':>18}")
+	for mode in ("recvfrom", "recv_into"):
+		per_packet, per_frame, _a, _b = _receive_load(streams, rounds, mode)
+		tracemalloc.start()
+		_p, _f, alloc_packet, alloc_frame = _receive_load(streams, rounds // 4, mode, trace=True)
+		tracemalloc.stop()
+		print(f"{mode:<20}{_percentile(per_packet, 50) * 1e6:>11.1f}{_percentile(per_packet, 99) * 1e6:>8.1f}"
+			f"{alloc_packet * packet_rate / 1024:>17.1f}{_percentile(per_frame, 99) * 1e6:>15.1f}{alloc_frame * frame_rate / 1024:>18.1f}")
+
+
+def _audio_backend():
+	# PortAudio real quando disponível; senão o backend de loopback (mede só o custo de abrir streams)
+	try:
+		import pyaudio
+		pa = pyaudio.PyAudio()
+		if pa.get_device_count() > 0:
+			return pa, "PortAudio"
+		pa.terminate()
+	except Exception:
+		pass
+	return AudioIO.LoopbackAudio(), "loopback"
+
+
+def bench_setup(calls=20):
+	"""Custo de preparar o áudio de uma chamada: PyAudio novo por chamada vs AudioEngine compartilhado."""
+	kwargs = {"format": AudioEngine.PA_INT16, "channels": 1, "rate": DEVICE_RATE, "frames_per_buffer": CHUNK}
+	per_call = []
+	for _ in range(calls):
+		start = time.perf_counter()
+		pa, name = _audio_backend()
+		streams = [pa.open(input=True, **kwargs), pa.open(output=True, **kwargs)]
+		per_call.append(time.perf_counter() - start)
+		for stream in streams:
+			stream.stop_stream()
+			stream.close()
+		pa.terminate()
+	backend, name = _audio_backend()
+	engine = AudioEngine.AudioEngine(backend)
+	shared = []
+	for _ in range(calls):
+		start = time.perf_counter()
+		streams = [engine.open(input=True, **kwargs), engine.open(output=True, **kwargs)]
+		shared.append(time.perf_counter() - start)
+		for stream in streams:
+			engine.release(stream)
+	engine.terminate()
+	backend.terminate()
+	print(f"backend: {name}, {calls} chamadas")
+	print(f"{'modo':<22}{'ms p50':>9}{'ms p99':>9}")
+	for label, values in (("PyAudio por chamada", per_call), ("AudioEngine", shared)):
+		print(f"{label:<22}{_percentile(values, 50) * 1000:>9.2f}{_percentile(values, 99) * 1000:>9.2f}")
+
+
+def _query_answers(candidates, network_size=None):
+	# Respostas esperadas a um QUERY: acima do alvo cada nó responde com probabilidade alvo / tamanho da rede
+	size = (candidates + 1) if network_size is None else network_size
+	target = Discovery.QUERY_RESPONSE_TARGET
+	return int(round(candidates * min(1.0, target / size))) if size > target else candidates
+
+
+def simulate_discovery(nodes, seconds=900.0, join_spread=60.0, adaptive=True, seed=5):
+	"""Simula a descoberta numa LAN (uma interface por nó, sem perdas).
+
+	Cada nó entra num instante aleatório em [0, join_spread). No modo antigo ele manda um beacon a
+	cada 5 s; no adaptativo segue o Discovery.BeaconSchedule e começa com um QUERY, respondido em
+	unicast pelos nós já presentes (o novo ainda não conhece ninguém; acima de QUERY_RESPONSE_TARGET
+	conta o número esperado de respostas da amostra). Devolve pacotes enviados
+	e recepções (um broadcast acorda os N-1 ouvintes) por segundo, na média e nos últimos 300 s.
+	"""
+	rng = random.Random(seed)
+	joins = sorted(rng.uniform(0.0, join_spread) for _ in range(nodes))
+	events = []  # (instante, pacotes, recepções)
+	for i, joined_at in enumerate(joins):
+		present = i  # nós que já estavam na rede (os joins estão ordenados)
+		if adaptive:
+			schedule = Discovery.BeaconSchedule(rng=random.Random(seed + i))
+			schedule.restart(joined_at)
+			# QUERY (que também é o primeiro anúncio) e as respostas unicast
+			answers = _query_answers(present)
+			events.append((joined_at, 1 + answers, present + answers))
+			schedule.sent(joined_at)
+			t = schedule.next_at
+			while t < seconds:
+				events.append((t, 1, None))
+				schedule.sent(t)
+				t = schedule.next_at
+		else:
+			t = joined_at
+			while t < seconds:
+				events.append((t, 1, None))
+				t += Discovery.LEGACY_INTERVAL
+	events.sort()
+	total_packets = total_rx = tail_packets = tail_rx = 0
+	tail_start = seconds - 300.0
+	up = 0
+	join_iter = iter(joins)
+	next_join = next(join_iter, None)
+	for at, packets, rx in events:
+		while next_join is not None and next_join <= at:
+			up += 1
+			next_join = next(join_iter, None)
+		if rx is None:
+			rx = max(0, up - 1)  # broadcast: todos os outros nós presentes acordam
+		total_packets += packets
+		total_rx += rx
+		if at >= tail_start:
+			tail_packets += packets
+			tail_rx += rx
+	return {
+		"packets_per_s": total_packets / seconds,
+		"rx_per_s": total_rx / seconds,
+		"steady_packets_per_s": tail_packets / 300.0,
+		"steady_rx_per_s": tail_rx / 300.0,
+	}
+
+
+def bench_discovery(sizes=(10, 100, 1000)):
+	"""Tráfego de descoberta na LAN: beacon fixo de 5 s vs calendário adaptativo com QUERY e supressão."""
+	print(f"{'nós':<6}{'modo':<11}{'pkt/s (15 min)':>16}{'pkt/s estável':>15}{'recepções/s':>13}{'recep./s estável':>18}")
+	for n in sizes:
+		for adaptive in (False, True):
+			r = simulate_discovery(n, adaptive=adaptive)
+			mode = "adaptativo" if adaptive else "fixo 5 s"
+			print(f"{n:<6}{mode:<11}{r['packets_per_s']:>16.2f}{r['steady_packets_per_s']:>15.2f}{r['rx_per_s']:>13.0f}{r['steady_rx_per_s']:>18.0f}")
+	# Um refresh (trigger_beacon) numa rede estável: quantos respondem ao QUERY
+	print(f"{'nós':<6}{'respostas a um refresh: todos':>31}{'supressão + amostra':>21}")
+	for n in sizes:
+		suppressed = min(n - 1, Beacon.MAX_KNOWN)
+		print(f"{n:<6}{n - 1:>31}{_query_answers(n - 1 - suppressed, n):>21}")
+
+
+BENCHMARKS = {
+	"codecs": bench_codecs,
+	"loss": bench_loss,
+	"engine": bench_engine,
+	"mixer": bench_mixer,
+	"relay": bench_relay,
+	"dsp": bench_dsp,
+	"receive": bench_receive,
+	"setup": bench_setup,
+	"discovery": bench_discovery,
+}
+
+
+if __name__ == "__main__":
+	names = sys.argv[1:] or list(BENCHMARKS)
+	for name in names:
+		if name not in BENCHMARKS:
+			print(f"Benchmark desconhecido: {name}. Disponíveis: {', '.join(BENCHMARKS)}")
+			continue
+		print(f"== {name} ==")
+		BENCHMARKS[name]()
+		print()
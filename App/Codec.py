@@ -0,0 +1,149 @@
+import audioop
+import struct
+
+# Taxa nativa dos dispositivos de áudio (ver Voip.RATE)
+DEVICE_RATE = 44100
+SAMPLE_WIDTH = 2
+
+# O payload type do cabeçalho de mídia codifica codec e taxa: (codec << 2) | taxa.
+# PCM a 44.1 kHz resulta em 0, compatível com Packet.PT_PCM.
+CODEC_IDS = {"pcm": 0, "pcmu": 1, "pcma": 2, "adpcm": 3}
+RATE_IDS = {44100: 0, 16000: 1, 8000: 2}
+
+
+def payload_type_for(name, rate):
+	return (CODEC_IDS[name] << 2) | RATE_IDS[int(rate)]
+
+
+class Codec:
+	"""Codec base: PCM linear 16 bits, com reamostragem opcional para uma taxa menor no fio."""
+
+	name = "pcm"
+
+	def __init__(self, rate=DEVICE_RATE, device_rate=DEVICE_RATE):
+		rate = int(rate)
+		if rate not in RATE_IDS:
+			raise ValueError(f"Taxa não suportada: {rate}")
+		self.rate = rate
+		self.device_rate = int(device_rate)
+		self.payload_type = payload_type_for(self.name, rate)
+		self._enc_rs = None
+		self._dec_rs = None
+
+	def encode(self, pcm):
+		"""Recebe PCM 16 bits na taxa do dispositivo e retorna o payload para o fio."""
+		if self.rate != self.device_rate:
+			pcm, self._enc_rs = audioop.ratecv(pcm, SAMPLE_WIDTH, 1, self.device_rate, self.rate, self._enc_rs)
+		return self._encode(pcm)
+
+	def decode(self, payload):
+		"""Recebe o payload do fio e retorna PCM 16 bits na taxa do dispositivo, ou None se ele estiver malformado."""
+		pcm = self._decode(payload)
+		if pcm is None:
+			return None
+		if self.rate != self.device_rate:
+			pcm, self._dec_rs = audioop.ratecv(pcm, SAMPLE_WIDTH, 1, self.rate, self.device_rate, self._dec_rs)
+		return pcm
+
+	def _encode(self, pcm):
+		return pcm
+
+	def _decode(self, payload):
+		if len(payload) % SAMPLE_WIDTH:
+			return None
+		# Sem cópia: o payload já vive num buffer do pool de recepção até ser reproduzido
+		return payload
+
+
+class MuLawCodec(Codec):
+	"""G.711 μ-law: 8 bits por amostra."""
+
+	name = "pcmu"
+
+	def _encode(self, pcm):
+		return audioop.lin2ulaw(pcm, SAMPLE_WIDTH)
+
+	def _decode(self, payload):
+		return audioop.ulaw2lin(payload, SAMPLE_WIDTH)
+
+
+class ALawCodec(Codec):
+	"""G.711 A-law: 8 bits por amostra."""
+
+	name = "pcma"
+
+	def _encode(self, pcm):
+		return audioop.lin2alaw(pcm, SAMPLE_WIDTH)
+
+	def _decode(self, payload):
+		return audioop.alaw2lin(payload, SAMPLE_WIDTH)
+
+
+class AdpcmCodec(Codec):
+	"""IMA-ADPCM: 4 bits por amostra.
+
+	Cada pacote carrega o estado inicial do preditor (como o DVI4 do RFC 3551)
+	e o número de amostras, então pode ser decodificado mesmo após uma perda.
+	"""
+
+	name = "adpcm"
+	_HEADER = struct.Struct("!HhB")  # amostras, preditor, índice do passo
+
+	def __init__(self, rate=DEVICE_RATE, device_rate=DEVICE_RATE):
+		super().__init__(rate, device_rate)
+		self._enc_state = None
+
+	def _encode(self, pcm):
+		predictor, index = self._enc_state or (0, 0)
+		samples = len(pcm) // SAMPLE_WIDTH
+		if samples % 2:
+			# lin2adpcm descarta a última amostra ímpar; completa o byte com silêncio
+			pcm = bytes(pcm) + b"\x00" * SAMPLE_WIDTH
+		data, self._enc_state = audioop.lin2adpcm(pcm, SAMPLE_WIDTH, self._enc_state)
+		return self._HEADER.pack(samples, predictor, index) + data
+
+	def _decode(self, payload):
+		if len(payload) < self._HEADER.size:
+			return None
+		samples, predictor, index = self._HEADER.unpack_from(payload)
+		# Pacote truncado (ou cabeçalho corrompido): faltam nibbles para as amostras anunciadas
+		if len(payload) - self._HEADER.size < (samples + 1) // 2 or not 0 <= index <= 88:
+			return None
+		pcm, _state = audioop.adpcm2lin(bytes(payload[self._HEADER.size:]), SAMPLE_WIDTH, (predictor, index))
+		# Com número ímpar de amostras o último nibble é preenchimento
+		return pcm[:samples * SAMPLE_WIDTH]
+
+
+CODECS = {
+	"pcm": Codec,
+	"pcmu": MuLawCodec,
+	"pcma": ALawCodec,
+	"adpcm": AdpcmCodec,
+}
+
+
+def create(name="pcm", rate=None, device_rate=DEVICE_RATE):
+	"""Cria um codec pelo nome. Sem taxa explícita, G.711 usa 8 kHz e os demais a taxa do dispositivo."""
+	name = str(name or "pcm").lower()
+	if name not in CODECS:
+		raise ValueError(f"Codec desconhecido: {name}")
+	if rate is None:
+		rate = 8000 if name in ("pcmu", "pcma") else device_rate
+	return CODECS[name](rate=rate, device_rate=device_rate)
+
+
+def create_for_payload_type(payload_type, device_rate=DEVICE_RATE):
+	"""Cria o decodificador correspondente a um payload type recebido, ou None se for desconhecido."""
+	codec_id = payload_type >> 2
+	rate_id = payload_type & 0x3
+	for name, cid in CODEC_IDS.items():
+		if cid != codec_id:
+			continue
+		for rate, rid in RATE_IDS.items():
+			if rid == rate_id:
+				return CODECS[name](rate=rate, device_rate=device_rate)
+	return None
+
+
+def available():
+	return [{"name": name, "rates": sorted(RATE_IDS, reverse=True)} for name in CODECS]
@@ -0,0 +1,103 @@
+import array
+import audioop
+
+SAMPLE_WIDTH = 2
+MODES = ("silence", "fade", "pitch")
+
+
+class LossConcealer:
+	"""Sintetiza áudio de reposição para quadros perdidos.
+
+	- "silence": reproduz zeros (comportamento antigo).
+	- "fade": repete o último quadro bom com ganho decrescente.
+	- "pitch": repete o último período de pitch (estimado com audioop.findfit) com o mesmo decaimento.
+	Após `fade_frames` perdas consecutivas a saída chega a silêncio.
+	"""
+
+	def __init__(self, mode="fade", rate=44100, fade_frames=4, min_pitch_hz=60, max_pitch_hz=400):
+		if mode not in MODES:
+			raise ValueError(f"Modo de ocultação desconhecido: {mode}")
+		self.mode = mode
+		self.rate = int(rate)
+		self.fade_frames = max(1, int(fade_frames))
+		self.min_period = max(1, self.rate // int(max_pitch_hz))
+		self.max_period = max(self.min_period + 1, self.rate // int(min_pitch_hz))
+		self._ref_len = max(16, self.rate // 200)  # ~5 ms usados para casar o período
+		self._history = array.array("h")
+		self._frame_samples = 0
+		self._lost_run = 0
+		self._period = None
+		self.concealed = 0
+
+	def good(self, pcm):
+		"""Registra um quadro recebido normalmente e devolve-o (suavizado se vier logo após uma perda)."""
+		if self._lost_run and self.mode != "silence":
+			# Entrada suave após a ocultação para evitar clique
+			samples = array.array("h")
+			samples.frombytes(pcm)
+			ramp = min(len(samples), self._ref_len)
+			for i in range(ramp):
+				samples[i] = int(samples[i] * (i + 1) / ramp)
+			pcm = samples.tobytes()
+		self._frame_samples = len(pcm) // SAMPLE_WIDTH
+		keep = self.max_period + self._ref_len + self._frame_samples
+		nbytes = self._frame_samples * SAMPLE_WIDTH
+		if len(self._history) >= keep and nbytes < len(self._history) * SAMPLE_WIDTH:
+			# Histórico cheio: desliza no lugar (memmove) em vez de crescer e cortar o array
+			with memoryview(self._history) as view:
+				raw = view.cast("B")
+				raw[:-nbytes] = raw[nbytes:]
+				raw[-nbytes:] = pcm[:nbytes]
+				raw.release()
+		else:
+			self._history.frombytes(pcm)
+			if len(self._history) > keep:
+				del self._history[:len(self._history) - keep]
+		self._lost_run = 0
+		self._period = None
+		return pcm
+
+	def conceal(self, frame_samples=None):
+		"""Retorna PCM sintetizado para um quadro ausente."""
+		frame_samples = int(frame_samples or self._frame_samples or 1024)
+		self._lost_run += 1
+		if self._frame_samples:
+			# Só conta depois do primeiro quadro bom (o pré-buffer não é perda)
+			self.concealed += 1
+		if self.mode == "silence" or not self._history or self._lost_run > self.fade_frames:
+			return b"\x00" * (frame_samples * SAMPLE_WIDTH)
+		if self.mode == "pitch":
+			if self._period is None:
+				self._period = self._estimate_period()
+			period = self._period
+		else:
+			period = min(len(self._history), self._frame_samples or frame_samples)
+		source = self._history[-period:]
+		# Ganho decresce linearmente ao longo das perdas consecutivas
+		start_gain = 1.0 - (self._lost_run - 1) / self.fade_frames
+		end_gain = 1.0 - self._lost_run / self.fade_frames
+		step = (end_gain - start_gain) / frame_samples
+		out = array.array("h", bytes(frame_samples * SAMPLE_WIDTH))
+		# Mantém a fase entre quadros consecutivos ocultados
+		offset = ((self._lost_run - 1) * frame_samples) % period
+		gain = start_gain
+		for i in range(frame_samples):
+			out[i] = int(source[(offset + i) % period] * gain)
+			gain += step
+		return out.tobytes()
+
+	def _estimate_period(self):
+		hist = self._history
+		needed = self._ref_len + self.max_period
+		if len(hist) < needed:
+			return min(len(hist), self._frame_samples) or 1
+		total = len(hist)
+		reference = hist[total - self._ref_len:].tobytes()
+		search_start = total - self._ref_len - self.max_period
+		search = hist[search_start:total - self.min_period].tobytes()
+		try:
+			offset, _factor = audioop.findfit(search, reference)
+		except audioop.error:
+			return self._frame_samples or 1
+		period = (total - self._ref_len) - (search_start + offset)
+		return max(self.min_period, min(self.max_period, period))
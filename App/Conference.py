@@ -0,0 +1,232 @@
+import threading
+import time
+import numpy as np
+
+import Codec
+import Concealment
+import Fec
+import Jitter
+import Packet
+import Rtcp
+import Vad
+
+MAX_PARTICIPANTS = 15
+
+
+class Participant:
+	"""Estado de recepção de um participante remoto: buffer de jitter, decodificadores, FEC, ocultação e ruído de conforto."""
+
+	def __init__(self, addr, chunk, rate=44100, plc="fade", username=None):
+		self.addr = (addr[0], int(addr[1]))
+		self.username = username
+		self.chunk = int(chunk)
+		self.rate = int(rate)
+		self.frame_ms = self.chunk * 1000.0 / self.rate
+		self.jitter = Jitter.JitterBuffer(frame_ms=self.frame_ms)
+		self.concealer = Concealment.LossConcealer(plc, rate=self.rate)
+		self.comfort_noise = Vad.ComfortNoiseGenerator()
+		self.fec_decoder = Fec.FecDecoder()
+		# Payloads recebidos ficam em slots pré-alocados até a reprodução (folga de 2x sobre o buffer de jitter)
+		self.pool = Packet.PacketPool(2 * self.jitter.capacity, self.chunk * 2 + 16)
+		self.reception = Rtcp.ReceptionStats(self.rate)
+		self._decoders = {}
+		self._last_pt = None
+		self.key = self.addr
+		self.stream_id = None
+		self._rx_seq = Packet.Unwrapper(16)
+		self._rx_ts = Packet.Unwrapper(32)
+		self._cn_active = False
+		self._cn_resume_seq = 0
+		self.last_heard = None
+
+	def receive(self, pt, marker, seq, ts, stream_id, payload):
+		"""Processa um pacote de mídia, ruído de conforto ou FEC vindo deste participante."""
+		self.last_heard = time.monotonic()
+		if pt == Packet.PT_CN:
+			if stream_id == self.stream_id:
+				# O outro lado entrou em silêncio: gera ruído de conforto até a próxima fala
+				self.comfort_noise.level = Vad.decode_comfort_noise(payload)
+				self._cn_active = True
+				self._cn_resume_seq = self._rx_seq.extend(seq)
+				self.jitter.mark_silence()
+			return
+		if pt == Packet.PT_FEC:
+			if stream_id == self.stream_id:
+				self.fec_decoder.add_parity(self._rx_seq.extend(seq), payload)
+			return
+		if stream_id != self.stream_id:
+			# Novo stream (primeiro pacote ou o outro lado reiniciou)
+			self.stream_id = stream_id
+			self._rx_seq.reset()
+			self._rx_ts.reset()
+			self.jitter.reset()
+			self.fec_decoder = Fec.FecDecoder()
+			self.reception.reset()
+		ext_seq = self._rx_seq.unwrap(seq)
+		ext_ts = self._rx_ts.unwrap(ts)
+		self.reception.update(ext_seq, ext_ts, len(payload), self.last_heard)
+		self._last_pt = pt
+		# O payload ainda aponta para o buffer do socket: copia para o slot deste quadro
+		payload = self.pool.store(ext_seq, payload)
+		self.jitter.put(ext_seq, (pt, payload, ext_seq), timestamp_ms=ext_ts * 1000.0 / self.rate)
+		self.fec_decoder.add_media(ext_seq, pt, ext_ts, payload)
+
+	def receive_report(self, payload, own_stream_id):
+		"""Processa um relatório de qualidade deste participante. Retorna False se estiver malformado."""
+		report = Rtcp.unpack_report(payload)
+		if report is None:
+			return False
+		ntp, _packets, _octets, blocks = report
+		self.reception.on_sender_report(ntp)
+		for block in blocks:
+			if block["stream_id"] == own_stream_id:
+				self.reception.on_receiver_block(block)
+		return True
+
+	def _recover(self, seq):
+		# Quadro que faltou no prazo de reprodução: tenta reconstruí-lo pela paridade
+		recovered = self.fec_decoder.recover(seq)
+		if recovered is None:
+			return None
+		_seq, pt, _ts, payload = recovered
+		return pt, payload, seq
+
+	def _decode(self, payload_type, payload):
+		decoder = self._decoders.get(payload_type)
+		if decoder is None:
+			decoder = Codec.create_for_payload_type(payload_type, device_rate=self.rate)
+			if decoder is None:
+				return None
+			self._decoders[payload_type] = decoder
+		return decoder.decode(payload)
+
+	def next_frame(self):
+		"""PCM do próximo quadro a reproduzir (fala, ruído de conforto ou ocultação)."""
+		frame = self.jitter.get(recover=self._recover)
+		data = None
+		if frame is not None:
+			pt, payload, seq = frame
+			data = self._decode(pt, payload)
+			if data is None:
+				# Payload malformado ou de codec desconhecido: é uma perda, vai para a ocultação
+				self.jitter.discard_played()
+			# Quadros anteriores ao ruído de conforto ainda são o fim da fala antiga
+			if seq >= self._cn_resume_seq:
+				self._cn_active = False
+		if data is not None:
+			return self.concealer.good(data)
+		if self._cn_active:
+			# Remetente em DTX: não é perda, toca ruído de conforto
+			return self.comfort_noise.generate(self.chunk)
+		# Pré-buffer ou quadro perdido: sintetiza reposição (ou silêncio)
+		return self.concealer.conceal(self.chunk)
+
+	def stats(self):
+		stats = self.jitter.stats()
+		stats["concealed"] = self.concealer.concealed
+		stats["fec_recovered"] = self.fec_decoder.recovered
+		stats["username"] = self.username
+		return stats
+
+	def quality(self):
+		"""Números de qualidade do áudio recebido deste participante, incluindo o MOS estimado."""
+		quality = self.reception.stats()
+		jitter = self.jitter.stats()
+		quality["playout_delay_ms"] = jitter["target_ms"]
+		codec = self._decoders.get(self._last_pt)
+		quality["codec"] = codec.name if codec else None
+		# Atraso boca-ouvido: metade do RTT + buffer de jitter + um quadro de empacotamento
+		rtt = quality["rtt_ms"] or 0.0
+		delay = rtt / 2.0 + jitter["target_ms"] + self.frame_ms
+		expected = self.reception.expected
+		effective_lost = max(0, self.reception.cumulative_lost - self.fec_decoder.recovered)
+		loss = effective_lost / float(expected) if expected else 0.0
+		quality["mos"] = Rtcp.estimate_mos(delay, loss, quality["codec"] or "pcm", self.concealer.mode) if expected else None
+		return quality
+
+
+class Mixer:
+	"""Soma quadros PCM 16 bits de vários participantes com NumPy, saturando em int16.
+
+	Os acumuladores e a saída são pré-alocados por tamanho de quadro, então a mixagem não aloca
+	por quadro; o resultado é uma view válida até a próxima chamada.
+	"""
+
+	def __init__(self, chunk):
+		self.chunk = int(chunk)
+		self._acc = np.zeros(self.chunk, dtype=np.int32)
+		self._out = np.zeros(self.chunk, dtype=np.int16)
+		self._out_bytes = memoryview(self._out).cast("B")
+
+	def mix(self, frames):
+		acc = self._acc
+		acc[:] = 0
+		for data in frames:
+			samples = np.frombuffer(data, dtype=np.int16, count=min(len(data) // 2, self.chunk))
+			acc[:len(samples)] += samples
+		np.clip(acc, -32768, 32767, out=acc)
+		self._out[:] = acc
+		# View do buffer de saída: válida até a próxima mixagem
+		return self._out_bytes
+
+
+class Roster:
+	"""Participantes de uma sala, indexados pelo endereço de mídia (ip, porta).
+
+	Atrás de um relay todos chegam pelo mesmo endereço; nesse caso a chave é
+	("stream", stream_id) e o endereço do participante é o do relay.
+	"""
+
+	def __init__(self, chunk, rate=44100, plc="fade", max_participants=MAX_PARTICIPANTS):
+		self.chunk = chunk
+		self.rate = rate
+		self.plc = plc
+		self.max_participants = int(max_participants)
+		self._lock = threading.Lock()
+		self._by_addr = {}
+		self._snapshot = ()
+
+	def add(self, ip, port, username=None, key=None):
+		"""Adiciona um participante. Retorna o Participant (existente ou novo) ou None se a sala está cheia."""
+		addr = (ip, int(port))
+		key = addr if key is None else key
+		with self._lock:
+			existing = self._by_addr.get(key)
+			if existing is not None:
+				if username:
+					existing.username = username
+				return existing
+			if len(self._by_addr) >= self.max_participants:
+				return None
+			participant = Participant(addr, self.chunk, self.rate, self.plc, username)
+			participant.key = key
+			if key[0] == "stream":
+				participant.stream_id = key[1]
+			self._by_addr[key] = participant
+			self._snapshot = tuple(self._by_addr.values())
+			return participant
+
+	def remove(self, key):
+		if key and key[0] != "stream":
+			key = (key[0], int(key[1]))
+		with self._lock:
+			removed = self._by_addr.pop(key, None)
+			self._snapshot = tuple(self._by_addr.values())
+			return removed
+
+	def get(self, key):
+		return self._by_addr.get(key)
+
+	def keys(self):
+		return [p.key for p in self._snapshot]
+
+	def all(self):
+		# Tupla imutável: pode ser percorrida no callback de áudio sem segurar o lock
+		return self._snapshot
+
+	def addresses(self):
+		# Sem repetição: atrás de um relay todos compartilham o endereço dele
+		return list(dict.fromkeys(p.addr for p in self._snapshot))
+
+	def __len__(self):
+		return len(self._snapshot)
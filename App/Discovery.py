@@ -2,88 +2,298 @@ import socket
 import threading
 import json
 import time
+import queue
 import random
-import ipaddress
-import psutil
+import heapq
+import logging
+import collections
+import Interfaces
+import Beacon
+
+# Sinalização: retransmissão da oferta com recuo exponencial (50 ms, 100 ms, ... até 1 s)
+RETRANSMIT_INITIAL = 0.05
+RETRANSMIT_MAX = 1.0
+RINGING_REFRESH = 0.5  # depois do RINGING a oferta só é repetida para recuperar uma resposta final perdida
+CANCEL_POLL = 0.1  # intervalo máximo até o chamador notar um cancelamento
+TRANSACTION_TTL = 30.0  # por quanto tempo o ControlServer lembra a resposta de uma transação
+OFFER_IDLE_TIMEOUT = 3.0  # oferta sem retransmissão do chamador por este tempo expira (ele desistiu)
+MAX_PENDING_OFFERS = 3  # ofertas simultâneas aguardando o usuário; acima disso a resposta é BUSY
+
+
+# Beacons: binário (Beacon.py) e JSON para as versões anteriores. "auto" manda JSON só enquanto
+# alguma versão antiga (beacon JSON sem ttl) foi ouvida nos últimos LEGACY_WINDOW segundos
+BEACON_FORMATS = ("binary", "json", "both", "auto")
+BEACON_FORMAT = "auto"
+SEEN_BEACONS_MAX = 4096  # beacons já decodificados lembrados para o caminho rápido
+
+# Calendário no estilo mDNS: rajada ao iniciar ou no trigger (1 s, 2 s, 4 s, ...) e recuo até o intervalo estável.
+# O tráfego de descoberta na LAN cresce com N² (cada broadcast acorda todos), então o intervalo estável é longo
+# e o prazo anunciado no beacon (ttl) acompanha a cadência lenta.
+BEACON_FAST = 1.0
+BEACON_STEADY = 30.0
+BEACON_JITTER = 0.1  # ±10% no intervalo estável, para os nós não entrarem em sincronia
+TTL_FACTOR = 3.5  # ttl anunciado = 3.5 intervalos estáveis (tolera 3 beacons perdidos)
+LEGACY_INTERVAL = 5.0  # versões antigas expiram peers em 15 s: com uma delas na rede o intervalo não passa disso
+LEGACY_WINDOW = 60.0
+QUERY_RESPONSE_DELAY = (0.02, 0.12)  # atraso aleatório das respostas a um QUERY (espalha a rajada de unicasts)
+# Em redes grandes só uma amostra responde (probabilidade TARGET / nós conhecidos); o resto quem perguntou
+# ouve nos anúncios seguintes, dentro de um intervalo estável
+QUERY_RESPONSE_TARGET = 50
+WAKE_MAX = 5.0  # a thread dos beacons acorda ao menos a cada WAKE_MAX s para expirar peers
+
+# Transporte dos anúncios: multicast num grupo (só quem roda o Concord processa, e atravessa roteadores
+# e redes ZeroTier que levam multicast), com broadcast da sub-rede nas interfaces em que o grupo não
+# pôde ser assinado. "auto" também faz broadcast enquanto houver versões antigas na rede (elas só ouvem broadcast).
+DISCOVERY_TRANSPORTS = ("broadcast", "multicast", "auto")
+DISCOVERY_TRANSPORT = "auto"
+MULTICAST_GROUP = "239.255.37.20"  # escopo organizacional (RFC 2365), mesma porta dos broadcasts
+MULTICAST_TTL = 4  # saltos de roteador que um anúncio pode atravessar
+
+
+def new_transaction_id():
+	return "%016x" % random.getrandbits(64)
+
+
+PeerEvent = collections.namedtuple("PeerEvent", "kind peer version")
+PEER_JOIN = "join"
+PEER_LEAVE = "leave"
+PEER_UPDATE = "update"
+PEER_TTL = 15.0  # sem beacon por este tempo (3 beacons perdidos) o peer sai do registro
+
+
+def is_relay_only(peer):
+	"""Nó que só anuncia um relay (ex: Relay.py --announce): sem porta de controle, não recebe chamadas."""
+	return not peer.get("control_port") and bool(peer.get("relay_port"))
 
 
 class PeerRegistry:
+	"""Peers conhecidos, com expiração por prazo e snapshots versionados.
 
-	def __init__(self, self_id):
+	Cada peer tem um prazo (último beacon + ttl) em um heap; a expiração só olha o topo,
+	e um prazo estendido por um beacon novo é reinserido quando chega ao topo, então o
+	heap tem no máximo uma entrada por peer. A versão só muda quando um peer entra, sai
+	ou muda de dados (não a cada beacon), e o snapshot (tupla de dicionários que não
+	devem ser alterados) é reaproveitado até a versão mudar. Assinantes recebem PeerEvent.
+	"""
+
+	def __init__(self, self_id, ttl=PEER_TTL):
 		self.self_id = self_id
-		self._peers = {}
+		self.ttl = float(ttl)
+		self._peers = {}  # id -> dicionário do peer (substituído, nunca alterado)
+		self._deadlines = {}  # id -> prazo atual
+		self._ttls = {}  # id -> ttl anunciado pelo peer (ou o padrão)
+		self._heap = []  # (prazo, id), no máximo uma entrada por peer
+		self._queued = {}  # id -> prazo da sua entrada no heap (sobrevive a um BYE até a entrada sair do topo)
 		self._lock = threading.Lock()
+		self._subs = []
+		self.version = 0
+		self._snapshot = ()
+		self._snapshot_version = 0
+
+	def subscribe(self, fn):
+		"""fn(PeerEvent) é chamada a cada entrada, saída ou mudança de um peer."""
+		with self._lock:
+			self._subs.append(fn)
 
-	def upsert_peer(self, peer_id, ip, control_port, display_name, username=None):
+	def unsubscribe(self, fn):
+		with self._lock:
+			if fn in self._subs:
+				self._subs.remove(fn)
+
+	def upsert_peer(self, peer_id, ip, control_port, display_name, username=None, relay_port=None, ttl=None):
+		"""Registra um beacon (ttl: prazo anunciado pelo peer, em s). Devolve True se o peer é novo."""
 		if peer_id == self.self_id:
-			return
+			return False
+		peer = {
+			"id": peer_id,
+			"ip": ip,
+			"control_port": control_port,
+			"display_name": display_name,
+			"username": username or display_name,
+			"relay_port": relay_port,
+		}
+		now = time.monotonic()
+		ttl = float(ttl) if ttl else self.ttl
 		with self._lock:
-			self._peers[peer_id] = {
-				"id": peer_id,
-				"ip": ip,
-				"control_port": control_port,
-				"display_name": display_name,
-				"username": username or display_name,
-				"last_seen": time.time(),
-			}
+			events = self._expire(now)
+			old = self._peers.get(peer_id)
+			if peer_id not in self._queued:
+				heapq.heappush(self._heap, (now + ttl, peer_id))
+				self._queued[peer_id] = now + ttl
+			self._deadlines[peer_id] = now + ttl
+			self._ttls[peer_id] = ttl
+			if old != peer:
+				self._peers[peer_id] = peer
+				self.version += 1
+				events.append(PeerEvent(PEER_JOIN if old is None else PEER_UPDATE, peer, self.version))
+			subs = list(self._subs) if events else ()
+		self._emit(subs, events)
+		return old is None
+
+	def touch(self, peer_id):
+		"""Beacon repetido de um peer conhecido: só estende o prazo. Devolve False se o peer não está no registro."""
+		with self._lock:
+			if peer_id not in self._deadlines:
+				return False
+			self._deadlines[peer_id] = time.monotonic() + self._ttls.get(peer_id, self.ttl)
+			return True
+
+	def remove_peer(self, peer_id):
+		"""Saída explícita (BYE). A entrada do heap é descartada quando chegar ao topo."""
+		with self._lock:
+			peer = self._peers.pop(peer_id, None)
+			self._deadlines.pop(peer_id, None)
+			self._ttls.pop(peer_id, None)
+			if peer is None:
+				return False
+			self.version += 1
+			events = [PeerEvent(PEER_LEAVE, peer, self.version)]
+			subs = list(self._subs)
+		self._emit(subs, events)
+		return True
 
-	def list_active(self, max_age_seconds=15.0):
-		now = time.time()
+	def expire(self):
+		"""Remove os peers cujo prazo venceu (chamado periodicamente e a cada consulta)."""
 		with self._lock:
-			return [p for p in self._peers.values() if now - p["last_seen"] <= max_age_seconds]
+			events = self._expire(time.monotonic())
+			subs = list(self._subs) if events else ()
+		self._emit(subs, events)
 
+	def snapshot(self):
+		"""Tupla imutável dos peers ativos, refeita só quando a versão muda."""
+		self.expire()
+		with self._lock:
+			if self._snapshot_version != self.version:
+				self._snapshot = tuple(self._peers.values())
+				self._snapshot_version = self.version
+			return self._snapshot
 
-def get_local_ipv4_interfaces():
-	interfaces = []
-	for if_name, addrs in psutil.net_if_addrs().items():
-		for addr in addrs:
-			if addr.family == socket.AF_INET:
-				ip = addr.address
-				netmask = addr.netmask or "255.255.255.0"
+	def list_active(self):
+		return self.snapshot()
+
+	def _expire(self, now):
+		# Chamado com o lock: O(log n) por entrada retirada do heap
+		events = []
+		heap = self._heap
+		while heap and heap[0][0] <= now:
+			_deadline, peer_id = heapq.heappop(heap)
+			current = self._deadlines.get(peer_id)
+			if current is None:
+				del self._queued[peer_id]  # saiu por BYE
+				continue
+			if current > now:
+				# Prazo estendido por beacons desde a inserção: volta ao heap com o prazo atual
+				heapq.heappush(heap, (current, peer_id))
+				self._queued[peer_id] = current
+				continue
+			del self._queued[peer_id]
+			del self._deadlines[peer_id]
+			self._ttls.pop(peer_id, None)
+			peer = self._peers.pop(peer_id)
+			self.version += 1
+			events.append(PeerEvent(PEER_LEAVE, peer, self.version))
+		return events
+
+	@staticmethod
+	def _emit(subs, events):
+		for event in events:
+			for fn in subs:
 				try:
-					network = ipaddress.IPv4Network(f"{ip}/{netmask}", strict=False)
-					broadcast = str(network.broadcast_address)
+					fn(event)
 				except Exception:
-					try:
-						broadcast = addr.broadcast or "255.255.255.255"
-					except Exception:
-						broadcast = "255.255.255.255"
-				interfaces.append({
-					"name": if_name,
-					"ip": ip,
-					"netmask": netmask,
-					"broadcast": broadcast,
-					"network": str(ipaddress.IPv4Network(f"{ip}/{netmask}", strict=False)),
-				})
-	return interfaces
+					logging.exception("Erro ao avisar evento de peer")
+
+
+def get_local_ipv4_interfaces():
+	# Servida do cache da tabela de interfaces (Interfaces.py), não do psutil a cada chamada
+	return Interfaces.shared().interfaces()
 
 
 def select_local_ip_for_peer(peer_ip):
-	peer = ipaddress.IPv4Address(peer_ip)
-	for iface in get_local_ipv4_interfaces():
-		try:
-			if peer in ipaddress.IPv4Network(iface["network"], strict=False):
-				return iface["ip"]
-		except Exception:
-			continue
-	# fallback: first non-loopback
-	for iface in get_local_ipv4_interfaces():
-		if not iface["ip"].startswith("127."):
-			return iface["ip"]
-	return "127.0.0.1"
+	return Interfaces.shared().local_ip_for(peer_ip)
+
+
+class BeaconSchedule:
+	"""Quando anunciar: rajada rápida ao iniciar (ou no trigger) e recuo exponencial até o intervalo estável."""
+
+	def __init__(self, fast=BEACON_FAST, steady=BEACON_STEADY, jitter=BEACON_JITTER, rng=None):
+		self.fast = float(fast)
+		self.steady = float(steady)
+		self.jitter = float(jitter)
+		self._rng = rng or random.Random()
+		self.restart(0.0)
+
+	@property
+	def ttl(self):
+		"""Prazo anunciado nos beacons: sem notícias por este tempo, os outros nos tiram da lista."""
+		return int(self.steady * TTL_FACTOR)
+
+	def restart(self, now):
+		self._interval = self.fast
+		self.next_at = now
+
+	def sent(self, now, cap=None):
+		"""Anúncio enviado em `now`: agenda o próximo (cap limita o intervalo, ex: LEGACY_INTERVAL)."""
+		steady = self.steady if cap is None else min(self.steady, cap)
+		interval = min(self._interval, steady)
+		if interval >= steady:
+			interval *= 1.0 + self._rng.uniform(-self.jitter, self.jitter)
+		self.next_at = now + interval
+		self._interval = min(self._interval * 2, self.steady)
+		return interval
 
 
 class DiscoveryService:
+	"""Beacons em multicast (ou broadcast) com o calendário do BeaconSchedule e QUERY ao iniciar ou no trigger.
+
+	Um QUERY também anuncia quem pergunta e leva os hashes dos peers que ele já conhece: esses
+	não respondem (supressão por resposta conhecida, como no mDNS); os demais respondem com um
+	beacon unicast depois de um atraso aleatório, para a rajada de respostas não chegar junta
+	(em redes grandes, só uma amostra de ~QUERY_RESPONSE_TARGET deles).
+	"""
 
-	def __init__(self, self_id, display_name="Concord", username=None, broadcast_port=37020, control_port=38020, beacon_interval=1.0, on_update=None):
+	def __init__(self, self_id, display_name="Concord", username=None, broadcast_port=37020, control_port=38020, beacon_interval=BEACON_STEADY, on_update=None, relay_port=None, mux=None, beacon_format=BEACON_FORMAT, transport=DISCOVERY_TRANSPORT, multicast_group=MULTICAST_GROUP, multicast_ttl=MULTICAST_TTL):
 		self.self_id = self_id
 		self.display_name = display_name
 		self.username = username or display_name
 		self.broadcast_port = broadcast_port
 		self.control_port = control_port
+		# beacon_interval é o intervalo estável; a rajada inicial começa em BEACON_FAST
 		self.beacon_interval = beacon_interval
+		self.schedule = BeaconSchedule(steady=beacon_interval)
+		# Porta do relay de mídia hospedado por este nó (None = não hospeda); anunciada nos beacons
+		self.relay_port = relay_port
 		self.registry = PeerRegistry(self_id)
+		self._callable = (None, ())  # (snapshot do registro, peers chamáveis dele)
+		# A interface só é avisada quando a lista muda (entrada, saída ou dados novos), não a cada beacon
 		self._on_update = on_update
+		self.registry.subscribe(self._on_peer_event)
+		# Porta única (Mux.UdpMux): o socket de broadcast entra no laço do mux e peers novos
+		# recebem um beacon unicast na porta de controle, sem esperar o próximo broadcast
+		self.mux = mux
+		if beacon_format not in BEACON_FORMATS:
+			raise ValueError(f"Formato de beacon desconhecido: {beacon_format}")
+		self.beacon_format = beacon_format
+		if transport not in DISCOVERY_TRANSPORTS:
+			raise ValueError(f"Transporte de descoberta desconhecido: {transport}")
+		self.transport = transport
+		self.multicast_group = multicast_group
+		self.multicast_ttl = int(multicast_ttl)
+		self._listen_sock = None
+		self._joined = set()  # IPs das interfaces em que o grupo foi assinado
+		self._legacy_at = None  # último beacon de uma versão antiga (JSON sem ttl)
+		# Beacon local codificado uma vez; refeito só quando nome, portas, redes ou formato mudam
+		self._encoded = {}  # reply -> (chave, [datagramas])
+		self.encodes = 0
+		# (ip, datagrama) -> (id do peer, versão antiga?): o mesmo beacon de novo só renova o prazo, sem decodificar
+		self._seen = {}
+		self.fast_path_hits = 0
+		self.queries_answered = 0
+		self.queries_suppressed = 0
+		self.queries_sampled_out = 0
+		self._sock = None
+		self._query_pending = True
+		self._wake = threading.Event()
 		self._running = False
 		self._beacon_thread = threading.Thread(target=self._beacon_loop)
 		self._listen_thread = threading.Thread(target=self._listen_loop)
@@ -92,117 +302,217 @@ class DiscoveryService:
 
 	def start(self):
 		self._running = True
+		self._sock = self._open_send_socket()
+		self.schedule.restart(time.monotonic())
+		Interfaces.shared().subscribe(self._on_interfaces_changed)
+		self._query_pending = True
+		if self.mux is not None:
+			self.mux.attach(self._bind_listen_socket(), self._on_mux_datagram)
+			self.mux.on_raw(Beacon.MAGIC, self._on_mux_datagram)
+			self.mux.on("BEACON", self._on_mux_message)
+			self.mux.on("BYE", self._on_mux_message)
+		else:
+			self._listen_thread.start()
 		self._beacon_thread.start()
-		self._listen_thread.start()
 
 	def stop(self):
 		self._running = False
+		self._wake.set()
+		Interfaces.shared().unsubscribe(self._on_interfaces_changed)
+		if self.mux is not None:
+			self.mux.off("BEACON")
+			self.mux.off("BYE")
 		try:
 			self._beacon_thread.join(timeout=1.0)
-			self._listen_thread.join(timeout=1.0)
+			if self._listen_thread.is_alive():
+				self._listen_thread.join(timeout=1.0)
 		except Exception:
 			pass
+		if self._sock is not None:
+			self._sock.close()
 
 	def get_peers(self):
-		return self.registry.list_active()
+		"""Peers que podem ser chamados (sem os nós que só anunciam um relay), refeito só quando o registro muda."""
+		snapshot = self.registry.snapshot()
+		cached = self._callable
+		if cached[0] is not snapshot:
+			cached = self._callable = (snapshot, tuple(p for p in snapshot if not is_relay_only(p)))
+		return cached[1]
+
+	def get_relays(self):
+		"""Peers que anunciam um relay, inclusive os que só fazem isso: os candidatos de Relay.elect."""
+		return tuple(p for p in self.registry.snapshot() if p.get("relay_port"))
+
+	def _on_peer_event(self, event):
+		if self._on_update:
+			try:
+				self._on_update()
+			except Exception:
+				pass
 
 	def _beacon_loop(self):
-		sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-		sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-		sock.settimeout(0.5)
-		
 		while self._running:
 			try:
-				interfaces = get_local_ipv4_interfaces()
-				payload = {
-					"type": "BEACON", "id": self.self_id, "name": self.display_name,
-					"username": self.username, "control_port": self.control_port,
-					"nets": [i["network"] for i in interfaces],
-				}
-				message = json.dumps(payload).encode("utf-8")
-				for iface in interfaces:
-					bcast = iface["broadcast"] or "255.255.255.255"
-					sock.sendto(message, (bcast, self.broadcast_port))
-				time.sleep(self.beacon_interval)
+				now = time.monotonic()
+				if now >= self.schedule.next_at:
+					query, self._query_pending = self._query_pending, False
+					self._announce(query)
+					self.schedule.sent(now, LEGACY_INTERVAL if self._legacy_present(now) else None)
+				# Peers que pararam de anunciar saem mesmo sem ninguém consultar a lista
+				self.registry.expire()
 			except Exception:
-				time.sleep(self.beacon_interval)
-		sock.close()
+				logging.debug("Falha ao enviar beacon", exc_info=True)
+				self.schedule.sent(time.monotonic())
+			self._wake.wait(max(0.0, min(self.schedule.next_at - time.monotonic(), WAKE_MAX)))
+			self._wake.clear()
+
+	def _announce(self, query=False):
+		interfaces = get_local_ipv4_interfaces()
+		messages = self._query_datagrams(interfaces) if query else self._beacon_datagrams(interfaces)
+		self._send_all(self._sock, messages, interfaces)
+
+	def _open_send_socket(self):
+		sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+		if self.transport != "broadcast":
+			sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.multicast_ttl)
+			# Outras instâncias na mesma máquina também ouvem o grupo; o próprio eco é descartado na recepção
+			sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+		return sock
+
+	def _send_all(self, sock, messages, interfaces):
+		# Por interface: multicast saindo por ela se o grupo foi assinado nela, senão broadcast da sub-rede
+		legacy = self.transport == "auto" and self._legacy_present()
+		for iface in interfaces:
+			multicast = self.transport != "broadcast" and iface["ip"] in self._joined
+			if multicast:
+				sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(iface["ip"]))
+			broadcast = not multicast or legacy
+			bcast = iface["broadcast"] or "255.255.255.255"
+			for message in messages:
+				if multicast:
+					sock.sendto(message, (self.multicast_group, self.broadcast_port))
+				if broadcast:
+					sock.sendto(message, (bcast, self.broadcast_port))
+
+	def _join_groups(self, interfaces):
+		sock = self._listen_sock
+		if sock is None or self.transport == "broadcast":
+			return
+		current = {iface["ip"] for iface in interfaces}
+		# Endereços que sumiram: o sistema já desfez a assinatura junto com o endereço
+		self._joined &= current
+		for ip in current - self._joined:
+			if ip.startswith("127."):
+				continue  # loopback normalmente não tem multicast: fica no broadcast
+			mreq = socket.inet_aton(self.multicast_group) + socket.inet_aton(ip)
+			try:
+				sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+			except OSError as e:
+				logging.info("Multicast indisponível em %s (%s); usando broadcast nessa interface.", ip, e)
+				continue
+			self._joined.add(ip)
+
+	def _on_interfaces_changed(self, interfaces):
+		self._join_groups(interfaces)
+
+	def _legacy_present(self, now=None):
+		at = self._legacy_at
+		return at is not None and (time.monotonic() if now is None else now) - at < LEGACY_WINDOW
+
+	def _formats(self):
+		# (binário, JSON) a enviar agora
+		if self.beacon_format == "auto":
+			return True, self._legacy_present()
+		return self.beacon_format != "json", self.beacon_format != "binary"
+
+	def _payload(self, msg_type, nets, reply=False):
+		payload = {
+			"type": msg_type, "id": self.self_id, "name": self.display_name,
+			"username": self.username, "control_port": self.control_port,
+			"nets": list(nets), "ttl": self.schedule.ttl,
+		}
+		if self.relay_port:
+			payload["relay_port"] = self.relay_port
+		if reply:
+			# Resposta unicast a um beacon ou QUERY: quem recebe não responde de volta
+			payload["reply"] = True
+		return payload
+
+	def _beacon_datagrams(self, interfaces, reply=False):
+		nets = tuple(i["network"] for i in interfaces)
+		binary, as_json = self._formats()
+		key = (self.display_name, self.username, self.control_port, self.relay_port, nets, self.schedule.ttl, binary, as_json)
+		cached = self._encoded.get(reply)
+		if cached is not None and cached[0] == key:
+			return cached[1]
+		datagrams = []
+		if binary:
+			datagrams.append(Beacon.encode_beacon(self.self_id, self.display_name, self.username, self.control_port, nets, self.relay_port, reply, ttl=self.schedule.ttl))
+		if as_json:
+			datagrams.append(json.dumps(self._payload("BEACON", nets, reply)).encode("utf-8"))
+		self._encoded[reply] = (key, datagrams)
+		self.encodes += 1
+		return datagrams
+
+	def _query_datagrams(self, interfaces):
+		# Não vai para o cache: a lista de peers conhecidos muda entre um QUERY e outro
+		nets = tuple(i["network"] for i in interfaces)
+		known = [Beacon.peer_hash(p["id"]) for p in self.registry.snapshot()][:Beacon.MAX_KNOWN]
+		binary, as_json = self._formats()
+		datagrams = []
+		if binary:
+			datagrams.append(Beacon.encode_query(self.self_id, self.display_name, self.username, self.control_port, nets, self.relay_port, ttl=self.schedule.ttl, known=known))
+		if as_json:
+			# Versões antigas ignoram o QUERY; elas nos veem pelo beacon seguinte da rajada
+			payload = self._payload("QUERY", nets)
+			payload["known"] = known
+			datagrams.append(json.dumps(payload).encode("utf-8"))
+		return datagrams
 
 	def send_goodbye(self):
 		# Send a one-shot BYE to notify peers we are going offline
 		try:
-			sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-			sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+			sock = self._open_send_socket()
 			payload = {
 				"type": "BYE",
 				"id": self.self_id,
 			}
-			msg = json.dumps(payload).encode("utf-8")
-			for iface in get_local_ipv4_interfaces():
-				bcast = iface["broadcast"] or "255.255.255.255"
-				sock.sendto(msg, (bcast, self.broadcast_port))
+			binary, as_json = self._formats()
+			messages = []
+			if binary:
+				messages.append(Beacon.encode_bye(self.self_id))
+			if as_json:
+				messages.append(json.dumps(payload).encode("utf-8"))
+			self._send_all(sock, messages, get_local_ipv4_interfaces())
 			sock.close()
 		except Exception:
 			pass
 
 	def trigger_beacon(self):
-		"""Envia um único beacon de descoberta imediatamente em todas as interfaces."""
-		try:
-			sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-			sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-			
-			interfaces = get_local_ipv4_interfaces()
-			payload = {
-				"type": "BEACON", "id": self.self_id, "name": self.display_name,
-				"username": self.username, "control_port": self.control_port,
-				"nets": [i["network"] for i in interfaces],
-			}
-			message = json.dumps(payload).encode("utf-8")
-			
-			for iface in interfaces:
-				bcast = iface["broadcast"] or "255.255.255.255"
-				sock.sendto(message, (bcast, self.broadcast_port))
-			
-			sock.close()
-		except Exception:
-			pass
+		"""Pergunta agora quem está na rede e recomeça a rajada de anúncios (ex: botão de atualizar, rede nova)."""
+		self.schedule.restart(time.monotonic())
+		self._query_pending = True
+		self._wake.set()
 
-	def _listen_loop(self):
+	def _bind_listen_socket(self):
 		sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 		sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 		sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
 		sock.bind(("", self.broadcast_port))
+		# O mesmo socket recebe os broadcasts e o grupo multicast, assinado em cada interface
+		self._listen_sock = sock
+		self._join_groups(get_local_ipv4_interfaces())
+		return sock
+
+	def _listen_loop(self):
+		sock = self._bind_listen_socket()
 		sock.settimeout(0.5)
 		while self._running:
 			try:
 				data, addr = sock.recvfrom(2048)
-				peer_ip = addr[0]
 				try:
-					msg = json.loads(data.decode("utf-8"))
-					if msg.get("type") == "BEACON" and "id" in msg and "control_port" in msg:
-						# determine shared network for grouping
-						shared = None
-						my_nets = {i["network"] for i in get_local_ipv4_interfaces()}
-						for net in msg.get("nets", []):
-							if net in my_nets:
-								shared = net
-								break
-						self.registry.upsert_peer(msg["id"], peer_ip, int(msg["control_port"]), msg.get("name", "Concord"), msg.get("username"))
-						if self._on_update:
-							try:
-								self._on_update()
-							except Exception:
-								pass
-					elif msg.get("type") == "BYE" and "id" in msg:
-						# Remove peer from registry on goodbye
-						with self.registry._lock:
-							self.registry._peers.pop(msg["id"], None)
-						if self._on_update:
-							try:
-								self._on_update()
-							except Exception:
-								pass
-						# annotate grouping by network (optional: stored externally)
+					self._handle_datagram(data, addr[0])
 				except Exception:
 					pass
 			except Exception:
@@ -210,33 +520,238 @@ class DiscoveryService:
 				continue
 		sock.close()
 
+	def _on_mux_datagram(self, view, addr):
+		try:
+			self._handle_datagram(bytes(view), addr[0])
+		except Exception:
+			pass
 
-def find_free_udp_port(bind_ip):
+	def _handle_datagram(self, data, peer_ip):
+		# Caminho rápido: mesmo peer, mesmo conteúdo (o próprio datagrama é a chave) -> só renova o prazo
+		key = (peer_ip, data)
+		seen = self._seen.get(key, False)
+		if seen is None:
+			return  # nosso próprio beacon, de volta pelo broadcast
+		if seen and self.registry.touch(seen[0]):
+			self.fast_path_hits += 1
+			if seen[1]:
+				self._legacy_at = time.monotonic()
+			return
+		if Beacon.is_beacon(data):
+			msg = Beacon.decode(data)
+			legacy = False
+		elif data[:1] == b"{":
+			msg = json.loads(data.decode("utf-8"))
+			legacy = isinstance(msg, dict) and "ttl" not in msg
+		else:
+			return  # tráfego estranho na porta de descoberta
+		if not isinstance(msg, dict):
+			return
+		self._handle_message(msg, peer_ip)
+		if msg.get("type") == "BEACON" and "id" in msg:
+			if len(self._seen) >= SEEN_BEACONS_MAX:
+				# Conteúdos antigos (peers que mudaram de nome ou de rede) saem todos de uma vez
+				self._seen.clear()
+			if msg["id"] == self.self_id:
+				self._seen[key] = None
+			else:
+				self._seen[key] = (msg["id"], legacy)
+				if legacy:
+					self._legacy_at = time.monotonic()
+
+	def _on_mux_message(self, msg, addr):
+		try:
+			self._handle_message(msg, addr[0])
+		except Exception:
+			pass
+
+	def _handle_message(self, msg, peer_ip):
+		if msg.get("type") in ("BEACON", "QUERY") and "id" in msg and "control_port" in msg:
+			if msg["id"] == self.self_id:
+				return
+			# determine shared network for grouping
+			shared = None
+			my_nets = Interfaces.shared().networks()
+			for net in msg.get("nets", []):
+				if net in my_nets:
+					shared = net
+					break
+			is_new = self.registry.upsert_peer(msg["id"], peer_ip, int(msg["control_port"]), msg.get("name", "Concord"), msg.get("username"), msg.get("relay_port"), msg.get("ttl"))
+			if msg["type"] == "QUERY":
+				self._answer_query(msg, peer_ip)
+			elif is_new and self.mux is not None and not msg.get("reply") and int(msg["control_port"]):
+				# Peer novo: ele nos conhece já, sem esperar o próximo broadcast
+				try:
+					self.mux.sendto(self._beacon_datagrams(get_local_ipv4_interfaces(), reply=True)[0], (peer_ip, int(msg["control_port"])))
+				except OSError:
+					pass
+		elif msg.get("type") == "BYE" and "id" in msg:
+			# Remove peer from registry on goodbye
+			self.registry.remove_peer(msg["id"])
+			# annotate grouping by network (optional: stored externally)
+
+	def _answer_query(self, msg, peer_ip):
+		if Beacon.peer_hash(self.self_id) in (msg.get("known") or ()):
+			# Quem perguntou já nos conhece (e o nosso prazo lá vale): nada a responder
+			self.queries_suppressed += 1
+			return
+		network_size = len(self.registry.snapshot()) + 1
+		if network_size > QUERY_RESPONSE_TARGET and random.random() >= QUERY_RESPONSE_TARGET / network_size:
+			self.queries_sampled_out += 1
+			return
+		self.queries_answered += 1
+		timer = threading.Timer(random.uniform(*QUERY_RESPONSE_DELAY), self._send_query_response, (peer_ip,))
+		timer.daemon = True
+		timer.start()
+
+	def _send_query_response(self, peer_ip):
+		sock = self._sock
+		if not self._running or sock is None:
+			return
+		try:
+			sock.sendto(self._beacon_datagrams(get_local_ipv4_interfaces(), reply=True)[0], (peer_ip, self.broadcast_port))
+		except OSError:
+			pass
+
+
+def bind_media_socket(bind_ip):
+	"""Socket UDP de mídia já vinculado a uma porta livre; é entregue aberto para a VoipRoom."""
 	s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-	s.bind((bind_ip, 0))
-	port = s.getsockname()[1]
-	s.close()
-	return port
+	try:
+		s.bind((bind_ip, 0))
+	except OSError:
+		s.close()
+		raise
+	return s
+
+
+class MediaSocketPool:
+	"""Sockets de mídia vinculados com antecedência, por IP local.
+
+	A negociação (OFFER/ACCEPT) pega um socket pronto e o entrega à VoipRoom, então a
+	porta anunciada é a mesma que recebe a mídia (sem fechar e vincular de novo) e
+	aceitar uma chamada não cria socket no caminho crítico: a reposição é em segundo plano.
+	"""
+
+	def __init__(self, size=2):
+		self.size = int(size)
+		self._lock = threading.Lock()
+		self._idle = {}  # ip -> [socket]
+		self.hits = 0
+		self.misses = 0
+
+	def warm(self, bind_ips):
+		"""Vincula `size` sockets para cada IP em segundo plano."""
+		for ip in bind_ips:
+			threading.Thread(target=self._refill, args=(ip,), daemon=True).start()
+
+	def acquire(self, bind_ip):
+		with self._lock:
+			idle = self._idle.get(bind_ip)
+			sock = idle.pop() if idle else None
+		if sock is None:
+			self.misses += 1
+			sock = bind_media_socket(bind_ip)
+		else:
+			self.hits += 1
+		threading.Thread(target=self._refill, args=(bind_ip,), daemon=True).start()
+		return sock
+
+	def give_back(self, sock):
+		"""Devolve um socket que não chegou a ser usado (chamada recusada ou sem resposta)."""
+		try:
+			bind_ip = sock.getsockname()[0]
+		except OSError:
+			return
+		with self._lock:
+			idle = self._idle.setdefault(bind_ip, [])
+			if len(idle) < self.size:
+				idle.append(sock)
+				return
+		sock.close()
+
+	def _refill(self, bind_ip):
+		while True:
+			with self._lock:
+				if len(self._idle.get(bind_ip, ())) >= self.size:
+					return
+			try:
+				sock = bind_media_socket(bind_ip)
+			except OSError:
+				return
+			with self._lock:
+				idle = self._idle.setdefault(bind_ip, [])
+				if len(idle) < self.size:
+					idle.append(sock)
+					continue
+			sock.close()
+			return
+
+	def close(self):
+		with self._lock:
+			idle, self._idle = self._idle, {}
+		for socks in idle.values():
+			for sock in socks:
+				sock.close()
 
 
 class ControlServer:
+	"""Recebe ofertas de chamada e guarda uma tabela de ofertas pendentes para o usuário decidir.
+
+	Cada oferta é identificada pela transação (tid) e por quem chama: uma nova tentativa do
+	mesmo chamador substitui a anterior. Ofertas que o chamador deixou de retransmitir expiram.
+	Acima da capacidade (capacity_fn, ex: menor durante uma chamada) a resposta é BUSY na hora.
+	Com um Mux.UdpMux não há socket nem thread próprios: as mensagens chegam pelo laço do mux
+	e a mídia aceita usa a mesma porta.
+	"""
 
-	def __init__(self, control_port, on_update=None):
+	def __init__(self, control_port, on_update=None, media_pool=None, max_pending=MAX_PENDING_OFFERS, capacity_fn=None, mux=None):
 		self.control_port = control_port
+		self.media_pool = media_pool
+		self.mux = mux
+		self.max_pending = int(max_pending)
+		self._capacity_fn = capacity_fn
 		self._running = False
 		self._thread = threading.Thread(target=self._serve)
 		self._thread.daemon = True
-		self.pending_offer = None
+		self.offers = {}  # tid -> oferta, em ordem de chegada
 		self._on_update = on_update
 		self._lock = threading.Lock()
 		self._sock = None # Manter referência ao socket
+		# tid -> (última resposta enviada, instante): retransmissões da mesma oferta só repetem a resposta
+		self._transactions = {}
+		self._last_expire = time.monotonic()
+		self.duplicates = 0
+		self.busy_replies = 0
+
+	@property
+	def pending_offer(self):
+		"""A oferta mais antiga ainda pendente (a que /accept e /reject atendem por padrão)."""
+		with self._lock:
+			return next(iter(self.offers.values()), None)
+
+	def list_offers(self):
+		with self._lock:
+			return list(self.offers.values())
 
 	def start(self):
 		self._running = True
-		self._thread.start()
+		if self.mux is not None:
+			self._sock = self.mux
+			self.mux.on("OFFER", self._handle_message)
+			self.mux.on("CANCEL", self._handle_message)
+			self.mux.on_tick(self._expire)
+		else:
+			self._thread.start()
 
 	def stop(self):
 		self._running = False
+		if self.mux is not None:
+			self.mux.off("OFFER")
+			self.mux.off("CANCEL")
+			self.mux.off_tick(self._expire)
+			self._sock = None
+			return
 		try:
 			self._thread.join(timeout=1.0)
 		except Exception:
@@ -249,30 +764,10 @@ class ControlServer:
 		self._sock.settimeout(0.5)
 		while self._running:
 			try:
+				self._expire()
 				data, addr = self._sock.recvfrom(2048)
-				peer_ip, peer_port = addr
 				try:
-					msg = json.loads(data.decode("utf-8"))
-					if msg.get("type") == "OFFER" and "caller_media_port" in msg and "username" in msg:
-						# armazenar oferta para ação do usuário (aceitar/recusar)
-						local_ip = select_local_ip_for_peer(peer_ip)
-						with self._lock:
-							self.pending_offer = {
-								"peer_username": msg.get("username"),
-								"peer_ip": peer_ip,
-								"peer_addr": addr,
-								"peer_media_port": int(msg["caller_media_port"]),
-								"local_ip": local_ip,
-							}
-						try:
-							# Enviar resposta de "RINGING" para indicar que recebeu a chamada
-							ringing_response = {"type": "RINGING"}
-							self._sock.sendto(json.dumps(ringing_response).encode("utf-8"), addr)
-							# Notificar que o estado mudou (nova oferta pendente)
-							if self._on_update:
-								self._on_update()
-						except Exception:
-							pass
+					self._handle_message(json.loads(data.decode("utf-8")), addr)
 				except Exception:
 					pass
 			except Exception:
@@ -281,90 +776,270 @@ class ControlServer:
 		if self._sock:
 			self._sock.close()
 
-	def accept_pending(self):
+	def _handle_message(self, msg, addr):
+		if msg.get("type") == "OFFER" and "caller_media_port" in msg and "username" in msg:
+			self._handle_offer(msg, addr)
+		elif msg.get("type") == "CANCEL" and msg.get("tid"):
+			self._finish(msg["tid"], "REJECT")
+
+	def _handle_offer(self, msg, addr):
+		peer_ip, peer_port = addr
+		# Versões sem tid: a transação é identificada pelo endereço e porta de mídia do chamador
+		tid = msg.get("tid") or "%s:%s:%s" % (peer_ip, peer_port, msg["caller_media_port"])
+		now = time.monotonic()
+		with self._lock:
+			known = self._transactions.get(tid)
+			if known is not None:
+				# Retransmissão: repete a última resposta (RINGING, ACCEPT, REJECT ou BUSY) e mantém a oferta viva
+				self.duplicates += 1
+				if tid in self.offers:
+					self.offers[tid]["last_seen"] = now
+				reply = known[0]
+			else:
+				# Nova tentativa do mesmo chamador substitui a oferta anterior dele
+				for old_tid, old in list(self.offers.items()):
+					if old["peer_ip"] == peer_ip and old["peer_username"] == msg.get("username"):
+						del self.offers[old_tid]
+				capacity = self._capacity_fn() if self._capacity_fn else self.max_pending
+				if len(self.offers) >= min(capacity, self.max_pending):
+					# Ocupado: o chamador desiste na hora em vez de esperar o tempo limite
+					self.busy_replies += 1
+					reply = json.dumps({"type": "BUSY", "tid": tid}).encode("utf-8")
+					self._transactions[tid] = (reply, now)
+					known = True
+				else:
+					reply = json.dumps({"type": "RINGING", "tid": tid}).encode("utf-8")
+					self._transactions[tid] = (reply, now)
+					# armazenar oferta para ação do usuário (aceitar/recusar)
+					self.offers[tid] = {
+						"tid": tid,
+						"peer_username": msg.get("username"),
+						"peer_ip": peer_ip,
+						"peer_addr": addr,
+						"peer_media_port": int(msg["caller_media_port"]),
+						"local_ip": select_local_ip_for_peer(peer_ip),
+						"codec": msg.get("codec") or "pcm",
+						"codec_rate": msg.get("codec_rate"),
+						"fec_group": msg.get("fec_group") or 0,
+						"frame_ms": msg.get("frame_ms"),
+						"relay": msg.get("relay"),
+						"received_at": now,
+						"last_seen": now,
+					}
+		try:
+			self._sock.sendto(reply, addr)
+		except OSError:
+			pass
+		if known is None and self._on_update:
+			# Notificar que o estado mudou (nova oferta pendente)
+			self._on_update()
+
+	def _take(self, tid):
+		# Chamado com o lock: remove e devolve a oferta pedida (ou a mais antiga)
+		if tid is None:
+			tid = next(iter(self.offers), None)
+		return self.offers.pop(tid, None) if tid is not None else None
+
+	def _finish(self, tid, reply_type):
+		"""Encerra uma oferta com REJECT (recusa ou cancelamento do chamador)."""
+		with self._lock:
+			offer = self._take(tid)
+			if offer is None:
+				return False
+			reply = json.dumps({"type": reply_type, "tid": offer["tid"]}).encode("utf-8")
+			# Retransmissões atrasadas da oferta recebem a mesma resposta em vez de voltar a tocar
+			self._transactions[offer["tid"]] = (reply, time.monotonic())
+			if self._sock:
+				try:
+					self._sock.sendto(reply, offer["peer_addr"])
+				except OSError:
+					pass
+		if self._on_update:
+			self._on_update()
+		return True
+
+	def _expire(self):
+		now = time.monotonic()
+		if now - self._last_expire < 0.5:
+			return
+		self._last_expire = now
+		with self._lock:
+			for tid in [t for t, (_resp, at) in self._transactions.items() if now - at > TRANSACTION_TTL]:
+				del self._transactions[tid]
+			# O chamador retransmite enquanto espera; sem notícias dele a oferta caducou
+			stale = [t for t, o in self.offers.items() if now - o["last_seen"] > OFFER_IDLE_TIMEOUT]
+			for tid in stale:
+				del self.offers[tid]
+		if stale and self._on_update:
+			self._on_update()
+
+	def accept_pending(self, tid=None):
 		with self._lock:
-			if not self.pending_offer:
+			offer = self._take(tid)
+			if offer is None:
 				return None
-			# abrir socket efêmero/porta para mídia
-			local_ip = self.pending_offer["local_ip"]
-			my_media_port = find_free_udp_port(local_ip)
+			# socket de mídia já vinculado (do pool, quando houver): a porta anunciada é a que vai receber;
+			# com o mux a mídia chega na própria porta de controle
+			local_ip = offer["local_ip"]
+			if self.mux is not None:
+				media_socket = None
+				my_media_port = self.mux.port
+			else:
+				media_socket = self.media_pool.acquire(local_ip) if self.media_pool else bind_media_socket(local_ip)
+				my_media_port = media_socket.getsockname()[1]
 			response = {
 				"type": "ACCEPT",
+				"tid": offer["tid"],
 				"callee_media_port": my_media_port,
+				"codec": offer["codec"],
+				"codec_rate": offer["codec_rate"],
 			}
+			response = json.dumps(response).encode("utf-8")
 			# Enviar resposta usando o socket do servidor para maior confiabilidade
 			if self._sock:
-				self._sock.sendto(json.dumps(response).encode("utf-8"), self.pending_offer["peer_addr"])
+				self._transactions[offer["tid"]] = (response, time.monotonic())
+				self._sock.sendto(response, offer["peer_addr"])
 			else:
+				self.offers[offer["tid"]] = offer
+				if media_socket is not None:
+					media_socket.close()
 				return None # Não é possível aceitar se o servidor não estiver rodando
 			accepted = {
-				"peer_ip": self.pending_offer["peer_ip"],
-				"peer_media_port": self.pending_offer["peer_media_port"],
+				"peer_ip": offer["peer_ip"],
+				"peer_media_port": offer["peer_media_port"],
 				"my_media_port": my_media_port,
+				"media_socket": media_socket,
 				"local_ip": local_ip,
+				"codec": offer["codec"],
+				"codec_rate": offer["codec_rate"],
+				"fec_group": offer["fec_group"],
+				"frame_ms": offer["frame_ms"],
+				"relay": offer["relay"],
+				"accepted_at": time.monotonic(),
 			}
-			self.pending_offer = None
 		if self._on_update:
 			self._on_update()
 		return accepted
 
-	def reject_pending(self):
-		with self._lock:
-			if not self.pending_offer:
-				return False
-			rej = {"type": "REJECT"}
-			# Enviar resposta usando o socket do servidor
-			if self._sock:
-				self._sock.sendto(json.dumps(rej).encode("utf-8"), self.pending_offer["peer_addr"])
-			self.pending_offer = None
-
-		if self._on_update:
-			self._on_update()
-		return True
+	def reject_pending(self, tid=None):
+		return self._finish(tid, "REJECT")
 
 
-def initiate_call(peer_ip, peer_control_port, my_username="User", timeout_seconds=10.0):
-	ctrl_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-	ctrl_sock.settimeout(1.0)
-	local_ip = select_local_ip_for_peer(peer_ip)
-	my_media_port = find_free_udp_port(local_ip)
+def initiate_call(peer_ip, peer_control_port, my_username="User", timeout_seconds=10.0, codec="pcm", codec_rate=None, fec_group=0, frame_ms=None, media_ip=None, media_port=None, relay=None, on_ringing=None, media_pool=None, cancel=None, outcome=None, mux=None):
+	# Com o mux a oferta sai da porta única e as respostas chegam pela fila da transação
+	ctrl_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) if mux is None else mux
+	# Convite para uma conferência em andamento reaproveita o socket de mídia da sala;
+	# senão o socket é vinculado agora e entregue pronto para a VoipRoom
+	local_ip = media_ip or select_local_ip_for_peer(peer_ip)
+	media_socket = None
+	if media_port:
+		my_media_port = media_port
+	elif mux is not None:
+		my_media_port = mux.port
+	else:
+		media_socket = media_pool.acquire(local_ip) if media_pool else bind_media_socket(local_ip)
+		my_media_port = media_socket.getsockname()[1]
 	offer = {
 		"type": "OFFER",
 		"username": my_username,
 		"caller_media_port": my_media_port,
+		"codec": codec,
+		"codec_rate": codec_rate,
+		"fec_group": fec_group,
+		"frame_ms": frame_ms,
+		"relay": list(relay) if relay else None,
 	}
-	deadline = time.time() + timeout_seconds
+	# Cada chamada é uma transação: as respostas ecoam o tid e retransmissões da oferta são deduplicadas
+	offer["tid"] = new_transaction_id()
+	payload = json.dumps(offer).encode("utf-8")
+	replies = mux.expect(offer["tid"], (peer_ip, peer_control_port)) if mux is not None else None
+	start = time.monotonic()
+	deadline = start + timeout_seconds
+	timings = {"ringing_ms": None, "accept_ms": None, "offers_sent": 0}
+	# Motivo do fim da tentativa, para quem chamou mostrar ao usuário
+	outcome = {} if outcome is None else outcome
+	outcome["reason"] = "timeout"
 	response = None
 	ringing_received = False
-	last_send = 0
-	
-	while time.time() < deadline and response is None:
+	interval = RETRANSMIT_INITIAL
+	next_send = start
+
+	while response is None:
+		now = time.monotonic()
+		if now >= deadline:
+			break
+		if cancel is not None and cancel.is_set():
+			# Desistência do chamador: avisa o outro lado para parar de tocar
+			try:
+				ctrl_sock.sendto(json.dumps({"type": "CANCEL", "tid": offer["tid"]}).encode("utf-8"), (peer_ip, peer_control_port))
+			except OSError:
+				pass
+			outcome["reason"] = "cancelled"
+			break
 		try:
-			# Enviar oferta apenas uma vez por segundo
-			if not ringing_received or (time.time() - last_send) > 1.0:
-				ctrl_sock.sendto(json.dumps(offer).encode("utf-8"), (peer_ip, peer_control_port))
-				last_send = time.time()
-			
-			data, _ = ctrl_sock.recvfrom(2048)
-			msg = json.loads(data.decode("utf-8"))
-			
+			# Retransmite com recuo exponencial até o RINGING; depois só de tempos em tempos, para
+			# que o outro lado repita a resposta final caso ela se perca
+			if now >= next_send:
+				ctrl_sock.sendto(payload, (peer_ip, peer_control_port))
+				timings["offers_sent"] += 1
+				next_send = now + (RINGING_REFRESH if ringing_received else interval)
+				interval = min(interval * 2, RETRANSMIT_MAX)
+			wait = max(0.001, min(next_send, deadline, now + CANCEL_POLL) - now)
+			if replies is not None:
+				msg = replies.get(timeout=wait)
+			else:
+				ctrl_sock.settimeout(wait)
+				data, _ = ctrl_sock.recvfrom(2048)
+				msg = json.loads(data.decode("utf-8"))
+			if msg.get("tid") not in (None, offer["tid"]):
+				# Resposta de outra transação (ex: tentativa anterior que chegou atrasada)
+				continue
+
 			if msg.get("type") == "RINGING":
+				if not ringing_received:
+					timings["ringing_ms"] = (time.monotonic() - start) * 1000.0
+					next_send = time.monotonic() + RINGING_REFRESH
+					if on_ringing:
+						# O outro lado está tocando: hora do tom de chamando
+						try:
+							on_ringing()
+						except Exception:
+							pass
+					print("Chamando... aguardando resposta...")
 				ringing_received = True
-				print("Chamando... aguardando resposta...")
 			elif msg.get("type") == "ACCEPT" and "callee_media_port" in msg:
+				timings["accept_ms"] = (time.monotonic() - start) * 1000.0
 				response = int(msg["callee_media_port"])
+				outcome["reason"] = "accepted"
 			elif msg.get("type") == "REJECT":
-				ctrl_sock.close()
-				return None
-		except socket.timeout:
+				outcome["reason"] = "rejected"
+				break
+			elif msg.get("type") == "BUSY":
+				outcome["reason"] = "busy"
+				break
+		except (socket.timeout, queue.Empty):
 			continue
 		except Exception:
+			outcome["reason"] = "unreachable"
 			break
-	ctrl_sock.close()
+	if mux is not None:
+		mux.forget(offer["tid"])
+	else:
+		ctrl_sock.close()
 	if response is None:
+		if media_socket is not None:
+			if media_pool:
+				media_pool.give_back(media_socket)
+			else:
+				media_socket.close()
 		return None
 	return {
 		"local_media_port": my_media_port,
+		"media_socket": media_socket,
 		"local_ip": local_ip,
 		"remote_media_port": response,
+		"codec": codec,
+		"codec_rate": codec_rate,
+		"accepted_at": time.monotonic(),
+		"timings": timings,
 	}
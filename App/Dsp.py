@@ -0,0 +1,169 @@
+"""Cadeia de processamento de áudio vetorizada com NumPy.
+
+Substitui o audioop no caminho por quadro (volume e medição de nível). Cada
+quadro passa uma vez pela cadeia: medição RMS/pico -> noise gate -> AGC ->
+ganho (com rampa, sem "zipper noise") -> limitador suave -> int16. Todos os
+buffers são pré-alocados; o processamento é feito no lugar.
+"""
+import math
+import numpy as np
+
+FULL_SCALE = 32768.0
+_TO_FLOAT = np.float32(1.0 / FULL_SCALE)
+SILENCE_DBOV = -127
+
+
+def meter(pcm):
+	"""RMS e pico de um quadro PCM 16 bits, normalizados em 0..1."""
+	samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2)
+	if not len(samples):
+		return 0.0, 0.0
+	f = samples.astype(np.float32)
+	rms = math.sqrt(float(np.dot(f, f)) / len(f)) / FULL_SCALE
+	peak = float(np.max(np.abs(f))) / FULL_SCALE
+	return rms, peak
+
+
+def to_dbov(value):
+	return SILENCE_DBOV if value <= 0 else max(SILENCE_DBOV, 20.0 * math.log10(value))
+
+
+class DspChain:
+	"""Ganho, AGC, noise gate, limitador suave e medição de nível em uma passada por quadro.
+
+	- gain: ganho linear manual (volume), aplicado com rampa ao longo do quadro quando muda.
+	- agc: ajusta o ganho para levar o RMS da fala até `agc_target_dbov` (reduz rápido, aumenta devagar).
+	- gate_dbov: abaixo deste nível o sinal é atenuado até o silêncio (None desliga).
+	- limiter: acima de `limiter_threshold` (fração do fundo de escala) comprime com tanh em vez de saturar.
+	Depois de process(), `rms_dbov` e `peak_dbov` trazem o nível do quadro de entrada.
+	"""
+
+	def __init__(self, frame_samples, gain=1.0, agc=False, agc_target_dbov=-20.0, agc_max_gain_db=20.0, gate_dbov=None, gate_hold_frames=10, limiter=True, limiter_threshold=0.8):
+		self.gain = float(gain)
+		self.agc = bool(agc)
+		self.agc_target_dbov = float(agc_target_dbov)
+		self.agc_max_gain_db = float(agc_max_gain_db)
+		self.gate_dbov = gate_dbov
+		self.gate_hold_frames = int(gate_hold_frames)
+		self.limiter = bool(limiter)
+		self.limiter_threshold = float(limiter_threshold)
+		self.rms = 0.0
+		self.peak = 0.0
+		self._agc_db = 0.0
+		self._gate = 1.0
+		self._gate_hold = 0
+		self._applied = self.gain
+		self._allocate(int(frame_samples))
+
+	def _allocate(self, capacity):
+		# Folga para quadros reamostrados que variam em uma ou duas amostras
+		self._capacity = capacity + 8
+		self._work = np.zeros(self._capacity, dtype=np.float32)
+		self._tmp = np.zeros(self._capacity, dtype=np.float32)
+		self._mask = np.zeros(self._capacity, dtype=bool)
+		self._out = np.zeros(self._capacity, dtype=np.int16)
+		self._out_bytes = memoryview(self._out).cast("B")
+		self._ramps = {}
+
+	def _ramp(self, n):
+		ramp = self._ramps.get(n)
+		if ramp is None:
+			ramp = self._ramps[n] = np.linspace(1.0 / n, 1.0, n, dtype=np.float32)
+		return ramp
+
+	@property
+	def rms_dbov(self):
+		return to_dbov(self.rms)
+
+	@property
+	def peak_dbov(self):
+		return to_dbov(self.peak)
+
+	def process(self, pcm):
+		"""Processa um quadro PCM 16 bits mono.
+
+		Devolve uma view do buffer de saída (válida até a próxima chamada) ou o próprio
+		quadro de entrada quando nada precisa mudar; quem guarda o resultado deve copiá-lo.
+		"""
+		n = len(pcm) // 2
+		if n == 0:
+			return pcm
+		if n > self._capacity:
+			self._allocate(n)
+		samples = np.frombuffer(pcm, dtype=np.int16, count=n)
+		work = self._work[:n]
+		tmp = self._tmp[:n]
+
+		# Medição: RMS e pico da entrada (uma conversão para float32, normalizada)
+		np.multiply(samples, _TO_FLOAT, out=work)
+		self.rms = math.sqrt(float(np.dot(work, work)) / n)
+		self.peak = max(float(work.max()), -float(work.min()))
+		level = to_dbov(self.rms)
+
+		target = self.gain * self._update_gate(level) * self._update_agc(level)
+		start = self._applied
+		self._applied = target
+		# Caminho rápido: ganho unitário, estável, sem risco de passar do limiar
+		if start == target == 1.0 and (not self.limiter or self.peak <= self.limiter_threshold):
+			return pcm
+
+		if start == target:
+			peak = self.peak * target
+		else:
+			# Rampa linear do ganho anterior até o novo ao longo do quadro
+			np.multiply(self._ramp(n), target - start, out=tmp)
+			tmp += start
+			work *= tmp
+			peak = self.peak * max(start, target)
+			target = 1.0
+
+		if self.limiter and peak > self.limiter_threshold:
+			if target != 1.0:
+				work *= np.float32(target)
+				target = 1.0
+			self._soft_limit(work, tmp, self._mask[:n])
+		elif peak > 1.0:
+			np.clip(work, -1.0 / target, 1.0 / target, out=work)
+		# Ganho constante e volta para a escala int16 em uma só multiplicação
+		work *= np.float32(target * (FULL_SCALE - 1))
+		np.copyto(self._out[:n], work, casting="unsafe")
+		return self._out_bytes[:n * 2]
+
+	def _soft_limit(self, work, tmp, mask):
+		# |x| acima do limiar t vira t + (1 - t) * tanh((|x| - t) / (1 - t)): contínuo e sem saturação
+		t = self.limiter_threshold
+		knee = 1.0 - t
+		np.abs(work, out=tmp)
+		np.greater(tmp, t, out=mask)
+		tmp -= t
+		tmp *= 1.0 / knee
+		np.tanh(tmp, out=tmp)
+		tmp *= knee
+		tmp += t
+		np.copysign(tmp, work, out=tmp)
+		np.copyto(work, tmp, where=mask)
+
+	def _update_gate(self, level):
+		if self.gate_dbov is None:
+			return 1.0
+		if level >= self.gate_dbov:
+			self._gate_hold = self.gate_hold_frames
+			self._gate = 1.0
+		elif self._gate_hold > 0:
+			self._gate_hold -= 1
+		else:
+			# Fecha em alguns quadros para não cortar o fim das palavras de forma brusca
+			self._gate *= 0.5
+			if self._gate < 1e-3:
+				self._gate = 0.0
+		return self._gate
+
+	def _update_agc(self, level):
+		if not self.agc:
+			return 1.0
+		# Só adapta com sinal presente: o silêncio não deve puxar o ganho para o máximo
+		if level > self.agc_target_dbov - 40.0 and (self.gate_dbov is None or level >= self.gate_dbov):
+			desired = max(-self.agc_max_gain_db, min(self.agc_max_gain_db, self.agc_target_dbov - level))
+			rate = 0.5 if desired < self._agc_db else 0.05
+			self._agc_db += (desired - self._agc_db) * rate
+		return 10 ** (self._agc_db / 20.0)
@@ -0,0 +1,126 @@
+import struct
+import threading
+
+# Payload de paridade XOR (um pacote a cada N quadros de mídia):
+#   sequência base (2) | quantidade (1) | XOR dos payload types (1) | XOR dos tamanhos (2) | XOR dos timestamps (4) | XOR dos payloads
+PARITY_HEADER = struct.Struct("!HBBHI")
+
+
+def _xor_bytes(a, b):
+	if len(a) < len(b):
+		a, b = b, a
+	return (int.from_bytes(a, "big") ^ int.from_bytes(b.ljust(len(a), b"\x00"), "big")).to_bytes(len(a), "big")
+
+
+class FecEncoder:
+	"""Acumula um grupo de quadros de mídia e gera um pacote de paridade XOR ao completá-lo."""
+
+	def __init__(self, group_size):
+		self.group_size = int(group_size)
+		self._reset()
+
+	def _reset(self):
+		self._base_seq = None
+		self._count = 0
+		self._pt = 0
+		self._length = 0
+		self._ts = 0
+		self._data = b""
+
+	def add(self, seq, payload_type, timestamp, payload):
+		"""Registra um quadro enviado. Retorna (base_seq, payload de paridade) quando o grupo fecha, senão None."""
+		if self.group_size < 2:
+			return None
+		if self._base_seq is None:
+			self._base_seq = seq
+		self._count += 1
+		self._pt ^= payload_type
+		self._length ^= len(payload)
+		self._ts ^= timestamp & 0xFFFFFFFF
+		self._data = _xor_bytes(self._data, bytes(payload))
+		if self._count < self.group_size:
+			return None
+		parity = PARITY_HEADER.pack(self._base_seq & 0xFFFF, self._count, self._pt, self._length, self._ts) + self._data
+		base = self._base_seq
+		self._reset()
+		return base, parity
+
+
+class FecDecoder:
+	"""Reconstrói um quadro perdido por grupo a partir da paridade XOR.
+
+	Trabalha no espaço de sequência estendida (sem wrap-around) do receptor. A reconstrução
+	só acontece quando a reprodução pede um quadro que faltou no prazo (recover), então um
+	quadro apenas fora de ordem não conta como recuperado; se o original chegar depois da
+	reconstrução, ela deixa de contar.
+	"""
+
+	def __init__(self, history=128):
+		self.history = int(history)
+		self._lock = threading.Lock()  # recepção e reprodução rodam em threads diferentes
+		self._media = {}  # seq -> (payload_type, timestamp, payload)
+		self._parity = {}  # base_seq -> (count, pt_xor, len_xor, ts_xor, data_xor)
+		self._rebuilt = set()  # quadros reconstruídos cujo original ainda pode chegar
+		self._active = False  # só guarda cópias da mídia depois que o remetente mostrar que usa FEC
+		self.recovered = 0
+
+	def add_media(self, seq, payload_type, timestamp, payload):
+		"""Registra um quadro recebido."""
+		if not self._active:
+			return
+		with self._lock:
+			if seq in self._rebuilt:
+				# O original chegou depois do prazo: não era perda
+				self._rebuilt.discard(seq)
+				self.recovered -= 1
+				return
+			self._media[seq] = (payload_type, timestamp, bytes(payload))
+			self._trim(seq)
+
+	def add_parity(self, base_seq, parity_payload):
+		"""Registra um pacote de paridade."""
+		if len(parity_payload) < PARITY_HEADER.size:
+			return
+		_base16, count, pt_xor, len_xor, ts_xor = PARITY_HEADER.unpack_from(parity_payload)
+		with self._lock:
+			self._active = True
+			self._parity[base_seq] = (count, pt_xor, len_xor, ts_xor, bytes(parity_payload[PARITY_HEADER.size:]))
+			self._trim(base_seq + count - 1)
+
+	def recover(self, seq):
+		"""Reconstrói `seq`, que faltou no prazo de reprodução. Retorna (seq, payload_type, timestamp, payload) ou None."""
+		with self._lock:
+			if seq in self._media:
+				return None
+			for base, parity in self._parity.items():
+				if base <= seq < base + parity[0]:
+					return self._try_recover(base, seq)
+			return None
+
+	def _try_recover(self, base, seq):
+		count, pt, length, ts, data = self._parity[base]
+		if any(s not in self._media for s in range(base, base + count) if s != seq):
+			return None  # mais de um quadro faltando no grupo
+		for s in range(base, base + count):
+			if s != seq:
+				m_pt, m_ts, m_payload = self._media[s]
+				pt ^= m_pt
+				length ^= len(m_payload)
+				ts ^= m_ts & 0xFFFFFFFF
+				data = _xor_bytes(data, m_payload)
+		del self._parity[base]
+		payload = data[:length].ljust(length, b"\x00")
+		self._rebuilt.add(seq)
+		self.recovered += 1
+		return seq, pt, ts, payload
+
+	def _trim(self, newest):
+		oldest = newest - self.history
+		if len(self._media) > self.history:
+			for s in [s for s in self._media if s < oldest]:
+				del self._media[s]
+		if len(self._parity) > 8:
+			for b in [b for b in self._parity if b < oldest]:
+				del self._parity[b]
+		if len(self._rebuilt) > self.history:
+			self._rebuilt = {s for s in self._rebuilt if s >= oldest}
@@ -0,0 +1,237 @@
+"""Tabela das interfaces IPv4 locais, com cache e detecção de mudanças.
+
+Enumerar as interfaces pelo psutil e interpretar cada endereço com ipaddress é
+caro para o caminho dos beacons (cada beacon enviado ou recebido consultava a
+lista). A tabela guarda a lista já interpretada, com os objetos de rede para
+escolher o IP local de um peer, e só a refaz quando o TTL vence ou quando uma
+mudança é detectada: pelo netlink (RTMGRP_IPV4_IFADDR) no Linux e por
+verificação periódica nos demais sistemas. Assinantes são avisados quando os
+endereços mudam (ex: Wi-Fi trocou de rede, ZeroTier subiu).
+"""
+import socket
+import struct
+import threading
+import time
+import ipaddress
+import logging
+import psutil
+
+TTL = 30.0  # validade do cache mesmo sem aviso de mudança
+POLL_INTERVAL = 2.0  # verificação periódica quando não há netlink
+DEBOUNCE = 0.2  # rajadas de eventos do netlink viram uma única releitura
+
+# netlink (linux/rtnetlink.h)
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+NLMSG_HEADER = struct.Struct("=IHHII")
+RTM_NEWLINK, RTM_DELLINK, RTM_NEWADDR, RTM_DELADDR = 16, 17, 20, 21
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared():
+	"""A tabela do processo, criada no primeiro uso."""
+	global _shared
+	with _shared_lock:
+		if _shared is None:
+			_shared = InterfaceTable()
+		return _shared
+
+
+def scan():
+	"""Lê as interfaces IPv4 pelo psutil. Devolve [(dicionário da interface, IPv4Network)]."""
+	entries = []
+	for if_name, addrs in psutil.net_if_addrs().items():
+		for addr in addrs:
+			if addr.family != socket.AF_INET:
+				continue
+			ip = addr.address
+			netmask = addr.netmask or "255.255.255.0"
+			try:
+				network = ipaddress.IPv4Network(f"{ip}/{netmask}", strict=False)
+			except ValueError:
+				continue
+			entries.append(({
+				"name": if_name,
+				"ip": ip,
+				"netmask": netmask,
+				"broadcast": str(network.broadcast_address),
+				"network": str(network),
+			}, network))
+	return entries
+
+
+class InterfaceTable:
+
+	def __init__(self, ttl=TTL, poll_interval=POLL_INTERVAL, scanner=scan):
+		self.ttl = float(ttl)
+		self.poll_interval = float(poll_interval)
+		self._scan = scanner
+		self._lock = threading.Lock()
+		self._entries = []
+		self._interfaces = []
+		self._networks = frozenset()
+		self._signature = None
+		self._expires = 0.0
+		self._subs = []
+		self._watcher = None
+		self._running = False
+		self.scans = 0
+		self.changes = 0
+		self.mode = None  # "netlink" ou "poll" depois do start()
+
+	# ------ Consultas (servidas do cache) ------
+	def interfaces(self):
+		"""Lista das interfaces (dicionários serializáveis em JSON; não devem ser alterados)."""
+		self._ensure_fresh()
+		return list(self._interfaces)
+
+	def networks(self):
+		"""Conjunto das redes locais em texto (ex: "192.168.0.0/24")."""
+		self._ensure_fresh()
+		return self._networks
+
+	def local_ip_for(self, peer_ip):
+		"""IP local da interface na mesma rede do peer; senão o primeiro que não é loopback."""
+		self._ensure_fresh()
+		entries = self._entries
+		try:
+			peer = ipaddress.IPv4Address(peer_ip)
+		except ValueError:
+			peer = None
+		if peer is not None:
+			for iface, network in entries:
+				if peer in network:
+					return iface["ip"]
+		for iface, _network in entries:
+			if not iface["ip"].startswith("127."):
+				return iface["ip"]
+		return "127.0.0.1"
+
+	# ------ Assinaturas ------
+	def subscribe(self, fn):
+		"""fn(interfaces) é chamada (na thread do observador) quando os endereços mudam."""
+		with self._lock:
+			self._subs.append(fn)
+
+	def unsubscribe(self, fn):
+		with self._lock:
+			if fn in self._subs:
+				self._subs.remove(fn)
+
+	# ------ Atualização ------
+	def _ensure_fresh(self):
+		if time.monotonic() >= self._expires:
+			self.refresh(stale_only=True)
+
+	def refresh(self, stale_only=False):
+		"""Relê as interfaces agora. Devolve True se os endereços mudaram."""
+		with self._lock:
+			if stale_only and time.monotonic() < self._expires:
+				# Outra thread releu enquanto esperávamos o lock
+				return False
+			try:
+				entries = self._scan()
+			except Exception:
+				logging.exception("Falha ao enumerar as interfaces de rede")
+				self._expires = time.monotonic() + min(self.ttl, self.poll_interval)
+				return False
+			self.scans += 1
+			self._expires = time.monotonic() + self.ttl
+			signature = tuple(sorted((i["name"], i["ip"], i["netmask"]) for i, _n in entries))
+			if signature == self._signature:
+				return False
+			first = self._signature is None
+			self._signature = signature
+			self._entries = entries
+			self._interfaces = [i for i, _n in entries]
+			self._networks = frozenset(i["network"] for i, _n in entries)
+			if first:
+				return False
+			self.changes += 1
+			interfaces = list(self._interfaces)
+			subs = list(self._subs)
+		for fn in subs:
+			try:
+				fn(interfaces)
+			except Exception:
+				logging.exception("Erro ao avisar mudança das interfaces")
+		return True
+
+	# ------ Observador de mudanças ------
+	def start(self):
+		if self._watcher is not None:
+			return
+		self._running = True
+		self._watcher = threading.Thread(target=self._watch, daemon=True)
+		self._watcher.start()
+
+	def stop(self):
+		self._running = False
+		watcher, self._watcher = self._watcher, None
+		if watcher is not None and watcher is not threading.current_thread():
+			watcher.join(timeout=1.0)
+
+	def _watch(self):
+		sock = self._open_netlink()
+		self.mode = "netlink" if sock is not None else "poll"
+		try:
+			while self._running:
+				if sock is None:
+					time.sleep(self.poll_interval)
+					self.refresh()
+					continue
+				try:
+					data = sock.recv(65536)
+				except socket.timeout:
+					self._ensure_fresh()
+					continue
+				except OSError:
+					# netlink indisponível no meio do caminho: segue por verificação periódica
+					sock.close()
+					sock = None
+					self.mode = "poll"
+					continue
+				if self._is_address_event(data):
+					time.sleep(DEBOUNCE)
+					self._drain(sock)
+					self.refresh()
+		finally:
+			if sock is not None:
+				sock.close()
+
+	def _open_netlink(self):
+		if not hasattr(socket, "AF_NETLINK"):
+			return None
+		try:
+			sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+			sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR))
+			sock.settimeout(1.0)
+			return sock
+		except OSError:
+			return None
+
+	@staticmethod
+	def _is_address_event(data):
+		offset = 0
+		while offset + NLMSG_HEADER.size <= len(data):
+			length, msg_type, _flags, _seq, _pid = NLMSG_HEADER.unpack_from(data, offset)
+			if msg_type in (RTM_NEWLINK, RTM_DELLINK, RTM_NEWADDR, RTM_DELADDR):
+				return True
+			if length < NLMSG_HEADER.size:
+				break
+			offset += (length + 3) & ~3
+		return False
+
+	@staticmethod
+	def _drain(sock):
+		sock.setblocking(False)
+		try:
+			while True:
+				sock.recv(65536)
+		except OSError:
+			pass
+		finally:
+			sock.settimeout(1.0)
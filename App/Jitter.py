@@ -0,0 +1,168 @@
+import threading
+import time
+import math
+
+
+class JitterBuffer:
+	"""Buffer de reprodução adaptativo entre o socket e o alto-falante.
+
+	Ordena os quadros pelo número de sequência, mede o jitter de chegada
+	(estimador do RFC 3550) e ajusta o atraso alvo: cresce imediatamente
+	quando a rede piora e encolhe devagar quando ela se estabiliza.
+	"""
+
+	def __init__(self, frame_ms, min_frames=1, max_frames=25, initial_frames=3, capacity=64, jitter_factor=3.0, shrink_after=50):
+		self.frame_ms = float(frame_ms)
+		self.min_frames = int(min_frames)
+		self.max_frames = int(max_frames)
+		self.capacity = max(int(capacity), self.max_frames + 2)
+		self.jitter_factor = float(jitter_factor)
+		self.shrink_after = int(shrink_after)
+		self._lock = threading.Lock()
+		self._frames = {}  # seq -> payload
+		self._next_seq = None
+		self._buffering = True
+		self._last_transit = None
+		self._jitter_ms = 0.0
+		self._shrink_count = 0
+		self._silence = False
+		self.target_frames = max(self.min_frames, min(self.max_frames, int(initial_frames)))
+		# Contadores expostos para diagnóstico
+		self.received = 0
+		self.played = 0
+		self.late = 0
+		self.dropped = 0
+		self.duplicates = 0
+		self.lost = 0
+		self.underruns = 0
+
+	def put(self, seq, payload, timestamp_ms=None, arrival=None, measure=True):
+		"""Insere um quadro recebido. Retorna False se ele chegou tarde demais ou é duplicado.
+
+		measure=False (ex: quadros reconstruídos pelo FEC) não alimenta a estimativa de jitter.
+		"""
+		now_ms = (time.monotonic() if arrival is None else arrival) * 1000.0
+		media_ms = float(timestamp_ms) if timestamp_ms is not None else seq * self.frame_ms
+		with self._lock:
+			self.received += 1
+			if measure:
+				self._update_jitter(now_ms - media_ms)
+			if self._next_seq is not None and seq < self._next_seq:
+				self.late += 1
+				return False
+			if seq in self._frames:
+				self.duplicates += 1
+				return False
+			self._frames[seq] = payload
+			self._silence = False
+			if len(self._frames) > self.capacity:
+				# Estouro: descarta o quadro mais antigo
+				oldest = min(self._frames)
+				self._frames.pop(oldest, None)
+				self.dropped += 1
+				if self._next_seq is not None and oldest >= self._next_seq:
+					self._next_seq = oldest + 1
+			return True
+
+	def get(self, recover=None):
+		"""Retorna o próximo quadro a reproduzir ou None (pré-buffer, perda ou buffer vazio).
+
+		recover(seq), se dado, é chamado para um quadro que faltou no prazo (ex: reconstrução pelo FEC)
+		e devolve o payload a reproduzir ou None.
+		"""
+		with self._lock:
+			if self._buffering:
+				if not self._frames or len(self._frames) < self.target_frames:
+					return None
+				self._buffering = False
+				first = min(self._frames)
+				if self._next_seq is None or first > self._next_seq:
+					if self._next_seq is not None:
+						self.lost += first - self._next_seq
+					self._next_seq = first
+			if not self._frames:
+				self._buffering = True
+				if not self._silence:
+					self.underruns += 1
+				return None
+			self._shrink_if_needed()
+			seq = self._next_seq
+			payload = self._frames.pop(seq, None)
+			self._next_seq += 1
+			if payload is None and recover is not None:
+				payload = recover(seq)
+			if payload is None:
+				self.lost += 1
+				return None
+			self.played += 1
+			return payload
+
+	def discard_played(self):
+		"""O quadro devolvido pelo último get() não pôde ser decodificado: conta como perdido, não como reproduzido."""
+		with self._lock:
+			if self.played:
+				self.played -= 1
+			self.lost += 1
+
+	def _update_jitter(self, transit):
+		if self._last_transit is not None:
+			d = abs(transit - self._last_transit)
+			self._jitter_ms += (d - self._jitter_ms) / 16.0
+		self._last_transit = transit
+		desired = int(math.ceil(self._jitter_ms * self.jitter_factor / self.frame_ms)) + 1
+		desired = max(self.min_frames, min(self.max_frames, desired))
+		if desired > self.target_frames:
+			# Rede piorou: aumenta o atraso imediatamente
+			self.target_frames = desired
+			self._shrink_count = 0
+		elif desired < self.target_frames:
+			# Rede melhorou: só reduz após um período estável
+			self._shrink_count += 1
+			if self._shrink_count >= self.shrink_after:
+				self.target_frames -= 1
+				self._shrink_count = 0
+		else:
+			self._shrink_count = 0
+
+	def _shrink_if_needed(self):
+		# Mantém a profundidade perto do alvo descartando o quadro mais antigo
+		if len(self._frames) > self.target_frames + 2:
+			oldest = min(self._frames)
+			if oldest == self._next_seq:
+				self._frames.pop(oldest, None)
+				self.dropped += 1
+				self._next_seq = oldest + 1
+
+	def mark_silence(self):
+		"""O remetente parou de transmitir (DTX): esvaziar o buffer agora não conta como underrun,
+		e a próxima rajada de fala é re-bufferizada até o alvo atual."""
+		with self._lock:
+			self._silence = True
+
+	def reset(self):
+		with self._lock:
+			self._frames.clear()
+			self._next_seq = None
+			self._buffering = True
+			self._last_transit = None
+
+	@property
+	def depth(self):
+		with self._lock:
+			return len(self._frames)
+
+	def stats(self):
+		with self._lock:
+			return {
+				"depth": len(self._frames),
+				"target_frames": self.target_frames,
+				"target_ms": round(self.target_frames * self.frame_ms, 1),
+				"jitter_ms": round(self._jitter_ms, 2),
+				"received": self.received,
+				"played": self.played,
+				"late": self.late,
+				"dropped": self.dropped,
+				"duplicates": self.duplicates,
+				"lost": self.lost,
+				"underruns": self.underruns,
+			}
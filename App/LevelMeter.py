@@ -0,0 +1,164 @@
+"""Medidor de nível do microfone por assinatura.
+
+Lê uma derivação contínua da captura: durante uma chamada, os quadros que a
+VoipRoom já está capturando (VoipRoom(on_level=meter.feed_call)); fora dela, um
+stream de monitoramento leve aberto pelo AudioEngine enquanto houver assinantes.
+O RMS e o pico de cada quadro são acumulados e publicados no máximo a cada
+`interval` segundos para as filas dos assinantes (ex: o SSE /events/mic-level).
+"""
+import threading
+import time
+import queue
+import logging
+import Dsp
+import AudioEngine
+
+CALL_STALE = 0.5  # segundos sem quadros da chamada até voltar para o stream de monitoramento
+SUPERVISE_INTERVAL = 0.2
+QUEUE_SIZE = 8
+
+
+class LevelMeter:
+
+	def __init__(self, engine=None, interval=0.05, rate=44100, chunk=1024):
+		self._engine = engine
+		self.interval = float(interval)
+		self.rate = int(rate)
+		self.chunk = int(chunk)
+		self._lock = threading.Lock()
+		self._subs = []
+		self._device = None
+		self._supervisor = None
+		self._monitor = None
+		self._monitor_device = None
+		self._retry_at = 0.0
+		self._last_call = 0.0
+		# Janela de acumulação até a próxima publicação (alimentada pela thread de envio da chamada
+		# e pelo callback do PortAudio do monitoramento)
+		self._acc_lock = threading.Lock()
+		self._sum_squares = 0.0
+		self._samples = 0
+		self._peak = 0.0
+		self._last_publish = 0.0
+		self.latest = None
+
+	@property
+	def engine(self):
+		return self._engine or AudioEngine.shared()
+
+	# ------ Assinaturas ------
+	def subscribe(self, device_index=None):
+		"""Registra um assinante; o dispositivo pedido vale para o monitoramento fora de chamada."""
+		q = queue.Queue(maxsize=QUEUE_SIZE)
+		with self._lock:
+			self._subs.append(q)
+			self._device = device_index
+			if self._supervisor is None:
+				self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+				self._supervisor.start()
+		return q
+
+	def unsubscribe(self, q):
+		with self._lock:
+			try:
+				self._subs.remove(q)
+			except ValueError:
+				pass
+
+	@property
+	def subscribers(self):
+		with self._lock:
+			return len(self._subs)
+
+	# ------ Entrada de quadros ------
+	def feed_call(self, rms, peak, samples=None):
+		"""Nível de um quadro da captura da chamada (RMS e pico em 0..1, antes do ganho) com `samples` amostras."""
+		self._last_call = time.monotonic()
+		with self._lock:
+			if not self._subs:
+				return
+		self._accumulate(rms, peak, self.chunk if samples is None else samples, "call")
+
+	def _on_monitor(self, in_data, frame_count, time_info, status):
+		# A chamada tem prioridade: enquanto ela alimenta o medidor, os quadros do monitor são ignorados
+		if in_data and not self._call_live():
+			rms, peak = Dsp.meter(in_data)
+			self._accumulate(rms, peak, frame_count, "monitor")
+		return None, AudioEngine.PA_CONTINUE
+
+	def _call_live(self, now=None):
+		return (time.monotonic() if now is None else now) - self._last_call < CALL_STALE
+
+	def _accumulate(self, rms, peak, samples, source):
+		now = time.monotonic()
+		with self._acc_lock:
+			self._sum_squares += rms * rms * samples
+			self._samples += samples
+			if peak > self._peak:
+				self._peak = peak
+			if now - self._last_publish < self.interval:
+				return
+			rms = (self._sum_squares / self._samples) ** 0.5 if self._samples else 0.0
+			peak = self._peak
+			self._sum_squares = 0.0
+			self._samples = 0
+			self._peak = 0.0
+			self._last_publish = now
+		self._publish({
+			"level": max(0, min(100, int(rms * 100))),
+			"rms": round(rms, 4),
+			"peak": round(peak, 4),
+			"rms_dbov": round(Dsp.to_dbov(rms), 1),
+			"peak_dbov": round(Dsp.to_dbov(peak), 1),
+			"source": source,
+		})
+
+	def _publish(self, update):
+		self.latest = update
+		with self._lock:
+			subs = list(self._subs)
+		for q in subs:
+			try:
+				q.put_nowait(update)
+			except queue.Full:
+				# Assinante lento: descarta a atualização mais antiga, o nível atual importa mais
+				try:
+					q.get_nowait()
+					q.put_nowait(update)
+				except (queue.Empty, queue.Full):
+					pass
+
+	# ------ Stream de monitoramento ------
+	def _supervise(self):
+		while True:
+			with self._lock:
+				if not self._subs:
+					self._supervisor = None
+					break
+				device = self._device
+			now = time.monotonic()
+			if self._call_live(now):
+				self._stop_monitor()
+			elif self._monitor is None or self._monitor_device != device:
+				if now >= self._retry_at:
+					self._start_monitor(device)
+			time.sleep(SUPERVISE_INTERVAL)
+		self._stop_monitor()
+
+	def _start_monitor(self, device):
+		self._stop_monitor()
+		try:
+			self._monitor = self.engine.open(
+				format=AudioEngine.PA_INT16, channels=1, rate=self.rate, input=True, frames_per_buffer=self.chunk,
+				input_device_index=int(device) if device is not None else None, stream_callback=self._on_monitor,
+			)
+			self._monitor_device = device
+		except Exception:
+			logging.exception("Falha ao abrir o stream de monitoramento do microfone")
+			self._monitor = None
+			self._retry_at = time.monotonic() + 2.0
+
+	def _stop_monitor(self):
+		stream, self._monitor = self._monitor, None
+		if stream is not None:
+			self.engine.release(stream)
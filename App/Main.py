@@ -3,7 +3,18 @@
 
 import json
 import Voip
+import Codec
+import Concealment
+import Conference
+import Relay
+import Dsp
+import AudioEngine
+import LevelMeter
+import Tones
+import Telemetry
 import Discovery
+import Interfaces
+import Mux
 import Api
 import Settings
 import os
@@ -17,6 +28,15 @@ import sys
 import threading
 import webview
 
+# Estados em que a discagem ainda pode ser cancelada
+DIAL_ACTIVE_STATES = ("dialing", "ringing")
+# Mensagens para o motivo do fim de uma discagem (Discovery.initiate_call(outcome=...))
+DIAL_ERRORS = {"busy": "Peer is busy", "rejected": "Peer rejected the call", "timeout": "No answer", "cancelled": "Cancelled", "unreachable": "Peer unreachable"}
+MAX_CALL_WAITING = 1
+# O chamador desiste em 10 s; a campainha para um pouco depois mesmo se a oferta continuar pendente
+RINGTONE_MAX_SECONDS = 15.0
+CONTROL_PORT = 38020
+
 def check_and_add_firewall_rule():
     """Verifica e adiciona uma regra no Firewall do Windows para o aplicativo, se necessário."""
     if platform.system() != "Windows":
@@ -88,12 +108,39 @@ class Application:
         self.api = None
 
         self.current_call = {"room": None, "info": None}
+        # Chamada de saída em andamento (dialing -> ringing -> connected/failed/cancelled)
+        self.outgoing_call = None
+        self._dial_cancel = None
+        self._dial_lock = threading.Lock()
+        # Instalação e remoção da sala da chamada atual (discagem e atendimento podem terminar juntos)
+        self._call_lock = threading.Lock()
         self.ui_state = {"screen": "main"}
         self.input_volume_percent = 100
         self.output_volume_percent = 100
+        # Opções de mídia padrão das chamadas (podem ser trocadas por chamada via /call)
+        self.call_options = {"codec": "pcm", "codec_rate": None, "plc": "pitch", "fec_group": 0, "engine": "callback", "frame_ms": None, "dtx": True, "relay": False, "agc": False}
+        # Relay de encaminhamento seletivo: hospedado por este nó e/ou escolhido pelo usuário
+        self.relay_server = None
+        self.relay_preference = None
+        # Medidor de nível do microfone (SSE): usa a captura da chamada ou um stream de monitoramento
+        self.level_meter = LevelMeter.LevelMeter()
+        # Tom de teste, de chamando e campainha
+        self.tones = Tones.TonePlayer()
+        # Sockets de mídia vinculados com antecedência e entregues às salas na negociação
+        self.media_sockets = Discovery.MediaSocketPool()
+        # Histogramas de latência do estabelecimento de chamadas (OFFER -> RINGING -> ACCEPT -> mídia)
+        self.setup_telemetry = Telemetry.SetupTelemetry()
+        # Porta única (CONCORD_SINGLE_PORT=1): sinalização, respostas de descoberta e mídia na porta de controle
+        self.single_port = os.environ.get("CONCORD_SINGLE_PORT", "0") not in ("", "0")
+        self.mux = None
+        # Transporte da descoberta (CONCORD_DISCOVERY_TRANSPORT=auto|multicast|broadcast) e grupo multicast
+        self.discovery_transport = os.environ.get("CONCORD_DISCOVERY_TRANSPORT", Discovery.DISCOVERY_TRANSPORT)
+        self.multicast_group = os.environ.get("CONCORD_MULTICAST_GROUP", Discovery.MULTICAST_GROUP)
 
         self.hostname = platform.node()
-        self.iface_list = Discovery.get_local_ipv4_interfaces()
+        # Tabela de interfaces em cache (TTL + netlink/verificação periódica); avisa quando os endereços mudam
+        self.interfaces = Interfaces.shared()
+        self.iface_list = self.interfaces.interfaces()
 
     def _init_audio_devices(self):
         try:
@@ -130,45 +177,31 @@ class Application:
 
     def _sample_mic_level(self, device_index):
         try:
-            import pyaudio, audioop
-            pa = pyaudio.PyAudio()
-            # Valida o índice do dispositivo antes de abrir
-            try:
-                if device_index is not None:
-                    info = pa.get_device_info_by_index(int(device_index))
-                    if not info or int(info.get('maxInputChannels', 0) or 0) <= 0:
-                        try:
-                            pa.terminate()
-                        except Exception:
-                            pass
-                        return 0
-            except Exception:
-                try:
-                    pa.terminate()
-                except Exception:
-                    pass
-                return 0
-            stream = pa.open(format=pyaudio.paInt16, channels=1, rate=44100, input=True, frames_per_buffer=1024,
-                             input_device_index=int(device_index) if device_index is not None else None)
+            import pyaudio
+            engine = AudioEngine.shared()
+            # Valida o índice do dispositivo antes de abrir (informações vêm do cache do engine)
+            if device_index is not None:
+                info = engine.device_info(device_index)
+                if not info or int(info.get('maxInputChannels', 0) or 0) <= 0:
+                    return 0
+            stream = engine.open(format=pyaudio.paInt16, channels=1, rate=44100, input=True, frames_per_buffer=1024,
+                                 input_device_index=int(device_index) if device_index is not None else None)
             try:
                 data = stream.read(1024, exception_on_overflow=False)
-                rms = audioop.rms(data, 2)
-                level = min(100, int((rms / 32767.0) * 100))
+                rms, _peak = Dsp.meter(data)
+                level = min(100, int(rms * 100))
             finally:
-                try:
-                    stream.close()
-                except Exception:
-                    pass
-                try:
-                    pa.terminate()
-                except Exception:
-                    pass
+                engine.release(stream)
             return level
         except Exception:
             return 0
 
     def _get_mic_level(self, device_index=None):
         try:
+            # Com o medidor ativo (SSE aberto), responde com o último nível sem abrir outro stream
+            latest = self.level_meter.latest
+            if self.level_meter.subscribers and latest is not None:
+                return latest["level"]
             idx = device_index
             if idx is None:
                 devs = self.settings.get_audio_devices()
@@ -177,33 +210,51 @@ class Application:
         except Exception:
             return 0
 
+    def _tone_volume(self):
+        # Segue o volume de saída selecionado (0-100)
+        try:
+            vol_factor = float(self.output_volume_percent) / 100.0
+        except Exception:
+            vol_factor = 1.0
+        return 0.6 * max(0.0, min(1.0, vol_factor))
+
     def _play_test_tone(self, output_device_index):
         try:
-            import pyaudio, math, struct
-            pa = pyaudio.PyAudio()
-            rate = 44100
-            duration = 0.6  # seconds
-            freq = 880.0
-            frames = int(rate * duration)
-            stream = pa.open(format=pyaudio.paInt16, channels=1, rate=rate, output=True,
-                             output_device_index=int(output_device_index) if output_device_index is not None else None)
-            # Follow currently selected output volume (0-100)
-            try:
-                vol_factor = float(self.output_volume_percent) / 100.0
-            except Exception:
-                vol_factor = 1.0
-            vol_factor = max(0.0, min(1.0, vol_factor))
-            for n in range(frames):
-                sample = int(0.6 * vol_factor * 32767 * math.sin(2 * math.pi * freq * (n / rate)))
-                stream.write(struct.pack('<h', sample))
-            try:
-                stream.close()
-            finally:
-                pa.terminate()
-            return True
+            return self.tones.play(Tones.TEST, output_device_index, volume=self._tone_volume(), wait=True)
         except Exception:
             return False
 
+    def _call_busy(self):
+        """Em chamada ou discando: ofertas novas são chamada em espera (sem campainha, capacidade menor)."""
+        call = self.outgoing_call
+        return self.current_call["room"] is not None or (call is not None and call["state"] in DIAL_ACTIVE_STATES)
+
+    @staticmethod
+    def _close_media_socket(sock):
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _install_call(self, room, info):
+        """Torna `room` a chamada atual. Devolve False (e não instala) se já houver uma."""
+        with self._call_lock:
+            if self.current_call["room"] is not None:
+                return False
+            self.current_call["room"] = room
+            self.current_call["info"] = info
+            return True
+
+    def _on_control_update(self):
+        # Campainha enquanto houver oferta pendente e nenhuma chamada em andamento ou sendo discada
+        if self.control.pending_offer and not self._call_busy():
+            if self.tones.current is not Tones.RINGTONE:
+                self.tones.play(Tones.RINGTONE, self.audio_devices.get("output"), volume=self._tone_volume(), repeat=True, max_seconds=RINGTONE_MAX_SECONDS)
+        else:
+            self.tones.stop(Tones.RINGTONE)
+        self.api.publish_status_update()
+
     def api_get_volume(self):
         return {"input": self.input_volume_percent, "output": self.output_volume_percent}
 
@@ -239,8 +290,8 @@ class Application:
         try:
             is_muted = bool(is_muted)
             if mute_type == "input":
-                volume_to_set = 0 if is_muted else self.input_volume_percent
-                self.current_call["room"].set_input_volume(volume_to_set)
+                # Mudo real: a sala para de transmitir em vez de enviar quadros zerados
+                self.current_call["room"].set_muted(is_muted)
             elif mute_type == "output":
                 volume_to_set = 0 if is_muted else self.output_volume_percent
                 self.current_call["room"].set_output_volume(volume_to_set)
@@ -250,30 +301,56 @@ class Application:
         except Exception:
             return False
 
+    def _offer_view(self, offer, peers):
+        view = {k: v for k, v in offer.items() if k not in ("peer_addr", "received_at", "last_seen")}
+        try:
+            name = offer.get('peer_ip')
+            for p in peers:
+                if p.get('ip') == offer.get('peer_ip'):
+                    name = p.get('username', p.get('display_name', name))
+                    break
+            view['peer_username'] = name
+        except Exception:
+            pass
+        view['waiting_s'] = round(time.monotonic() - offer["received_at"], 1)
+        return view
+
     def api_status(self):
         peers = [] if self.ui_state.get("screen") == "settings" else self.discovery.get_peers()
-        po = self.control.pending_offer
-        if po:
-            try:
-                name = po.get('peer_ip')
-                for p in peers:
-                    if p.get('ip') == po.get('peer_ip'):
-                        name = p.get('username', p.get('display_name', name))
-                        break
-                po = dict(po)
-                po['peer_username'] = name
-            except Exception:
-                pass
+        # Ofertas pendentes em ordem de chegada; durante uma chamada elas são a chamada em espera
+        offers = [self._offer_view(o, peers) for o in self.control.list_offers()]
+        in_call = self.current_call["room"] is not None
+        po = offers[0] if offers else None
         return {
             "host": self.hostname,
-            "interfaces": Discovery.get_local_ipv4_interfaces(),
+            "interfaces": self.interfaces.interfaces(),
             "peers": peers,
             "pending": bool(po),
-            "pending_offer": po or None,
-            "in_call": self.current_call["room"] is not None,
+            "pending_offer": po,
+            "offers": offers,
+            "call_waiting": offers if in_call else [],
+            "in_call": in_call,
             "current_call": self.current_call.get("info") if self.current_call["room"] is not None else None,
+            "participants": self.current_call["room"].list_participants() if self.current_call["room"] is not None else [],
+            "jitter": self.current_call["room"].get_jitter_stats() if self.current_call["room"] is not None else None,
+            "quality": self.api_call_stats(),
+            "outgoing_call": dict(self.outgoing_call) if self.outgoing_call is not None else None,
         }
 
+    def api_setup_stats(self):
+        stats = self.setup_telemetry.snapshot()
+        stats["duplicate_offers"] = self.control.duplicates if self.control else 0
+        return stats
+
+    def api_call_stats(self):
+        room = self.current_call["room"]
+        return room.get_call_stats() if room is not None else None
+
+    def _publish_call_stats(self):
+        # Chamado pela thread de recepção a cada relatório de qualidade recebido
+        if self.api is not None:
+            self.api.publish_status_update()
+
     def api_peers(self, network_filter=None):
         all_peers = self.discovery.get_peers()
         if not network_filter or network_filter == 'all':
@@ -285,85 +362,340 @@ class Application:
         except Exception:
             return all_peers
 
-    def api_start_call(self, ip, ctrl_port):
-        if self.current_call["room"] is not None:
-            return False, "Already in call"
-        result = Discovery.initiate_call(ip, ctrl_port, my_username=self.username)
-        if result is None:
-            return False, "Peer rejected or no answer"
-        room = Voip.VoipRoom(
-            LOCAL_IP=result['local_ip'], 
-            LOCAL_PORT=result['local_media_port'], 
-            REMOTE_IP=ip, 
-            REMOTE_PORT=result['remote_media_port'],
-            input_device=self.audio_devices["input"],
-            output_device=self.audio_devices["output"],
-            input_volume=self.input_volume_percent / 100.0,
-            output_volume=self.output_volume_percent / 100.0,
-        )
-        room.start()
-        self.current_call["room"] = room
-        remote_name = ip
+    def _lookup_peer_name(self, ip):
         try:
             for p in self.discovery.get_peers():
                 if p.get('ip') == ip:
-                    remote_name = p.get('username', p.get('display_name', ip))
-                    break
+                    return p.get('username', p.get('display_name', ip))
         except Exception:
             pass
-        info = {"remote_ip": ip, "local_ip": result['local_ip'], "remote_username": remote_name}
-        self.current_call["info"] = info
+        return ip
+
+    def api_start_call(self, ip, ctrl_port, **options):
+        """Valida o pedido e disca em segundo plano; o progresso sai pelo SSE de status (outgoing_call)."""
+        with self._dial_lock:
+            if self.outgoing_call is not None and self.outgoing_call["state"] in DIAL_ACTIVE_STATES:
+                return False, "Call setup already in progress"
+            # Já em chamada: o pedido vira um convite para a conferência
+            invite = self.current_call["room"] is not None
+            opts = relay = None
+            if not invite:
+                ok, opts, relay = self._prepare_call(ip, options)
+                if not ok:
+                    return False, opts
+            call = {"call_id": uuid.uuid4().hex, "remote_ip": ip, "state": "dialing", "invite": invite, "error": None, "info": None}
+            cancel = threading.Event()
+            self.outgoing_call = call
+            self._dial_cancel = cancel
+        threading.Thread(target=self._dial, args=(call, ip, ctrl_port, opts, relay, cancel), daemon=True).start()
+        self.api.publish_status_update()
+        return True, {"call_id": call["call_id"], "state": call["state"]}
+
+    def _set_dial_state(self, call, state, **fields):
+        call.update(fields)
+        call["state"] = state
+        self.api.publish_status_update()
+
+    def _dial(self, call, ip, ctrl_port, opts, relay, cancel):
+        on_ringing = lambda: self._set_dial_state(call, "ringing")
+        try:
+            if call["invite"]:
+                ok, info = self.api_invite(ip, ctrl_port, cancel=cancel, on_ringing=on_ringing)
+            else:
+                ok, info = self._connect_call(ip, ctrl_port, opts, relay, cancel, on_ringing)
+        except Exception as e:
+            logging.exception("Falha ao estabelecer chamada com %s", ip)
+            ok, info = False, str(e)
+        if ok:
+            self._set_dial_state(call, "connected", info=info)
+        elif cancel.is_set():
+            self._set_dial_state(call, "cancelled")
+        else:
+            logging.error("Chamada para %s falhou: %s", ip, info)
+            self._set_dial_state(call, "failed", error=info)
+        if not ok:
+            # Uma oferta que chegou durante a discagem passa a tocar
+            self._on_control_update()
+
+    def api_cancel_call(self, call_id=None):
+        with self._dial_lock:
+            call = self.outgoing_call
+            if call is None or call["state"] not in DIAL_ACTIVE_STATES:
+                return False
+            if call_id and call_id != call["call_id"]:
+                return False
+            self._dial_cancel.set()
+        return True
+
+    def _prepare_call(self, ip, options):
+        opts = dict(self.call_options)
+        opts.update({k: v for k, v in options.items() if k in opts and v is not None})
+        if options.get("codec") and options.get("codec_rate") is None:
+            opts["codec_rate"] = None
+        try:
+            Codec.create(opts["codec"], opts["codec_rate"])
+            Concealment.LossConcealer(opts["plc"])
+            opts["fec_group"] = int(opts["fec_group"])
+            opts["frame_ms"] = Voip.check_frame_ms(opts["frame_ms"])
+            if opts["engine"] not in Voip.ENGINES:
+                raise ValueError(f"Engine de áudio desconhecida: {opts['engine']}")
+        except (ValueError, TypeError) as e:
+            return False, str(e), None
+        relay = None
+        if opts["relay"]:
+            # Sala grande: todos enviam para o relay eleito, que repassa só os locutores ativos
+            relay = self._resolve_relay(ip)
+            if relay is None:
+                return False, "No relay available", None
+        return True, opts, relay
+
+    def _connect_call(self, ip, ctrl_port, opts, relay, cancel, on_ringing):
+        # Tom de chamando a partir do RINGING do outro lado até a resposta
+        def ringing():
+            self.tones.play(Tones.RINGBACK, self.audio_devices.get("output"), volume=self._tone_volume(), repeat=True)
+            on_ringing()
+        started = time.monotonic()
+        outcome = {}
+        try:
+            result = Discovery.initiate_call(ip, ctrl_port, my_username=self.username, codec=opts["codec"], codec_rate=opts["codec_rate"], fec_group=opts["fec_group"], frame_ms=opts["frame_ms"], relay=relay, on_ringing=ringing, media_pool=self.media_sockets, cancel=cancel, outcome=outcome, mux=self.mux)
+        finally:
+            self.tones.stop(Tones.RINGBACK)
+        if result is None:
+            return False, DIAL_ERRORS.get(outcome.get("reason"), "Call failed")
+        self.setup_telemetry.record("ringing", result["timings"]["ringing_ms"])
+        self.setup_telemetry.record("answer", result["timings"]["accept_ms"])
+        accepted_at = result["accepted_at"]
+        def first_media(at):
+            self.setup_telemetry.record("first_media", (at - accepted_at) * 1000.0)
+            self.setup_telemetry.record("total", (at - started) * 1000.0)
+        try:
+            room = Voip.VoipRoom(
+                LOCAL_IP=result['local_ip'],
+                LOCAL_PORT=result['local_media_port'],
+                sock=result['media_socket'],
+                mux=self.mux,
+                REMOTE_IP=ip,
+                REMOTE_PORT=result['remote_media_port'],
+                input_device=self.audio_devices["input"],
+                output_device=self.audio_devices["output"],
+                input_volume=self.input_volume_percent / 100.0,
+                output_volume=self.output_volume_percent / 100.0,
+                codec=result['codec'],
+                codec_rate=result['codec_rate'],
+                plc=opts["plc"],
+                fec_group=opts["fec_group"],
+                engine=opts["engine"],
+                frame_ms=opts["frame_ms"],
+                dtx=bool(opts["dtx"]),
+                agc=bool(opts["agc"]),
+                relay=relay,
+                username=self.username,
+                on_stats=self._publish_call_stats,
+                on_level=self.level_meter.feed_call,
+                on_first_media=first_media,
+            )
+        except Exception as e:
+            # Dispositivo de áudio indisponível: a sala já avisou o outro lado e liberou o socket dela;
+            # um socket entregue antes de a sala chegar a ele também é fechado
+            logging.exception("Falha ao abrir a chamada")
+            self._close_media_socket(result['media_socket'])
+            return False, f"Audio error: {e}"
+        remote_name = self._lookup_peer_name(ip)
+        if relay is None:
+            room.roster.add(ip, result['remote_media_port'], username=remote_name)
+        info = {"remote_ip": ip, "local_ip": result['local_ip'], "remote_username": remote_name, "codec": room.codec.name, "codec_rate": room.codec.rate}
+        if not self._install_call(room, info):
+            # Outra chamada foi atendida enquanto discávamos: desliga a que aceitou tarde
+            room.send_hangup_notification()
+            room.stop()
+            return False, "Already in call"
+        room.start()
         self.api.publish_status_update()
         return True, info
 
-    def api_accept(self):
+    def api_invite(self, ip, ctrl_port, cancel=None, on_ringing=None):
+        room = self.current_call["room"]
+        if room is None:
+            return False, "Not in call"
+        if len(room.roster) >= Conference.MAX_PARTICIPANTS:
+            return False, "Conference is full"
+        # O convidado usa os mesmos parâmetros de mídia da sala e envia para o mesmo socket
+        outcome = {}
+        result = Discovery.initiate_call(
+            ip, ctrl_port, my_username=self.username,
+            codec=room.codec.name, codec_rate=room.codec.rate,
+            fec_group=room.fec_encoder.group_size, frame_ms=room.frame_ms,
+            media_ip=room.advertised_ip, media_port=room.LOCAL_PORT,
+            relay=room.relay_addr,
+            on_ringing=on_ringing, cancel=cancel, outcome=outcome, mux=self.mux,
+        )
+        if result is None:
+            return False, DIAL_ERRORS.get(outcome.get("reason"), "Call failed")
+        remote_name = self._lookup_peer_name(ip)
+        if not room.add_participant(ip, result['remote_media_port'], username=remote_name):
+            return False, "Conference is full"
+        self.api.publish_status_update()
+        return True, {"remote_ip": ip, "remote_username": remote_name, "participants": room.list_participants()}
+
+    def api_accept(self, tid=None):
         if self.current_call["room"] is not None:
             return False, "Already in call"
+        with self._dial_lock:
+            call = self.outgoing_call
+            if call is not None and call["state"] in DIAL_ACTIVE_STATES:
+                return False, "Call setup in progress"
         if not self.control.pending_offer:
             return False, "No pending"
-        accepted = self.control.accept_pending()
+        accepted = self.control.accept_pending(tid)
         if not accepted:
             return False, "No pending"
-        room = Voip.VoipRoom(
-            LOCAL_IP=accepted['local_ip'], 
-            LOCAL_PORT=accepted['my_media_port'], 
-            REMOTE_IP=accepted['peer_ip'], 
-            REMOTE_PORT=accepted['peer_media_port'],
-            input_device=self.audio_devices["input"],
-            output_device=self.audio_devices["output"],
-            input_volume=self.input_volume_percent / 100.0,
-            output_volume=self.output_volume_percent / 100.0,
-        )
-        room.start()
-        self.current_call["room"] = room
-        remote_name = accepted['peer_ip']
+        codec, codec_rate = accepted['codec'], accepted['codec_rate']
         try:
-            for p in self.discovery.get_peers():
-                if p.get('ip') == accepted['peer_ip']:
-                    remote_name = p.get('username', p.get('display_name', accepted['peer_ip']))
-                    break
-        except Exception:
-            pass
-        info = {"remote_ip": accepted['peer_ip'], "local_ip": accepted['local_ip'], "remote_username": remote_name}
-        self.current_call["info"] = info
+            Codec.create(codec, codec_rate)
+        except (ValueError, TypeError):
+            # Codec desconhecido: respondemos em PCM, que qualquer versão decodifica
+            codec, codec_rate = "pcm", None
+        # FEC espelha o que o chamador pediu; a ocultação é decisão local
+        try:
+            fec_group = int(accepted.get('fec_group') or 0)
+        except (ValueError, TypeError):
+            fec_group = 0
+        # O tamanho de quadro precisa ser o mesmo nos dois lados (o buffer de jitter reproduz um pacote por quadro);
+        # um valor fora da faixa vindo da rede cai no padrão
+        try:
+            frame_ms = Voip.check_frame_ms(accepted.get('frame_ms') or None)
+        except (ValueError, TypeError):
+            logging.warning("OFFER com frame_ms inválido (%r); usando o padrão.", accepted.get('frame_ms'))
+            frame_ms = None
+        relay = accepted.get('relay')
+        try:
+            relay = (str(relay[0]), int(relay[1])) if relay else None
+        except (IndexError, TypeError, ValueError):
+            relay = None
+        try:
+            room = Voip.VoipRoom(
+                LOCAL_IP=accepted['local_ip'],
+                LOCAL_PORT=accepted['my_media_port'],
+                sock=accepted['media_socket'],
+                mux=self.mux,
+                REMOTE_IP=accepted['peer_ip'],
+                REMOTE_PORT=accepted['peer_media_port'],
+                input_device=self.audio_devices["input"],
+                output_device=self.audio_devices["output"],
+                input_volume=self.input_volume_percent / 100.0,
+                output_volume=self.output_volume_percent / 100.0,
+                codec=codec,
+                codec_rate=codec_rate,
+                plc=self.call_options["plc"],
+                fec_group=fec_group,
+                engine=self.call_options["engine"],
+                frame_ms=frame_ms,
+                dtx=bool(self.call_options["dtx"]),
+                agc=bool(self.call_options["agc"]),
+                relay=relay,
+                username=self.username,
+                on_stats=self._publish_call_stats,
+                on_level=self.level_meter.feed_call,
+                on_first_media=lambda at: self.setup_telemetry.record("first_media", (at - accepted['accepted_at']) * 1000.0),
+            )
+        except Exception as e:
+            # Dispositivo de áudio indisponível: a sala já avisou o outro lado e liberou o socket dela;
+            # um socket entregue antes de a sala chegar a ele também é fechado
+            logging.exception("Falha ao abrir a chamada")
+            self._close_media_socket(accepted['media_socket'])
+            return False, f"Audio error: {e}"
+        remote_name = self._lookup_peer_name(accepted['peer_ip'])
+        if relay is None:
+            room.roster.add(accepted['peer_ip'], accepted['peer_media_port'], username=remote_name)
+        info = {"remote_ip": accepted['peer_ip'], "local_ip": accepted['local_ip'], "remote_username": remote_name, "codec": room.codec.name, "codec_rate": room.codec.rate}
+        if not self._install_call(room, info):
+            room.send_hangup_notification()
+            room.stop()
+            return False, "Already in call"
+        room.start()
         self.api.publish_status_update()
         return True, info
 
-    def api_reject(self):
-        ok = self.control.reject_pending()
+    def _on_interfaces_changed(self, interfaces):
+        # Endereços mudaram (ex: troca de rede): sockets de mídia para os IPs novos e um beacon imediato
+        logging.info("Interfaces de rede mudaram: %s", ", ".join(i["ip"] for i in interfaces))
+        self.iface_list = interfaces
+        if self.mux is None:
+            self.media_sockets.warm(iface["ip"] for iface in interfaces)
+        if self.discovery is not None:
+            self.discovery.trigger_beacon()
+        if self.api is not None:
+            self.api.publish_status_update()
+
+    def _relay_candidates(self, peer_ip=None):
+        candidates = list(self.discovery.get_relays()) if self.discovery else []
+        if self.relay_server is not None:
+            # Os peers alcançam nosso relay pelo IP da interface compartilhada com eles
+            if peer_ip:
+                local_ip = Discovery.select_local_ip_for_peer(peer_ip)
+            else:
+                local_ip = self.iface_list[0]["ip"] if self.iface_list else "127.0.0.1"
+            candidates.append({"id": self.self_id, "ip": local_ip, "relay_port": self.relay_server.port})
+        return candidates
+
+    def _resolve_relay(self, peer_ip=None):
+        elected = Relay.elect(self._relay_candidates(peer_ip), self.relay_preference)
+        if elected is None:
+            return None
+        return (elected["ip"], int(elected["port"]))
+
+    def api_relay_status(self):
+        return {
+            "hosting": self.relay_server is not None,
+            "stats": self.relay_server.stats() if self.relay_server is not None else None,
+            "preferred": self.relay_preference,
+            "elected": Relay.elect(self._relay_candidates(), self.relay_preference),
+        }
+
+    def api_set_relay(self, host=None, preferred=False):
+        if preferred is not False:
+            if preferred is None:
+                self.relay_preference = None
+            else:
+                try:
+                    self.relay_preference = {"id": None, "ip": str(preferred["ip"]), "port": int(preferred["port"])}
+                except (KeyError, TypeError, ValueError):
+                    return False, "Invalid relay address"
+        if host is not None:
+            if host and self.relay_server is None:
+                server = Relay.RelayServer(port=Relay.DEFAULT_PORT)
+                try:
+                    server.start()
+                except OSError as e:
+                    return False, f"Failed to start relay: {e}"
+                self.relay_server = server
+            elif not host and self.relay_server is not None:
+                self.relay_server.stop()
+                self.relay_server = None
+            # O próximo beacon anuncia (ou deixa de anunciar) o relay
+            self.discovery.relay_port = self.relay_server.port if self.relay_server is not None else None
+            self.discovery.trigger_beacon()
+        return True, self.api_relay_status()
+
+    def api_reject(self, tid=None):
+        ok = self.control.reject_pending(tid)
         self.api.publish_status_update()
         return ok
 
     def api_hangup(self):
         if self.current_call["room"] is None:
-            return False
-        try:
-            self.current_call["room"].send_hangup_notification()
-            self.current_call["room"].stop()
-        finally:
+            # Desligar durante a discagem cancela a chamada em andamento
+            return self.api_cancel_call()
+        with self._call_lock:
+            room = self.current_call["room"]
             self.current_call["room"] = None
             self.current_call["info"] = None
-        self.api.publish_status_update()
+        if room is None:
+            return False
+        room.send_hangup_notification()
+        room.stop()
+        # Uma chamada em espera volta a tocar
+        self._on_control_update()
         return True
 
     def api_set_ui_state(self, state):
@@ -380,8 +712,18 @@ class Application:
         setup_logging()
         sys.excepthook = _excepthook
 
-        self.discovery = Discovery.DiscoveryService(self_id=self.self_id, display_name="Concord", username=self.username, beacon_interval=5.0, on_update=lambda: self.api.publish_peers_update())
-        self.control = Discovery.ControlServer(control_port=38020, on_update=lambda: self.api.publish_status_update())
+        if self.single_port:
+            # Um socket e uma thread de recepção para controle, respostas de descoberta e mídia
+            self.mux = Mux.UdpMux(port=CONTROL_PORT)
+            self.mux.start()
+        self.discovery = Discovery.DiscoveryService(self_id=self.self_id, display_name="Concord", username=self.username, control_port=CONTROL_PORT, on_update=lambda: self.api.publish_peers_update(), mux=self.mux,
+                                                    transport=self.discovery_transport, multicast_group=self.multicast_group)
+        # Em chamada só cabe uma chamada em espera; os demais chamadores recebem BUSY na hora
+        self.control = Discovery.ControlServer(control_port=CONTROL_PORT, on_update=self._on_control_update, media_pool=self.media_sockets,
+                                               capacity_fn=lambda: MAX_CALL_WAITING if self._call_busy() else Discovery.MAX_PENDING_OFFERS, mux=self.mux)
+        if self.mux is None:
+            self.media_sockets.warm(iface["ip"] for iface in self.iface_list)
+        self.interfaces.subscribe(self._on_interfaces_changed)
 
         self.api = Api.ApiServer(
             host="127.0.0.1", port=5001,
@@ -408,9 +750,17 @@ class Application:
             window_maximize_fn=lambda: (webview.windows[0].toggle_fullscreen() if webview.windows else False) or True,
             window_close_fn=lambda: (webview.windows[0].destroy() if webview.windows else False) or True,
             window_resize_fn=lambda w, h: (webview.windows[0].resize(int(w), int(h)) if (webview.windows and w and h) else False) or True,
+            relay_status_fn=self.api_relay_status,
+            set_relay_fn=self.api_set_relay,
+            call_stats_fn=self.api_call_stats,
+            setup_stats_fn=self.api_setup_stats,
+            cancel_call_fn=self.api_cancel_call,
+            subscribe_mic_level_fn=self.level_meter.subscribe,
+            unsubscribe_mic_level_fn=self.level_meter.unsubscribe,
         )
 
         self.api.start()
+        self.interfaces.start()
         self.discovery.start()
         self.control.start()
 
@@ -440,6 +790,13 @@ class Application:
             pass
         self.discovery.stop()
         self.control.stop()
+        self.interfaces.stop()
+        if self.relay_server is not None:
+            self.relay_server.stop()
+        self.media_sockets.close()
+        if self.mux is not None:
+            self.mux.stop()
+        AudioEngine.shared().terminate()
 
 if __name__ == "__main__":
     app = Application()
@@ -0,0 +1,247 @@
+"""Porta UDP única para sinalização, respostas de descoberta e mídia.
+
+Um socket (por padrão a porta de controle, 38020) e um único laço de recepção
+com select. O primeiro byte separa os pacotes: Packet.MAGIC é mídia, roteada
+pelo stream id para a sala dona dele; '{' é JSON de sinalização, roteado pelo
+tipo (OFFER/CANCEL para o ControlServer, BEACON/BYE para a descoberta) ou, nas
+respostas (RINGING/ACCEPT/REJECT/BUSY), pelo tid da transação que as espera.
+Outros sockets (ex: o de broadcast dos beacons) podem ser anexados ao mesmo
+laço, outros formatos binários (ex: Beacon.MAGIC) vão para handlers pelo primeiro
+byte, e funções de manutenção rodam a cada TICK.
+"""
+import socket
+import select
+import threading
+import queue
+import json
+import time
+import logging
+import Packet
+
+DEFAULT_PORT = 38020
+TICK = 0.5  # intervalo das funções de manutenção (ex: expiração de ofertas)
+MAX_DATAGRAM = 4096
+REPLY_TYPES = ("RINGING", "ACCEPT", "REJECT", "BUSY")
+JSON_START = ord("{")
+
+
+class MediaChannel:
+	"""Visão de socket da porta compartilhada para uma VoipRoom (envio; a recepção chega pelo handler)."""
+
+	def __init__(self, mux, handler):
+		self._mux = mux
+		self.handler = handler
+
+	def sendto(self, data, addr):
+		return self._mux.sendto(data, addr)
+
+	def getsockname(self):
+		return self._mux.getsockname()
+
+	def settimeout(self, timeout):
+		# A recepção é do laço do mux: não há leitura bloqueante neste canal
+		pass
+
+	def close(self):
+		self._mux.close_channel(self)
+
+
+class UdpMux:
+
+	def __init__(self, bind_ip="", port=DEFAULT_PORT):
+		self.bind_ip = bind_ip
+		self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self._sock.bind((bind_ip, port))
+		self.port = self._sock.getsockname()[1]
+		self._lock = threading.Lock()
+		self._extra = []  # sockets anexados ao laço (ex: broadcast da descoberta)
+		self._extra_handlers = {}  # socket anexado -> handler(view, addr) que recebe tudo dele
+		self._handlers = {}  # tipo da mensagem JSON -> handler(msg, addr)
+		self._raw = {}  # primeiro byte -> handler(view, addr) (ex: Beacon.MAGIC)
+		self._waiters = {}  # tid -> (endereço do outro lado, fila de respostas)
+		self._channels = []
+		self._streams = {}  # stream id -> canal que aceitou o stream
+		self._ticks = []
+		self._rx_buf = bytearray(MAX_DATAGRAM)
+		self._rx_view = memoryview(self._rx_buf)
+		self._running = False
+		self._thread = threading.Thread(target=self._loop, daemon=True)
+		self.dropped = 0
+
+	def start(self):
+		self._running = True
+		self._thread.start()
+
+	def stop(self):
+		self._running = False
+		if self._thread.is_alive() and self._thread is not threading.current_thread():
+			self._thread.join(timeout=TICK * 2)
+		with self._lock:
+			extra, self._extra = self._extra, []
+			self._extra_handlers = {}
+		for sock in extra:
+			sock.close()
+		self._sock.close()
+
+	# ------ Envio ------
+	def sendto(self, data, addr):
+		return self._sock.sendto(data, addr)
+
+	def getsockname(self):
+		return self._sock.getsockname()
+
+	# ------ Registro de handlers ------
+	def attach(self, sock, handler=None):
+		"""Recebe também por `sock` (o mux passa a ser dono dele e o fecha no stop).
+
+		Com `handler`, os datagramas desse socket vão direto para handler(view, addr) sem a separação por tipo.
+		"""
+		with self._lock:
+			self._extra.append(sock)
+			if handler is not None:
+				self._extra_handlers[sock] = handler
+
+	def on_raw(self, first_byte, handler):
+		"""Datagramas que começam com `first_byte` vão para handler(view, addr) (formatos binários fora da mídia)."""
+		with self._lock:
+			self._raw[first_byte] = handler
+
+	def on(self, msg_type, handler):
+		with self._lock:
+			self._handlers[msg_type] = handler
+
+	def off(self, msg_type):
+		with self._lock:
+			self._handlers.pop(msg_type, None)
+
+	def on_tick(self, fn):
+		with self._lock:
+			self._ticks.append(fn)
+
+	def off_tick(self, fn):
+		with self._lock:
+			if fn in self._ticks:
+				self._ticks.remove(fn)
+
+	def expect(self, tid, peer_addr):
+		"""Fila das respostas de uma transação de sinalização iniciada por nós."""
+		q = queue.Queue()
+		with self._lock:
+			self._waiters[tid] = (peer_addr, q)
+		return q
+
+	def forget(self, tid):
+		with self._lock:
+			self._waiters.pop(tid, None)
+
+	def channel(self, handler):
+		"""Canal de mídia: handler(view, addr) recebe os pacotes e devolve True se o stream é dele."""
+		chan = MediaChannel(self, handler)
+		with self._lock:
+			self._channels.append(chan)
+		return chan
+
+	def close_channel(self, chan):
+		with self._lock:
+			if chan in self._channels:
+				self._channels.remove(chan)
+			for sid in [s for s, c in self._streams.items() if c is chan]:
+				del self._streams[sid]
+
+	# ------ Laço de recepção ------
+	def _loop(self):
+		last_tick = time.monotonic()
+		while self._running:
+			with self._lock:
+				socks = [self._sock] + self._extra
+			try:
+				readable, _, _ = select.select(socks, [], [], TICK)
+			except (OSError, ValueError):
+				# Um socket anexado foi fechado: a lista é refeita na próxima volta
+				if not self._running:
+					break
+				time.sleep(0.05)
+				continue
+			for sock in readable:
+				try:
+					nbytes, addr = sock.recvfrom_into(self._rx_buf)
+				except OSError:
+					continue
+				try:
+					handler = self._extra_handlers.get(sock) if sock is not self._sock else None
+					if handler is not None:
+						handler(self._rx_view[:nbytes], addr)
+					else:
+						self._dispatch(self._rx_view[:nbytes], addr)
+				except Exception:
+					logging.exception("Erro ao tratar pacote de %s:%s", *addr)
+			now = time.monotonic()
+			if now - last_tick >= TICK:
+				last_tick = now
+				with self._lock:
+					ticks = list(self._ticks)
+				for fn in ticks:
+					try:
+						fn()
+					except Exception:
+						logging.exception("Erro na manutenção do mux")
+
+	def _dispatch(self, view, addr):
+		if not view:
+			return
+		first = view[0]
+		if first == Packet.MAGIC:
+			self._dispatch_media(view, addr)
+		elif first == JSON_START:
+			try:
+				msg = json.loads(bytes(view).decode("utf-8"))
+			except (ValueError, UnicodeDecodeError):
+				self.dropped += 1
+				return
+			if isinstance(msg, dict):
+				self._dispatch_signal(msg, addr)
+		else:
+			handler = self._raw.get(first)
+			if handler is not None:
+				handler(view, addr)
+			else:
+				self.dropped += 1
+
+	def _dispatch_media(self, view, addr):
+		if len(view) < Packet.HEADER_SIZE:
+			self.dropped += 1
+			return
+		stream_id = Packet.HEADER.unpack_from(view)[4]
+		with self._lock:
+			chan = self._streams.get(stream_id)
+			channels = list(self._channels)
+		if chan is not None and chan.handler(view, addr):
+			return
+		# Stream novo (ou que mudou de sala): a primeira sala que o reconhece fica com ele
+		for chan in channels:
+			if chan.handler(view, addr):
+				with self._lock:
+					if chan in self._channels:
+						self._streams[stream_id] = chan
+				return
+		self.dropped += 1
+
+	def _dispatch_signal(self, msg, addr):
+		msg_type = msg.get("type")
+		with self._lock:
+			if msg_type in REPLY_TYPES:
+				waiter = self._waiters.get(msg.get("tid"))
+				if waiter is None and not msg.get("tid"):
+					# Versões sem tid: a resposta vai para a transação aberta com quem respondeu
+					waiter = next((w for w in self._waiters.values() if w[0][0] == addr[0]), None)
+				handler = None
+			else:
+				waiter = None
+				handler = self._handlers.get(msg_type)
+		if waiter is not None:
+			waiter[1].put(msg)
+		elif handler is not None:
+			handler(msg, addr)
+		else:
+			self.dropped += 1
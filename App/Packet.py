@@ -0,0 +1,117 @@
+import struct
+import json
+import random
+
+# Cabeçalho de mídia compacto no estilo RTP (13 bytes):
+#   magic (1) | marker + payload type (1) | sequência (2) | timestamp em amostras (4) | stream id (4) | nível de áudio (1)
+# O nível (em -dBov, como no RFC 6464) permite que um relay escolha os locutores ativos sem decodificar o áudio.
+HEADER = struct.Struct("!BBHIIB")
+HEADER_SIZE = HEADER.size
+MAGIC = 0xC6  # identifica pacotes de mídia do Concord (versão 2, com nível de áudio)
+MARKER = 0x80
+LEVEL_SILENT = 127
+
+# Tipos de payload
+PT_PCM = 0  # PCM linear 16 bits mono
+PT_REPORT = 124  # relatório de qualidade no estilo RTCP (ver Rtcp.py)
+PT_CN = 125  # ruído de conforto durante silêncio (DTX), payload de 1 byte com o nível em -dBov
+PT_FEC = 126  # paridade XOR de um grupo de quadros (ver Fec.py)
+PT_CONTROL = 127  # mensagens de controle em JSON (ex: HANGUP)
+
+SEQ_MOD = 1 << 16
+TS_MOD = 1 << 32
+
+
+def new_stream_id():
+	return random.getrandbits(32)
+
+
+def level_byte(level_dbov):
+	"""Converte um nível em dBov (0 a -127) para o byte do cabeçalho."""
+	if level_dbov is None:
+		return LEVEL_SILENT
+	return max(0, min(LEVEL_SILENT, int(round(-level_dbov))))
+
+
+def pack(payload_type, seq, timestamp, stream_id, payload, marker=False, level=LEVEL_SILENT):
+	first = (payload_type & 0x7F) | (MARKER if marker else 0)
+	return HEADER.pack(MAGIC, first, seq % SEQ_MOD, timestamp % TS_MOD, stream_id, level) + payload
+
+
+def unpack(data):
+	"""Decodifica um datagrama. Retorna (pt, marker, seq, timestamp, stream_id, nível, payload) ou None se não for do Concord."""
+	if len(data) < HEADER_SIZE or data[0] != MAGIC:
+		return None
+	_magic, first, seq, timestamp, stream_id, level = HEADER.unpack_from(data)
+	return first & 0x7F, bool(first & MARKER), seq, timestamp, stream_id, level, data[HEADER_SIZE:]
+
+
+def pack_control(message, seq, timestamp, stream_id):
+	body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+	return pack(PT_CONTROL, seq, timestamp, stream_id, body)
+
+
+def parse_control(payload):
+	try:
+		msg = json.loads(bytes(payload).decode("utf-8"))
+		return msg if isinstance(msg, dict) else None
+	except Exception:
+		return None
+
+
+class PacketPool:
+	"""Buffers de payload pré-alocados, indexados pela sequência estendida (slot = seq % slots).
+
+	O receptor copia cada payload do buffer do socket para o slot do seu número
+	de sequência e guarda só uma memoryview dele: nenhum bytes novo por pacote.
+	Um slot é reaproveitado `slots` quadros depois, bem além do que o buffer de
+	jitter segura; payloads maiores que o slot caem numa cópia comum.
+	"""
+
+	def __init__(self, slots, size):
+		self.slots = int(slots)
+		self.size = int(size)
+		self._view = memoryview(bytearray(self.slots * self.size))
+
+	def store(self, seq, payload):
+		n = len(payload)
+		if n > self.size:
+			return bytes(payload)
+		offset = (seq % self.slots) * self.size
+		slot = self._view[offset:offset + n]
+		slot[:] = payload
+		return slot
+
+
+class Unwrapper:
+	"""Converte contadores com wrap-around (sequência de 16 bits, timestamp de 32 bits) em inteiros crescentes."""
+
+	def __init__(self, bits):
+		self._mod = 1 << bits
+		self._half = self._mod >> 1
+		self._last = None
+
+	def unwrap(self, value):
+		if self._last is None:
+			self._last = value
+			return value
+		delta = (value - self._last) % self._mod
+		if delta >= self._half:
+			delta -= self._mod
+		extended = self._last + delta
+		# Pacotes atrasados não movem a referência para trás
+		if delta > 0:
+			self._last = extended
+		return extended
+
+	def extend(self, value):
+		"""Estende um valor relativo à referência atual sem alterá-la."""
+		if self._last is None:
+			return value
+		delta = (value - self._last) % self._mod
+		if delta >= self._half:
+			delta -= self._mod
+		return self._last + delta
+
+	def reset(self):
+		self._last = None
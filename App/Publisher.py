@@ -0,0 +1,148 @@
+"""Publicação de estado para as assinaturas SSE, só quando algo mudou.
+
+A descoberta e o servidor de controle avisam (notify) a cada evento, e um
+evento costuma vir em rajada (vários peers entrando juntos, uma chamada que
+passa por RINGING e ACCEPT em poucos ms). O publisher junta os avisos de uma
+janela (COALESCE_WINDOW), lê o estado uma vez, compara com o último publicado
+e só então serializa e entrega. Listas com chave (ex: peers por "id") também
+podem ser assinadas como deltas: um "snapshot" inicial e depois apenas os
+itens adicionados, alterados e removidos.
+
+Cada visão (ex: peers filtrados por rede) tem o próprio último estado; a
+serialização é feita uma vez por visão e compartilhada entre os assinantes.
+"""
+import json
+import queue
+import threading
+import logging
+
+COALESCE_WINDOW = 0.1  # s entre o primeiro aviso de uma rajada e a publicação
+
+
+class _View:
+
+	def __init__(self, args):
+		self.args = args  # argumentos do snapshot_fn (ex: o filtro de rede)
+		self.state = None  # último estado publicado
+		self.items = {}  # chave -> item do último estado (só em listas com chave)
+		self.payload = None  # último estado em JSON
+		self.version = 0
+		self.subs = []  # (fila, deltas)
+
+
+class Publisher:
+
+	def __init__(self, snapshot_fn, key=None, window=COALESCE_WINDOW):
+		"""snapshot_fn(*args) devolve o estado atual (serializável em JSON); `key` habilita os deltas em listas."""
+		self._snapshot = snapshot_fn
+		self.key = key
+		self.window = float(window)
+		self._lock = threading.Lock()  # estado das visões e ordem das entregas
+		self._timer_lock = threading.Lock()
+		self._timer = None
+		self._views = {}
+		self.notifies = 0
+		self.flushes = 0
+		self.published = 0
+		self.unchanged = 0
+
+	# ------ Assinaturas ------
+	def subscribe(self, view=None, deltas=False):
+		"""Fila com o estado atual seguido das mudanças. `view` é passado ao snapshot_fn (None = sem argumentos)."""
+		deltas = bool(deltas and self.key)
+		q = queue.Queue()
+		with self._lock:
+			v = self._views.get(view)
+			if v is None:
+				v = self._views[view] = _View(() if view is None else (view,))
+			# Publica aos assinantes atuais o que tiver mudado, para todos seguirem do mesmo estado
+			self._refresh(v)
+			if v.state is not None:
+				q.put(self._snapshot_message(v) if deltas else v.payload)
+			v.subs.append((q, deltas))
+		return q
+
+	def unsubscribe(self, q):
+		with self._lock:
+			for key, v in list(self._views.items()):
+				v.subs = [s for s in v.subs if s[0] is not q]
+				if not v.subs:
+					del self._views[key]
+
+	# ------ Avisos ------
+	def notify(self):
+		"""Algo mudou: publica ao fim da janela, junto com os demais avisos que chegarem até lá."""
+		self.notifies += 1
+		if self.window <= 0:
+			self.flush()
+			return
+		with self._timer_lock:
+			if self._timer is not None:
+				return
+			self._timer = threading.Timer(self.window, self._on_timer)
+			self._timer.daemon = True
+			self._timer.start()
+
+	def _on_timer(self):
+		with self._timer_lock:
+			self._timer = None
+		self.flush()
+
+	def flush(self):
+		"""Lê o estado agora e publica o que mudou em cada visão."""
+		self.flushes += 1
+		with self._lock:
+			for v in list(self._views.values()):
+				try:
+					self._refresh(v)
+				except Exception:
+					logging.exception("Erro ao publicar atualização")
+
+	def stop(self):
+		with self._timer_lock:
+			timer, self._timer = self._timer, None
+		if timer is not None:
+			timer.cancel()
+
+	# ------ Diferenças ------
+	def _refresh(self, v):
+		state = self._snapshot(*v.args)
+		if v.state is not None and state == v.state:
+			self.unchanged += 1
+			return
+		items = self._index(state)
+		delta = None
+		if v.state is not None and items is not None and any(d for _q, d in v.subs):
+			delta = self._delta(v, items)
+		first = v.state is None
+		v.state = state
+		v.items = items if items is not None else {}
+		v.payload = json.dumps(state)
+		v.version += 1
+		if first:
+			return
+		self.published += 1
+		delta_payload = json.dumps(delta) if delta is not None else None
+		for q, deltas in v.subs:
+			try:
+				q.put(delta_payload if deltas and delta_payload is not None else v.payload, block=False)
+			except Exception:
+				pass
+
+	def _index(self, state):
+		if self.key is None or not isinstance(state, (list, tuple)):
+			return None
+		return {item.get(self.key): item for item in state}
+
+	def _delta(self, v, items):
+		prev = v.items
+		return {
+			"type": "delta",
+			"version": v.version + 1,
+			"added": [item for k, item in items.items() if k not in prev],
+			"updated": [item for k, item in items.items() if k in prev and prev[k] != item],
+			"removed": [k for k in prev if k not in items],
+		}
+
+	def _snapshot_message(self, v):
+		return json.dumps({"type": "snapshot", "version": v.version, "items": v.state})
@@ -0,0 +1,239 @@
+"""Relay de encaminhamento seletivo (SFU) para salas grandes.
+
+Cada participante envia um único stream para o relay, que repassa a cada um
+apenas os K locutores mais ativos (pelo nível de áudio do cabeçalho de mídia),
+sem decodificar nada. Roda sem interface:
+
+	python Relay.py --port 39020 --top-k 3 [--announce]
+"""
+import socket
+import threading
+import time
+import logging
+import argparse
+import uuid
+
+import Packet
+
+DEFAULT_PORT = 39020
+MAX_DATAGRAM = 4096
+EXPIRE_INTERVAL = 1.0  # s entre verificações de membros ociosos
+
+
+class RelayServer:
+
+	def __init__(self, bind_ip="0.0.0.0", port=DEFAULT_PORT, top_k=3, rank_interval=0.1, idle_timeout=15.0):
+		self.bind_ip = bind_ip
+		self.port = int(port)
+		self.top_k = max(1, int(top_k))
+		self.rank_interval = float(rank_interval)
+		self.idle_timeout = float(idle_timeout)
+		self._members = {}  # addr -> {"stream_id", "username", "level", "last_audio", "last_seen"}
+		self._lock = threading.Lock()
+		self._active = frozenset()
+		self._next_rank = 0.0
+		self._next_expire = 0.0
+		self._running = False
+		self._sock = None
+		self._thread = threading.Thread(target=self._serve)
+		self._thread.daemon = True
+		self.received = 0
+		self.forwarded = 0
+
+	def start(self):
+		self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self._sock.bind((self.bind_ip, self.port))
+		self._sock.settimeout(0.5)
+		self.port = self._sock.getsockname()[1]
+		self._running = True
+		self._thread.start()
+		logging.info("Relay escutando em %s:%s (top-%d)", self.bind_ip, self.port, self.top_k)
+
+	def stop(self):
+		self._running = False
+		try:
+			self._thread.join(timeout=1.0)
+		except Exception:
+			pass
+		if self._sock:
+			# Avisa os participantes que o relay saiu
+			with self._lock:
+				addrs = list(self._members)
+			for addr in addrs:
+				try:
+					self._sock.sendto(Packet.pack_control({"type": "HANGUP"}, 0, 0, 0), addr)
+				except OSError:
+					pass
+			self._sock.close()
+
+	def _serve(self):
+		# Recebe no mesmo buffer sempre: o repasse envia uma view dele, sem cópia por pacote
+		buf = bytearray(MAX_DATAGRAM)
+		view = memoryview(buf)
+		while self._running:
+			try:
+				nbytes, addr = self._sock.recvfrom_into(buf)
+				data = view[:nbytes]
+			except socket.timeout:
+				data = None
+			except OSError:
+				data = None
+			if data is not None:
+				try:
+					self.handle(data, addr)
+				except Exception:
+					logging.exception("Erro no relay ao processar pacote de %s:%s", *addr)
+			# Com tráfego contínuo o recv nunca expira: a verificação de ociosos segue o relógio
+			self.tick(time.monotonic())
+
+	def tick(self, now):
+		"""Remove os membros ociosos quando o prazo da verificação vence."""
+		if now >= self._next_expire:
+			self._next_expire = now + EXPIRE_INTERVAL
+			self._expire(now)
+
+	def handle(self, data, addr, now=None):
+		"""Processa um datagrama recebido: controle (JOIN/HANGUP) ou mídia a encaminhar."""
+		packet = Packet.unpack(data)
+		if packet is None:
+			return
+		now = time.monotonic() if now is None else now
+		self.received += 1
+		pt, _marker, _seq, _ts, stream_id, level, payload = packet
+		if pt == Packet.PT_CONTROL:
+			self._handle_control(Packet.parse_control(payload), addr, now)
+			return
+		member = self._members.get(addr)
+		if member is None:
+			return
+		member["last_seen"] = now
+		if pt == Packet.PT_REPORT:
+			# Relatórios de qualidade são ponta a ponta; o relay não os repassa
+			return
+		if pt == Packet.PT_CN:
+			member["level"] = -Packet.LEVEL_SILENT
+		elif pt != Packet.PT_FEC:
+			# Média móvel do nível em dBov: suaviza trocas de locutor
+			member["level"] += (-level - member["level"]) * 0.3
+			member["last_audio"] = now
+		if now >= self._next_rank:
+			self._rank(now)
+		if addr not in self._active:
+			return
+		for other in self._members:
+			if other != addr:
+				self._sock.sendto(data, other)
+				self.forwarded += 1
+
+	def _rank(self, now):
+		# Locutores ativos: quem mandou áudio recentemente, ordenado pelo nível suavizado
+		self._next_rank = now + self.rank_interval
+		speaking = [(m["level"], addr) for addr, m in self._members.items() if now - m["last_audio"] < 0.5]
+		speaking.sort(reverse=True)
+		self._active = frozenset(addr for _level, addr in speaking[:self.top_k])
+
+	def _handle_control(self, msg, addr, now):
+		if not msg:
+			return
+		kind = msg.get("type")
+		if kind == "JOIN":
+			with self._lock:
+				is_new = addr not in self._members
+				member = self._members.setdefault(addr, {"level": -Packet.LEVEL_SILENT, "last_audio": 0.0})
+				member["stream_id"] = msg.get("stream_id")
+				member["username"] = msg.get("username")
+				member["last_seen"] = now
+			if is_new:
+				logging.info("Relay: %s:%s entrou (%d participantes)", addr[0], addr[1], len(self._members))
+				self._publish_members()
+			else:
+				# JOIN periódico: reenvia a lista só para quem pediu (cobre um MEMBERS perdido)
+				self._publish_members([addr])
+		elif kind == "HANGUP":
+			with self._lock:
+				removed = self._members.pop(addr, None)
+			if removed is not None:
+				logging.info("Relay: %s:%s saiu", *addr)
+				self._publish_members()
+
+	def _expire(self, now):
+		with self._lock:
+			stale = [addr for addr, m in self._members.items() if now - m["last_seen"] > self.idle_timeout]
+			for addr in stale:
+				del self._members[addr]
+		if stale:
+			logging.info("Relay: %d participante(s) ocioso(s) removido(s)", len(stale))
+			# Quem saiu não pode continuar entre os locutores repassados
+			self._active = self._active - frozenset(stale)
+			self._publish_members()
+
+	def _publish_members(self, addrs=None):
+		with self._lock:
+			members = [{"stream_id": m.get("stream_id"), "username": m.get("username")} for m in self._members.values()]
+			addrs = list(self._members) if addrs is None else addrs
+		packet = Packet.pack_control({"type": "MEMBERS", "members": members}, 0, 0, 0)
+		for addr in addrs:
+			try:
+				self._sock.sendto(packet, addr)
+			except OSError:
+				pass
+
+	def stats(self):
+		with self._lock:
+			return {
+				"port": self.port,
+				"top_k": self.top_k,
+				"participants": len(self._members),
+				"active": len(self._active),
+				"received": self.received,
+				"forwarded": self.forwarded,
+			}
+
+
+def elect(candidates, preferred=None):
+	"""Escolhe o relay da sala entre os nós que anunciam relay_port nos beacons.
+
+	Uma escolha do usuário (`preferred`) tem prioridade; senão vence o menor id,
+	então todos os nós chegam à mesma resposta sem trocar mensagens.
+	"""
+	if preferred:
+		return preferred
+	capable = [c for c in candidates if c.get("relay_port")]
+	if not capable:
+		return None
+	winner = min(capable, key=lambda c: str(c.get("id")))
+	return {"id": winner.get("id"), "ip": winner.get("ip"), "port": int(winner["relay_port"])}
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Relay de encaminhamento seletivo do Concord")
+	parser.add_argument("--bind", default="0.0.0.0")
+	parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+	parser.add_argument("--top-k", type=int, default=3)
+	parser.add_argument("--announce", action="store_true", help="anuncia o relay nos beacons de descoberta")
+	args = parser.parse_args()
+	logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+	relay = RelayServer(args.bind, args.port, args.top_k)
+	relay.start()
+	discovery = None
+	if args.announce:
+		import Discovery
+		discovery = Discovery.DiscoveryService(self_id=str(uuid.uuid4()), display_name="Concord Relay", username="Concord Relay", control_port=0, beacon_interval=5.0, relay_port=relay.port)
+		discovery.start()
+	try:
+		while True:
+			time.sleep(10)
+			logging.info("Relay: %s", relay.stats())
+	except KeyboardInterrupt:
+		pass
+	finally:
+		if discovery:
+			discovery.send_goodbye()
+			discovery.stop()
+		relay.stop()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,181 @@
+"""Relatórios de qualidade no estilo RTCP (RFC 3550) e estimativa de MOS.
+
+Cada ponta envia periodicamente um relatório com o que transmitiu (pacotes,
+bytes e um carimbo de tempo compacto) e um bloco por participante ouvido
+(perda na janela e acumulada, maior sequência, jitter entre chegadas e o eco
+do último relatório recebido dele). Ao receber o bloco sobre o próprio stream,
+quem enviou o relatório original calcula o RTT = agora - LSR - DLSR.
+"""
+import struct
+import time
+
+REPORT_INTERVAL = 5.0  # segundos entre relatórios (o mínimo recomendado pelo RFC 3550)
+
+# Parte do remetente: carimbo compacto (1/65536 s) | pacotes enviados | bytes enviados | número de blocos
+SENDER = struct.Struct("!IIIB")
+# Bloco de recepção: stream | fração perdida (1/256) | perdas acumuladas | maior seq estendida | jitter (amostras) | LSR | DLSR
+BLOCK = struct.Struct("!IBiIIII")
+
+
+def compact_now():
+	"""Relógio no formato "NTP compacto" do RTCP: 16.16 bits de segundos, com wrap-around."""
+	return int(time.monotonic() * 65536) & 0xFFFFFFFF
+
+
+def pack_report(packets_sent, octets_sent, blocks):
+	"""Monta o payload de um relatório. `blocks` é uma lista de dicts produzidos por ReceptionStats.block()."""
+	out = [SENDER.pack(compact_now(), packets_sent & 0xFFFFFFFF, octets_sent & 0xFFFFFFFF, len(blocks))]
+	for b in blocks:
+		out.append(BLOCK.pack(
+			b["stream_id"], b["fraction_lost"], max(-0x800000, min(0x7FFFFF, b["cumulative_lost"])),
+			b["highest_seq"] & 0xFFFFFFFF, int(b["jitter"]) & 0xFFFFFFFF, b["lsr"], b["dlsr"],
+		))
+	return b"".join(out)
+
+
+def unpack_report(payload):
+	"""Decodifica um relatório. Retorna (ntp, pacotes, bytes, blocos) ou None se estiver truncado."""
+	if len(payload) < SENDER.size:
+		return None
+	ntp, packets, octets, count = SENDER.unpack_from(payload)
+	if len(payload) < SENDER.size + count * BLOCK.size:
+		return None
+	blocks = []
+	for i in range(count):
+		stream_id, fraction, lost, highest, jitter, lsr, dlsr = BLOCK.unpack_from(payload, SENDER.size + i * BLOCK.size)
+		blocks.append({
+			"stream_id": stream_id, "fraction_lost": fraction, "cumulative_lost": lost,
+			"highest_seq": highest, "jitter": jitter, "lsr": lsr, "dlsr": dlsr,
+		})
+	return ntp, packets, octets, blocks
+
+
+class ReceptionStats:
+	"""Estatísticas de recepção de um stream remoto (RFC 3550, apêndice A.3 e A.8)."""
+
+	def __init__(self, rate):
+		self.rate = int(rate)
+		self.reset()
+
+	def reset(self):
+		self.base_seq = None
+		self.highest_seq = None
+		self.received = 0
+		self.octets = 0
+		self.jitter = 0.0  # em amostras
+		self._transit = None
+		self._expected_prior = 0
+		self._received_prior = 0
+		self._octets_prior = 0
+		self._prior_time = time.monotonic()
+		self.fraction_lost = 0
+		self.bitrate_kbps = 0.0
+		# Último relatório recebido deste participante (para o eco LSR/DLSR)
+		self._lsr = 0
+		self._lsr_arrival = None
+		# Visão do outro lado sobre o nosso stream e o RTT medido
+		self.remote = None
+		self.rtt_ms = None
+
+	def update(self, ext_seq, ext_ts, nbytes, arrival=None):
+		"""Registra um pacote de mídia com sequência e timestamp já estendidos."""
+		arrival = time.monotonic() if arrival is None else arrival
+		if self.base_seq is None:
+			self.base_seq = ext_seq
+			self.highest_seq = ext_seq
+		elif ext_seq > self.highest_seq:
+			self.highest_seq = ext_seq
+		self.received += 1
+		self.octets += nbytes
+		# Jitter entre chegadas: média móvel (1/16) da variação do tempo de trânsito
+		transit = arrival * self.rate - ext_ts
+		if self._transit is not None:
+			self.jitter += (abs(transit - self._transit) - self.jitter) / 16.0
+		self._transit = transit
+
+	@property
+	def expected(self):
+		return 0 if self.base_seq is None else self.highest_seq - self.base_seq + 1
+
+	@property
+	def cumulative_lost(self):
+		# Duplicatas podem deixar o valor negativo, como no RTCP
+		return self.expected - self.received
+
+	def on_sender_report(self, ntp, arrival=None):
+		self._lsr = ntp
+		self._lsr_arrival = time.monotonic() if arrival is None else arrival
+
+	def on_receiver_block(self, block, now_ntp=None):
+		"""Bloco que o outro lado mandou sobre o nosso stream: guarda a visão dele e mede o RTT."""
+		self.remote = {
+			"fraction_lost": block["fraction_lost"] / 256.0,
+			"cumulative_lost": block["cumulative_lost"],
+			"jitter_ms": round(block["jitter"] * 1000.0 / self.rate, 2),
+		}
+		if block["lsr"]:
+			now_ntp = compact_now() if now_ntp is None else now_ntp
+			rtt = (now_ntp - block["lsr"] - block["dlsr"]) & 0xFFFFFFFF
+			if rtt < 0x80000000:
+				self.rtt_ms = rtt * 1000.0 / 65536.0
+
+	def block(self, stream_id, now=None):
+		"""Fecha a janela atual e devolve o bloco de recepção a enviar no próximo relatório."""
+		now = time.monotonic() if now is None else now
+		expected = self.expected
+		expected_interval = expected - self._expected_prior
+		received_interval = self.received - self._received_prior
+		lost_interval = expected_interval - received_interval
+		self.fraction_lost = 0 if expected_interval <= 0 or lost_interval <= 0 else min(255, (lost_interval << 8) // expected_interval)
+		elapsed = now - self._prior_time
+		if elapsed > 0:
+			self.bitrate_kbps = (self.octets - self._octets_prior) * 8 / elapsed / 1000.0
+		self._expected_prior = expected
+		self._received_prior = self.received
+		self._octets_prior = self.octets
+		self._prior_time = now
+		dlsr = 0
+		if self._lsr_arrival is not None:
+			dlsr = int((now - self._lsr_arrival) * 65536) & 0xFFFFFFFF
+		return {
+			"stream_id": stream_id or 0,
+			"fraction_lost": self.fraction_lost,
+			"cumulative_lost": self.cumulative_lost,
+			"highest_seq": self.highest_seq or 0,
+			"jitter": self.jitter,
+			"lsr": self._lsr,
+			"dlsr": dlsr,
+		}
+
+	def stats(self):
+		return {
+			"expected": self.expected,
+			"received_packets": self.received,
+			"cumulative_lost": max(0, self.cumulative_lost),
+			"fraction_lost": round(self.fraction_lost / 256.0, 4),
+			"interarrival_jitter_ms": round(self.jitter * 1000.0 / self.rate, 2),
+			"bitrate_kbps": round(self.bitrate_kbps, 1),
+			"rtt_ms": round(self.rtt_ms, 1) if self.rtt_ms is not None else None,
+			"remote": self.remote,
+		}
+
+
+# Fator de degradação do equipamento (Ie) e robustez a perdas (Bpl) do modelo E (ITU-T G.107/G.113)
+_CODEC_IE = {"pcm": 0.0, "pcmu": 0.0, "pcma": 0.0, "adpcm": 7.0}
+_BPL = {"silence": 4.3, "fade": 25.1, "pitch": 25.1}
+
+
+def estimate_mos(one_way_delay_ms, loss_ratio, codec="pcm", plc="fade"):
+	"""MOS estimado pelo modelo E simplificado a partir do atraso de boca a ouvido e da perda efetiva."""
+	d = max(0.0, float(one_way_delay_ms))
+	# Degradação por atraso (Id): cresce bem mais rápido acima de ~177 ms
+	delay_impairment = 0.024 * d + (0.11 * (d - 177.3) if d > 177.3 else 0.0)
+	ie = _CODEC_IE.get(codec, 0.0)
+	ppl = max(0.0, min(100.0, float(loss_ratio) * 100.0))
+	ie_eff = ie + (95.0 - ie) * ppl / (ppl + _BPL.get(plc, 25.1))
+	r = 93.2 - delay_impairment - ie_eff
+	if r <= 0:
+		return 1.0
+	if r >= 100:
+		return 4.5
+	return round(1.0 + 0.035 * r + 7e-6 * r * (r - 60.0) * (100.0 - r), 2)
@@ -1,6 +1,6 @@
 import sqlite3
 import os
-import pyaudio
+import AudioEngine
 
 
 class SettingsManager:
@@ -106,53 +106,46 @@ class SettingsManager:
 		conn.commit()
 		conn.close()
 
-	def list_audio_devices(self):
-		audio = pyaudio.PyAudio()
+	def list_audio_devices(self, refresh=False):
+		# Informações vêm do cache do engine de áudio; refresh reenumera os dispositivos
+		engine = AudioEngine.shared()
+		all_devices = engine.devices(refresh=refresh)
 		devices = []
-		try:
-			# Use apenas dispositivos do Host API padrão para evitar duplicatas, quando disponível
-			try:
-				default_host_api = audio.get_default_host_api_info().get("index")
-			except Exception:
-				default_host_api = None
-			seen_names = set()
-			for i in range(audio.get_device_count()):
-				try:
-					info = audio.get_device_info_by_index(i)
-				except Exception:
-					# Pula entradas problemáticas em vez de falhar toda a listagem
-					continue
-				# Filtra por Host API padrão
-				if default_host_api is not None and info.get("hostApi") != default_host_api:
-					continue
-				# Ignora dispositivos de loopback do WASAPI (quando presentes)
-				if info.get("isLoopbackDevice") == 1 or "loopback" in str(info.get("name", "")).lower():
-					continue
-				# Deduplica por nome (case-insensitive)
-				name_key = str(info.get("name", "")).strip().lower()
-				if name_key in seen_names:
-					continue
-				seen_names.add(name_key)
-				devices.append({
-					"index": i,
-					"name": info.get("name", f"Device {i}"),
-					"max_input_channels": int(info.get("maxInputChannels", 0) or 0),
-					"max_output_channels": int(info.get("maxOutputChannels", 0) or 0),
-				})
-		finally:
-			audio.terminate()
+		# Use apenas dispositivos do Host API padrão para evitar duplicatas, quando disponível
+		default_host_api = engine.default_host_api()
+		seen_names = set()
+		for info in all_devices:
+			i = info["index"]
+			# Filtra por Host API padrão
+			if default_host_api is not None and info.get("hostApi") != default_host_api:
+				continue
+			# Ignora dispositivos de loopback do WASAPI (quando presentes)
+			if info.get("isLoopbackDevice") == 1 or "loopback" in str(info.get("name", "")).lower():
+				continue
+			# Deduplica por nome (case-insensitive)
+			name_key = str(info.get("name", "")).strip().lower()
+			if name_key in seen_names:
+				continue
+			seen_names.add(name_key)
+			devices.append({
+				"index": i,
+				"name": info.get("name", f"Device {i}"),
+				"max_input_channels": int(info.get("maxInputChannels", 0) or 0),
+				"max_output_channels": int(info.get("maxOutputChannels", 0) or 0),
+			})
 		return devices
 
-	def get_input_devices(self):
-		return [d for d in self.list_audio_devices() if d["max_input_channels"] > 0]
+	def get_input_devices(self, refresh=False):
+		return [d for d in self.list_audio_devices(refresh) if d["max_input_channels"] > 0]
 
-	def get_output_devices(self):
-		return [d for d in self.list_audio_devices() if d["max_output_channels"] > 0]
+	def get_output_devices(self, refresh=False):
+		return [d for d in self.list_audio_devices(refresh) if d["max_output_channels"] > 0]
 
 	def refresh_audio_device_cache(self):
 		"""Escaneia dispositivos e atualiza o cache em tabela dedicada."""
-		inputs = self.get_input_devices()
-		outputs = self.get_output_devices()
+		devices = self.list_audio_devices(refresh=True)
+		inputs = [d for d in devices if d["max_input_channels"] > 0]
+		outputs = [d for d in devices if d["max_output_channels"] > 0]
 		conn = sqlite3.connect(self.db_path)
 		cursor = conn.cursor()
 		# Limpa cache anterior
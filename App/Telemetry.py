@@ -0,0 +1,71 @@
+"""Histogramas de latência do estabelecimento de chamadas.
+
+Cada etapa (OFFER -> RINGING, OFFER -> ACCEPT, ACCEPT -> primeiro pacote de
+mídia e o total do chamador) tem um histograma com faixas fixas em ms e uma
+janela das últimas amostras para os percentis.
+"""
+import threading
+from collections import deque
+
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SAMPLES = 256
+
+# Etapas registradas pela aplicação
+SETUP_STAGES = ("ringing", "answer", "first_media", "total")
+
+
+class Histogram:
+
+	def __init__(self, buckets=BUCKETS_MS, samples=SAMPLES):
+		self.buckets = tuple(buckets)
+		self._counts = [0] * (len(self.buckets) + 1)  # a última faixa é "acima do maior limite"
+		self._recent = deque(maxlen=int(samples))
+		self._lock = threading.Lock()
+		self.count = 0
+		self.total = 0.0
+
+	def record(self, value_ms):
+		value_ms = float(value_ms)
+		with self._lock:
+			i = 0
+			while i < len(self.buckets) and value_ms > self.buckets[i]:
+				i += 1
+			self._counts[i] += 1
+			self._recent.append(value_ms)
+			self.count += 1
+			self.total += value_ms
+
+	def snapshot(self):
+		with self._lock:
+			recent = sorted(self._recent)
+			counts = list(self._counts)
+			count, total = self.count, self.total
+
+		def pct(p):
+			if not recent:
+				return None
+			return round(recent[min(len(recent) - 1, int(len(recent) * p / 100.0))], 1)
+
+		return {
+			"count": count,
+			"mean_ms": round(total / count, 1) if count else None,
+			"p50_ms": pct(50),
+			"p90_ms": pct(90),
+			"p99_ms": pct(99),
+			"max_ms": round(recent[-1], 1) if recent else None,
+			"buckets": [{"le_ms": le, "count": c} for le, c in zip(self.buckets + (None,), counts)],
+		}
+
+
+class SetupTelemetry:
+	"""Um histograma por etapa do estabelecimento de chamadas."""
+
+	def __init__(self, stages=SETUP_STAGES):
+		self.histograms = {stage: Histogram() for stage in stages}
+
+	def record(self, stage, value_ms):
+		if value_ms is not None and stage in self.histograms:
+			self.histograms[stage].record(value_ms)
+
+	def snapshot(self):
+		return {stage: h.snapshot() for stage, h in self.histograms.items()}
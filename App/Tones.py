@@ -0,0 +1,131 @@
+"""Tons de sinalização: teste de saída, chamando (ringback) e campainha.
+
+As formas de onda são geradas com NumPy de uma vez e guardadas em cache por
+(frequência, duração, taxa, volume); uma cadência inteira (tom + pausa) também
+fica pronta em memória. A reprodução usa o AudioEngine e escreve blocos de
+WRITE_MS, então um bip custa poucas chamadas em vez de uma por amostra.
+"""
+import functools
+import threading
+import logging
+import numpy as np
+import AudioEngine
+
+RATE = 44100
+FADE_MS = 5.0  # rampa de entrada/saída de cada tom, evita estalos
+WRITE_MS = 100  # tamanho de cada escrita no stream; também é o tempo máximo para parar
+
+# Cadências: sequência de (frequência em Hz ou tupla de frequências somadas, duração em s); None é silêncio
+TEST = ((880.0, 0.6),)
+RINGBACK = ((425.0, 1.0), (None, 4.0))  # tom de chamando (ITU-T E.180, usado no Brasil)
+RINGTONE = ((880.0, 0.4), (None, 0.2), (660.0, 0.4), (None, 2.0))
+
+
+@functools.lru_cache(maxsize=64)
+def tone(frequency, duration, rate=RATE, volume=0.6):
+	"""PCM 16 bits mono de um tom (ou da soma de tons, se `frequency` for uma tupla)."""
+	n = int(round(rate * duration))
+	freqs = frequency if isinstance(frequency, tuple) else (frequency,)
+	t = np.arange(n, dtype=np.float64) * (2.0 * np.pi / rate)
+	wave = np.zeros(n, dtype=np.float64)
+	for f in freqs:
+		wave += np.sin(t * f)
+	wave *= 32767.0 * max(0.0, min(1.0, volume)) / len(freqs)
+	fade = min(n // 2, int(rate * FADE_MS / 1000.0))
+	if fade:
+		ramp = np.linspace(0.0, 1.0, fade)
+		wave[:fade] *= ramp
+		wave[n - fade:] *= ramp[::-1]
+	return wave.astype("<i2").tobytes()
+
+
+@functools.lru_cache(maxsize=16)
+def render(pattern, rate=RATE, volume=0.6):
+	"""Um ciclo completo de uma cadência como um único buffer PCM."""
+	parts = []
+	for frequency, duration in pattern:
+		if frequency is None:
+			parts.append(bytes(int(round(rate * duration)) * 2))
+		else:
+			parts.append(tone(frequency, duration, rate, volume))
+	return b"".join(parts)
+
+
+class TonePlayer:
+	"""Toca uma cadência em segundo plano no dispositivo de saída (uma por vez)."""
+
+	def __init__(self, engine=None, rate=RATE):
+		self._engine = engine
+		self.rate = int(rate)
+		self._lock = threading.Lock()
+		self._thread = None
+		self._stop = threading.Event()
+		self._ok = False
+		self.current = None
+
+	@property
+	def engine(self):
+		return self._engine or AudioEngine.shared()
+
+	@property
+	def playing(self):
+		thread = self._thread
+		return thread is not None and thread.is_alive()
+
+	def play(self, pattern, device=None, volume=0.6, repeat=False, max_seconds=None, wait=False):
+		"""Interrompe o tom atual e começa `pattern`. Com wait=True bloqueia e devolve se tocou até o fim."""
+		# Volume arredondado para o cache não crescer com cada posição do controle
+		data = render(pattern, self.rate, round(float(volume), 2))
+		with self._lock:
+			self._halt()
+			self._stop = threading.Event()
+			self._ok = False
+			self.current = pattern
+			self._thread = threading.Thread(target=self._run, args=(data, device, repeat, max_seconds, self._stop), daemon=True)
+			self._thread.start()
+			thread = self._thread
+		if wait:
+			thread.join()
+			return self._ok
+		return True
+
+	def stop(self, pattern=None):
+		"""Para o tom atual (ou só se for `pattern`)."""
+		with self._lock:
+			if pattern is not None and self.current is not pattern:
+				return
+			self._halt()
+
+	def _halt(self):
+		self._stop.set()
+		if self._thread is not None and self._thread is not threading.current_thread():
+			self._thread.join(timeout=1.0)
+		self._thread = None
+		self.current = None
+
+	def _run(self, data, device, repeat, max_seconds, stop):
+		engine = self.engine
+		try:
+			stream = engine.open(format=AudioEngine.PA_INT16, channels=1, rate=self.rate, output=True, frames_per_buffer=1024,
+				output_device_index=int(device) if device is not None else None)
+		except Exception:
+			logging.exception("Falha ao abrir o dispositivo de saída para o tom")
+			return
+		step = int(self.rate * WRITE_MS / 1000.0) * 2
+		limit = None if max_seconds is None else int(self.rate * max_seconds) * 2
+		written = 0
+		try:
+			while not stop.is_set():
+				for start in range(0, len(data), step):
+					if stop.is_set() or (limit is not None and written >= limit):
+						return
+					block = data[start:start + step]
+					stream.write(block)
+					written += len(block)
+				if not repeat:
+					self._ok = True
+					return
+		except Exception:
+			logging.exception("Erro ao tocar tom")
+		finally:
+			engine.release(stream)
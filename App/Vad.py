@@ -0,0 +1,76 @@
+import math
+import numpy as np
+
+import Dsp
+
+SAMPLE_WIDTH = 2
+FULL_SCALE = 32768.0
+SILENCE_DBOV = -127
+
+
+def level_dbov(pcm):
+	"""Nível RMS do quadro em dBov (0 = fundo de escala, -127 = silêncio digital)."""
+	rms, _peak = Dsp.meter(pcm)
+	return Dsp.to_dbov(rms)
+
+
+class VoiceActivityDetector:
+	"""VAD por energia com piso de ruído adaptativo e hangover.
+
+	Um quadro é voz quando fica `threshold_db` acima do piso de ruído estimado
+	(e acima de `min_level_dbov`). O piso desce rápido e sobe devagar, então
+	acompanha ventiladores e ar-condicionado sem "aprender" a fala como ruído.
+	"""
+
+	def __init__(self, frame_ms, threshold_db=9.0, min_level_dbov=-55.0, hangover_ms=300, initial_floor_dbov=-60.0):
+		self.threshold_db = float(threshold_db)
+		self.min_level_dbov = float(min_level_dbov)
+		self.hangover_frames = max(1, int(round(hangover_ms / float(frame_ms))))
+		self.noise_floor = float(initial_floor_dbov)
+		self._hangover = 0
+		self.level = SILENCE_DBOV
+
+	def process(self, pcm):
+		"""Retorna (é_voz, nível_dbov) para um quadro PCM 16 bits."""
+		level = level_dbov(pcm)
+		self.level = level
+		if level < self.noise_floor:
+			self.noise_floor += (level - self.noise_floor) * 0.5
+		else:
+			self.noise_floor += (level - self.noise_floor) * 0.005
+		speech = level > self.noise_floor + self.threshold_db and level > self.min_level_dbov
+		if speech:
+			self._hangover = self.hangover_frames
+			return True, level
+		if self._hangover > 0:
+			self._hangover -= 1
+			return True, level
+		return False, level
+
+
+def encode_comfort_noise(level):
+	"""Payload de ruído de conforto (RFC 3389): um byte com o nível em -dBov."""
+	return bytes([max(0, min(127, int(round(-level))))])
+
+
+def decode_comfort_noise(payload):
+	if not payload:
+		return SILENCE_DBOV
+	return -int(payload[0] & 0x7F)
+
+
+class ComfortNoiseGenerator:
+	"""Gera ruído branco no nível informado pelos pacotes de ruído de conforto."""
+
+	_UNIFORM_RMS = FULL_SCALE / math.sqrt(3.0)  # RMS de amostras uniformes em toda a escala
+
+	def __init__(self):
+		self.level = SILENCE_DBOV
+		self._rng = np.random.default_rng()
+
+	def generate(self, samples):
+		if self.level <= SILENCE_DBOV:
+			return b"\x00" * (samples * SAMPLE_WIDTH)
+		factor = (FULL_SCALE * 10 ** (self.level / 20.0)) / self._UNIFORM_RMS
+		noise = self._rng.integers(-32768, 32768, samples, dtype=np.int16, endpoint=False)
+		return (noise * factor).astype(np.int16).tobytes()
@@ -2,115 +2,511 @@ import socket
 import pyaudio
 import threading
 import select
-import audioop
 import logging
+import Packet
+import Codec
+import Concealment
+import Fec
+import AudioIO
+import Conference
+import Vad
+import Rtcp
+import Dsp
+import AudioEngine
+import time
 
 # Configurações de áudio
 CHUNK = 1024  # Tamanho do buffer
 FORMAT = pyaudio.paInt16  # Formato de áudio
 CHANNELS = 1  # Mono
 RATE = 44100  # Taxa de amostragem
+FRAME_MS = CHUNK * 1000.0 / RATE  # Duração de um quadro (~23 ms)
+ENGINES = ("blocking", "callback")
+CN_INTERVAL = 0.5  # segundos entre pacotes de ruído de conforto durante o silêncio
+MAX_DATAGRAM = 4096  # maior pacote de mídia esperado (PCM cru + cabeçalhos, ou paridade FEC)
+RELAY_KEEPALIVE = 5.0  # segundos entre JOINs para o relay (mantém a inscrição durante silêncio ou mudo)
+ROSTER_RETRY = 0.5  # segundos entre reenvios da lista de membros a quem ainda não confirmou
+ROSTER_TRIES = 10  # versões antigas não confirmam: desiste depois de alguns segundos
+# Faixa aceita para o tamanho de quadro: acima de ~46 ms o PCM a 44,1 kHz não cabe em MAX_DATAGRAM,
+# e quadros minúsculos viram dezenas de milhares de pacotes por segundo
+FRAME_MS_MIN = 10.0
+FRAME_MS_MAX = 40.0
+
+
+def check_frame_ms(frame_ms):
+	"""Valida um tamanho de quadro pedido (via /call ou numa OFFER). None ou vazio = padrão (CHUNK).
+
+	Retorna o valor em ms ou None; ValueError/TypeError se for inválido ou estiver fora da faixa.
+	"""
+	if frame_ms is None or frame_ms == "":
+		return None
+	value = float(frame_ms)
+	if not FRAME_MS_MIN <= value <= FRAME_MS_MAX:
+		raise ValueError(f"frame_ms deve estar entre {FRAME_MS_MIN:g} e {FRAME_MS_MAX:g} ms: {frame_ms}")
+	return value
+
 
 class VoipRoom:
-	def __init__(self, LOCAL_IP="0.0.0.0", LOCAL_PORT=5000, REMOTE_IP="127.0.0.1", REMOTE_PORT=5000, input_device=None, output_device=None, input_volume=1.0, output_volume=1.0):
+	def __init__(self, LOCAL_IP="0.0.0.0", LOCAL_PORT=5000, REMOTE_IP="127.0.0.1", REMOTE_PORT=5000, input_device=None, output_device=None, input_volume=1.0, output_volume=1.0, codec="pcm", codec_rate=None, plc="fade", fec_group=0, engine="blocking", frame_ms=None, audio=None, dtx=True, relay=None, username=None, on_stats=None, agc=False, on_level=None, sock=None, on_first_media=None, mux=None):
 		# Configurações de rede
 		self.LOCAL_IP = LOCAL_IP
 		self.LOCAL_PORT = LOCAL_PORT
 		self.REMOTE_IP = REMOTE_IP
 		self.REMOTE_PORT = REMOTE_PORT
+		# Endereço pelo qual os outros participantes nos alcançam (LOCAL_IP pode ser 0.0.0.0)
+		self.advertised_ip = LOCAL_IP
+
+		# Tamanho do quadro: CHUNK por padrão, configurável (ex: 10 ms = 441 amostras)
+		if engine not in ENGINES:
+			raise ValueError(f"Engine de áudio desconhecida: {engine}")
+		self.engine = engine
+		frame_ms = check_frame_ms(frame_ms)
+		self.chunk = CHUNK if frame_ms is None else int(round(RATE * frame_ms / 1000.0))
+		self.frame_ms = self.chunk * 1000.0 / RATE
+		self._frame_bytes = self.chunk * 2
 
-		# Inicialização de áudio
-		self.audio = pyaudio.PyAudio()
+		# Áudio pelo engine do processo (PortAudio já inicializado e streams reaproveitados entre chamadas);
+		# um backend compatível com PyAudio, como AudioIO.LoopbackAudio, pode ser injetado
+		if audio is None:
+			self.audio = AudioEngine.shared()
+		elif isinstance(audio, AudioEngine.AudioEngine):
+			self.audio = audio
+		else:
+			self.audio = AudioEngine.AudioEngine(audio)
 
 		# Configurações de dispositivo de áudio
-		input_kwargs = {"format": FORMAT, "channels": CHANNELS, "rate": RATE, "input": True, "frames_per_buffer": CHUNK}
-		output_kwargs = {"format": FORMAT, "channels": CHANNELS, "rate": RATE, "output": True, "frames_per_buffer": CHUNK}
+		input_kwargs = {"format": FORMAT, "channels": CHANNELS, "rate": RATE, "input": True, "frames_per_buffer": self.chunk}
+		output_kwargs = {"format": FORMAT, "channels": CHANNELS, "rate": RATE, "output": True, "frames_per_buffer": self.chunk}
 		
 		if input_device is not None:
 			input_kwargs["input_device_index"] = input_device
 		if output_device is not None:
 			output_kwargs["output_device_index"] = output_device
 
-		# Fluxos de entrada (microfone) e saída (alto-falante)
-		self.input_stream = self.audio.open(**input_kwargs)
-		self.output_stream = self.audio.open(**output_kwargs)
+		# No modo callback o PortAudio chama nossas funções: a captura vai para um buffer
+		# circular drenado pela thread de envio e a reprodução sai direto do buffer de jitter
+		if self.engine == "callback":
+			self._capture_ring = AudioIO.RingBuffer(self._frame_bytes * 16)
+			self._playout_ring = AudioIO.RingBuffer(self._frame_bytes * 8)
+			input_kwargs["stream_callback"] = self._on_capture
+			output_kwargs["stream_callback"] = self._on_playout
 
-		# Controle de volume (0.0 a 1.0)
+		# Controle de volume (0.0 a 1.0), aplicado pelas cadeias de DSP junto com AGC e limitador
 		self._vol_lock = threading.Lock()
 		self._input_volume = max(0.0, min(1.0, float(input_volume)))
 		self._output_volume = max(0.0, min(1.0, float(output_volume)))
+		self.input_dsp = Dsp.DspChain(self.chunk, gain=self._input_volume, agc=agc)
+		self.output_dsp = Dsp.DspChain(self.chunk, gain=self._output_volume)
 
-		# Socket UDP
-		self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-		self.sock.bind((self.LOCAL_IP, self.LOCAL_PORT))
-		# timeouts curtos para permitir encerramento rápido
-		self.sock.settimeout(0.2)
 
-		# Threads para enviar e receber áudio
+		# Codec escolhido para esta chamada; a recepção decodifica pelo payload type de cada pacote
+		self.codec = Codec.create(codec, codec_rate, device_rate=RATE)
+
+		# Estado do enquadramento de mídia (sequência, timestamp e id do stream)
+		self.stream_id = Packet.new_stream_id()
+		self._tx_seq = 0
+		self._tx_ts = 0
+		self._tx_lock = threading.Lock()
+
+		# FEC por paridade XOR no envio (fec_group < 2 desativa)
+		self.fec_encoder = Fec.FecEncoder(fec_group)
+
+		# Participantes remotos: cada um tem buffer de jitter, ocultação de perdas e ruído de conforto
+		# próprios; a reprodução mistura todos. A captura local é enviada para todos.
+		Concealment.LossConcealer(plc)  # valida o modo antes de abrir os streams
+		self.roster = Conference.Roster(self.chunk, RATE, plc)
+		# Com relay (SFU) a mídia vai só para ele, que repassa os locutores mais ativos;
+		# os participantes são identificados pelo stream id, pois todos chegam do mesmo endereço
+		self.relay_addr = (relay[0], int(relay[1])) if relay else None
+		self.username = username
+		self._last_join = 0.0
+		self._departed = set()  # streams que saíram: pacotes atrasados não os recriam
+		# Lista de membros (ROSTER) reenviada até cada participante confirmar a versão atual
+		self._roster_lock = threading.Lock()
+		self._roster_version = 0
+		self._roster_unacked = {}  # endereço -> reenvios restantes
+		self._last_roster = 0.0
+		if self.relay_addr is None:
+			self.roster.add(REMOTE_IP, REMOTE_PORT)
+		self.mixer = Conference.Mixer(self.chunk)
+		self._silence = b"\x00" * self._frame_bytes
+
+		# Detecção de voz e transmissão descontínua: em silêncio só sai ruído de conforto
+		self.vad = Vad.VoiceActivityDetector(self.frame_ms) if dtx else None
+		self.muted = False
+		self._in_dtx = True  # o primeiro pacote de fala leva o marker
+		self._last_cn = 0.0
+		self.dtx_frames = 0
+
+		# Relatórios de qualidade (estilo RTCP): contadores de envio e callback a cada relatório recebido
+		self.on_stats = on_stats
+		# Derivação do nível do microfone (RMS, pico e amostras por quadro, antes do ganho) para o medidor das configurações
+		self.on_level = on_level
+		# Instante do primeiro pacote de mídia recebido (telemetria de estabelecimento da chamada)
+		self.on_first_media = on_first_media
+		self.first_media_at = None
+		self.packets_sent = 0
+		self.octets_sent = 0
+		self.send_bitrate_kbps = 0.0
+		self._report_octets = 0
+		self._last_report = time.monotonic()
+
+		# Threads para enviar, receber e reproduzir áudio
 		self.running = True
 		self.send_thread = threading.Thread(target=self.send_audio)
 		self.receive_thread = threading.Thread(target=self.receive_audio)
+		self.playout_thread = threading.Thread(target=self.playout_audio)
 		self.send_thread.daemon = True
 		self.receive_thread.daemon = True
+		self.playout_thread.daemon = True
+
+		# Socket UDP: normalmente já vem vinculado da negociação (Discovery.MediaSocketPool);
+		# no modo de porta única a mídia usa o socket do Mux.UdpMux e chega pelo laço dele
+		self.mux = mux
+		if mux is not None:
+			sock = mux.channel(self._handle_datagram)
+			self.LOCAL_PORT = mux.port
+		elif sock is None:
+			sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+			sock.bind((self.LOCAL_IP, self.LOCAL_PORT))
+		else:
+			self.LOCAL_PORT = sock.getsockname()[1]
+		self.sock = sock
+		# timeouts curtos para permitir encerramento rápido
+		self.sock.settimeout(0.2)
+		# Buffer único de recepção: recv_into escreve nele e o parse trabalha com memoryview,
+		# então nenhum bytes é criado por pacote (o payload é copiado para o pool do participante)
+		self._rx_buf = bytearray(MAX_DATAGRAM)
+		self._rx_view = memoryview(self._rx_buf)
+
+		# Fluxos de entrada (microfone) e saída (alto-falante); abertos por último porque
+		# no modo callback o PortAudio começa a chamar _on_capture/_on_playout imediatamente
+		try:
+			self.input_stream = self.audio.open(**input_kwargs)
+			try:
+				self.output_stream = self.audio.open(**output_kwargs)
+			except Exception:
+				self.audio.release(self.input_stream)
+				raise
+		except Exception:
+			# Sem áudio não há chamada: o outro lado já aceitou (ou ofereceu), então recebe HANGUP,
+			# e o socket (ou o canal no mux) não fica preso a uma sala que nunca vai rodar
+			self.running = False
+			self.send_hangup_notification()
+			self.sock.close()
+			raise
 
 	# Função para enviar áudio
 	def send_audio(self):
 		while self.running:
 			try:
 				# Captura áudio do microfone
-				data = self.input_stream.read(CHUNK, exception_on_overflow=False)
-				# Aplica volume de entrada
-				with self._vol_lock: # Garante que o lock seja liberado
-					input_vol = self._input_volume
-				if input_vol != 1.0:
-					try:
-						data = audioop.mul(data, 2, input_vol)
-					except audioop.error:
-						pass
-				# Envia para o IP e porta remotos
-				self.sock.sendto(data, (self.REMOTE_IP, self.REMOTE_PORT))
+				data = self._read_capture()
+				if data is None:
+					continue
+				# Volume de entrada, AGC e limitador em uma passada
+				data = self.input_dsp.process(data)
+				if self.on_level is not None:
+					self.on_level(self.input_dsp.rms, self.input_dsp.peak, self.chunk)
+				if self.relay_addr is not None and time.monotonic() - self._last_join >= RELAY_KEEPALIVE:
+					self._join_relay()
+				elif self.relay_addr is None and time.monotonic() - self._last_report >= Rtcp.REPORT_INTERVAL:
+					self._send_report()
+				if self._roster_unacked and time.monotonic() - self._last_roster >= ROSTER_RETRY:
+					self._resend_roster()
+				if self.muted:
+					# Mudo de verdade: nada de mídia na rede, só o relógio de timestamp avança
+					self._advance(self.chunk)
+					continue
+				speech, level = self.vad.process(data) if self.vad else (True, Vad.level_dbov(data))
+				if not speech:
+					# Silêncio: envia ruído de conforto de tempos em tempos em vez do quadro
+					now = time.monotonic()
+					if not self._in_dtx or now - self._last_cn >= CN_INTERVAL:
+						self._send_comfort_noise(level)
+						self._last_cn = now
+					self._in_dtx = True
+					self.dtx_frames += 1
+					self._advance(self.chunk)
+					continue
+				# Envia para o IP e porta remotos; o marker sinaliza o início de uma rajada de fala
+				marker = self._in_dtx
+				self._in_dtx = False
+				self._send_media(self.codec.payload_type, self.codec.encode(data), self.chunk, marker, level)
 			except Exception as e:
 				logging.exception("Erro no envio de áudio")
 
+	def _read_capture(self):
+		if self.engine == "callback":
+			# Timeout curto para permitir encerramento rápido
+			return self._capture_ring.read(self._frame_bytes, timeout=0.2)
+		return self.input_stream.read(self.chunk, exception_on_overflow=False)
+
+	# Callback de captura (thread do PortAudio): só copia para o buffer circular
+	def _on_capture(self, in_data, frame_count, time_info, status):
+		if in_data:
+			self._capture_ring.write(in_data)
+		return None, pyaudio.paContinue if self.running else pyaudio.paComplete
+
 	# Função para receber áudio
 	def receive_audio(self):
 		while self.running:
 			try:
-				# Recebe dados UDP
-				data, addr = self.sock.recvfrom(CHUNK * 2)  # O buffer pode ser ajustado
-				# Verifica se é uma mensagem de controle (ex: HANGUP)
-				if len(data) < 100 and b'{"type":"HANGUP"}' in data:
-					logging.info("Recebida notificação de HANGUP. Encerrando a chamada.")
-					self.running = False # Sinaliza para as threads pararem
-					continue
-
-				# Aplica volume de saída
-				with self._vol_lock: # Garante que o lock seja liberado
-					output_vol = self._output_volume
-				if output_vol != 1.0:
-					try:
-						data = audioop.mul(data, 2, output_vol) # type: ignore
-					except audioop.error:
-						pass
-				# Reproduz o áudio recebido
-				self.output_stream.write(data)
+				# Recebe dados UDP direto no buffer pré-alocado
+				nbytes, addr = self.sock.recvfrom_into(self._rx_buf)
+				self._handle_datagram(self._rx_view[:nbytes], addr)
 			except socket.timeout:
 				# permite checar self.running periodicamente
 				continue
 			except Exception as e:
 				logging.exception("Erro ao receber áudio")
 
+	def _handle_datagram(self, data, addr):
+		"""Trata um pacote recebido; devolve se ele pertence a esta sala (usado pelo mux para rotear o stream)."""
+		packet = Packet.unpack(data)
+		if packet is None:
+			return False
+		pt, marker, seq, ts, stream_id, level, payload = packet
+		if pt == Packet.PT_CONTROL:
+			known = addr == self.relay_addr or self.roster.get(addr) is not None
+			self._handle_control(Packet.parse_control(payload), addr)
+			return known
+		if pt == Packet.PT_REPORT:
+			participant = self.roster.get(addr)
+			if participant is not None and participant.receive_report(payload, self.stream_id) and self.on_stats:
+				self.on_stats()
+			return participant is not None
+		if addr == self.relay_addr:
+			# Mídia repassada pelo relay: o participante é o dono do stream
+			key = ("stream", stream_id)
+			participant = self.roster.get(key)
+			if participant is None and stream_id not in self._departed and stream_id != self.stream_id:
+				participant = self.roster.add(addr[0], addr[1], key=key)
+		else:
+			# Só aceita mídia de participantes conhecidos da sala
+			participant = self.roster.get(addr)
+		if participant is None:
+			return False
+		participant.receive(pt, marker, seq, ts, stream_id, payload)
+		if self.first_media_at is None:
+			self.first_media_at = time.monotonic()
+			if self.on_first_media:
+				self.on_first_media(self.first_media_at)
+		return True
+
+	# Função para reproduzir o áudio do buffer de jitter (modo bloqueante)
+	def playout_audio(self):
+		while self.running:
+			try:
+				# Reproduz o áudio; o write bloqueante dita o ritmo da reprodução
+				# (o PyAudio exige um buffer somente leitura, então a view vira bytes aqui)
+				self.output_stream.write(bytes(self._next_playout_frame()))
+			except Exception as e:
+				logging.exception("Erro na reprodução de áudio")
+
+	# Callback de reprodução (thread do PortAudio): puxa quadros do buffer de jitter
+	def _on_playout(self, in_data, frame_count, time_info, status):
+		needed = frame_count * 2
+		if not self.running:
+			return b"\x00" * needed, pyaudio.paComplete
+		try:
+			# Quadros reamostrados podem variar em uma amostra: acumula até fechar o bloco pedido
+			while len(self._playout_ring) < needed:
+				self._playout_ring.write(self._next_playout_frame())
+			return self._playout_ring.read(needed), pyaudio.paContinue
+		except Exception:
+			logging.exception("Erro na reprodução de áudio")
+			return b"\x00" * needed, pyaudio.paContinue
+
+	def _next_playout_frame(self):
+		participants = self.roster.all()
+		if len(participants) == 1:
+			data = participants[0].next_frame()
+		elif participants:
+			# Conferência: mistura vetorizada de todos os participantes
+			data = self.mixer.mix([p.next_frame() for p in participants])
+		else:
+			data = self._silence
+		# Volume de saída e limitador (a soma de vários participantes pode passar do fundo de escala)
+		return self.output_dsp.process(data)
+
 	# Função para iniciar as threads
 	def start(self):
 		self.send_thread.start()
-		self.receive_thread.start()
-		print(f"VoIP iniciado. Recebendo em {self.LOCAL_IP}:{self.LOCAL_PORT} e enviando para {self.REMOTE_IP}:{self.REMOTE_PORT}.")
+		if self.mux is None:
+			self.receive_thread.start()
+		if self.engine == "blocking":
+			self.playout_thread.start()
+		if self.relay_addr is not None:
+			self._join_relay()
+		print(f"VoIP iniciado. Recebendo em {self.LOCAL_IP}:{self.LOCAL_PORT} e enviando para {', '.join(f'{ip}:{port}' for ip, port in self._targets())}.")
+
+	def _frame(self, payload_type, payload, samples, marker=False, level=None):
+		# Monta o cabeçalho e avança sequência/timestamp de forma atômica
+		with self._tx_lock:
+			packet = Packet.pack(payload_type, self._tx_seq, self._tx_ts, self.stream_id, payload, marker, Packet.level_byte(level))
+			self._tx_seq += 1
+			self._tx_ts += samples
+		return packet
+
+	def _advance(self, samples):
+		# Quadro não transmitido (silêncio ou mudo): o timestamp continua medindo o tempo real
+		with self._tx_lock:
+			self._tx_ts += samples
+
+	def _send_media(self, payload_type, payload, samples, marker=False, level=None):
+		with self._tx_lock:
+			seq, ts = self._tx_seq, self._tx_ts
+		self._send_all(self._frame(payload_type, payload, samples, marker, level))
+		self.packets_sent += 1
+		self.octets_sent += len(payload)
+		parity = self.fec_encoder.add(seq, payload_type, ts, payload)
+		if parity is not None:
+			base_seq, parity_payload = parity
+			self._send_all(Packet.pack(Packet.PT_FEC, base_seq, ts, self.stream_id, parity_payload))
+
+	def _targets(self):
+		return [self.relay_addr] if self.relay_addr is not None else self.roster.addresses()
+
+	def _send_all(self, packet):
+		# O mesmo pacote (mesmo stream id e sequência) vai para cada participante (ou só para o relay)
+		for addr in self._targets():
+			try:
+				self.sock.sendto(packet, addr)
+			except OSError:
+				logging.debug("Falha ao enviar mídia para %s:%s", *addr)
+
+	def _send_comfort_noise(self, level):
+		# Não consome número de sequência: a fala seguinte continua contígua para o buffer de jitter
+		with self._tx_lock:
+			packet = Packet.pack(Packet.PT_CN, self._tx_seq, self._tx_ts, self.stream_id, Vad.encode_comfort_noise(level))
+		self._send_all(packet)
+
+	def _send_report(self):
+		# Um relatório para todos, com um bloco de recepção por participante ouvido
+		now = time.monotonic()
+		elapsed = now - self._last_report
+		if elapsed > 0:
+			self.send_bitrate_kbps = (self.octets_sent - self._report_octets) * 8 / elapsed / 1000.0
+		self._report_octets = self.octets_sent
+		self._last_report = now
+		blocks = [p.reception.block(p.stream_id, now) for p in self.roster.all() if p.stream_id is not None]
+		payload = Rtcp.pack_report(self.packets_sent, self.octets_sent, blocks)
+		with self._tx_lock:
+			packet = Packet.pack(Packet.PT_REPORT, self._tx_seq, self._tx_ts, self.stream_id, payload)
+		self._send_all(packet)
+
+	def _handle_control(self, msg, addr):
+		if not msg:
+			return
+		if addr == self.relay_addr:
+			self._handle_relay_control(msg)
+			return
+		if msg.get("type") == "HANGUP":
+			# Só quem desligou sai da sala; sem ninguém restante a chamada termina
+			self.roster.remove(addr)
+			logging.info("Recebida notificação de HANGUP de %s:%s.", *addr)
+			if len(self.roster) == 0:
+				logging.info("Nenhum participante restante. Encerrando a chamada.")
+				self.running = False # Sinaliza para as threads pararem
+		elif msg.get("type") == "ROSTER":
+			# Lista de membros enviada por quem convidou alguém: completa a malha
+			if self.roster.get(addr) is None:
+				return
+			for member in msg.get("members", []):
+				try:
+					ip, port = member[0], int(member[1])
+				except (IndexError, TypeError, ValueError):
+					continue
+				if self._is_self(ip, port):
+					continue
+				if self.roster.get((ip, port)) is None and self.roster.add(ip, port) is not None:
+					logging.info("Participante %s:%s entrou na conferência.", ip, port)
+			if "version" in msg:
+				self._send_control({"type": "ROSTER_ACK", "version": msg["version"]}, [addr])
+		elif msg.get("type") == "ROSTER_ACK":
+			with self._roster_lock:
+				if msg.get("version") == self._roster_version:
+					self._roster_unacked.pop(addr, None)
+
+	def _handle_relay_control(self, msg):
+		if msg.get("type") == "HANGUP":
+			logging.info("O relay encerrou. Encerrando a chamada.")
+			self.running = False
+		elif msg.get("type") == "MEMBERS":
+			# Lista de membros do relay: atualiza nomes e remove quem saiu
+			present = set()
+			for member in msg.get("members", []):
+				stream_id = member.get("stream_id") if isinstance(member, dict) else None
+				if stream_id is None or stream_id == self.stream_id:
+					continue
+				key = ("stream", stream_id)
+				present.add(key)
+				self._departed.discard(stream_id)
+				if self.roster.get(key) is None:
+					logging.info("%s entrou na conferência pelo relay.", member.get("username") or f"Stream {stream_id:08x}")
+				self.roster.add(self.relay_addr[0], self.relay_addr[1], member.get("username"), key=key)
+			for key in self.roster.keys():
+				if key not in present:
+					self.roster.remove(key)
+					self._departed.add(key[1])
+
+	def _join_relay(self):
+		self._last_join = time.monotonic()
+		try:
+			self._send_control({"type": "JOIN", "stream_id": self.stream_id, "username": self.username})
+		except OSError:
+			logging.debug("Falha ao enviar JOIN para o relay %s:%s", *self.relay_addr)
+
+	def _is_self(self, ip, port):
+		return port == self.LOCAL_PORT and ip in (self.LOCAL_IP, self.advertised_ip)
+
+	def _send_control(self, message, addrs=None):
+		with self._tx_lock:
+			packet = Packet.pack_control(message, self._tx_seq, self._tx_ts, self.stream_id)
+		for addr in (self._targets() if addrs is None else addrs):
+			self.sock.sendto(packet, addr)
+
+	# ------ Conferência ------
+	def add_participant(self, ip, port, username=None):
+		"""Adiciona um participante e envia a lista de membros para todos, fechando a malha."""
+		if self.relay_addr is not None:
+			# Atrás do relay o convidado aparece sozinho quando enviar JOIN
+			return True
+		if self.roster.add(ip, port, username) is None:
+			return False
+		self.send_roster()
+		return True
+
+	def send_roster(self):
+		"""Envia a lista de membros para todos; quem não confirmar recebe de novo a cada ROSTER_RETRY."""
+		addrs = self.roster.addresses()
+		with self._roster_lock:
+			self._roster_version += 1
+			self._roster_unacked = {addr: ROSTER_TRIES for addr in addrs}
+			self._last_roster = time.monotonic()
+		self._send_control(self._roster_message(), addrs)
+
+	def _roster_message(self):
+		members = [[self.advertised_ip, self.LOCAL_PORT]] + [[ip, port] for ip, port in self.roster.addresses()]
+		return {"type": "ROSTER", "members": members, "version": self._roster_version}
+
+	def _resend_roster(self):
+		# Perdida ou chegou antes de o convidado abrir a sala: a malha só fecha quando todos confirmarem
+		with self._roster_lock:
+			self._last_roster = time.monotonic()
+			addrs = [addr for addr in self._roster_unacked if self.roster.get(addr) is not None]
+			self._roster_unacked = {addr: self._roster_unacked[addr] - 1 for addr in addrs if self._roster_unacked[addr] > 1}
+		if addrs:
+			self._send_control(self._roster_message(), addrs)
+
+	def list_participants(self):
+		return [{"ip": p.addr[0], "port": p.addr[1], "username": p.username, "stream_id": p.stream_id} for p in self.roster.all()]
 
 	# Função para notificar o outro lado sobre o encerramento
 	def send_hangup_notification(self):
 		try:
-			message = b'{"type":"HANGUP"}'
-			self.sock.sendto(message, (self.REMOTE_IP, self.REMOTE_PORT))
+			self._send_control({"type": "HANGUP"})
 			logging.info("Enviada notificação de HANGUP.")
 		except Exception as e:
 			logging.error(f"Falha ao enviar notificação de HANGUP: {e}")
@@ -120,12 +516,15 @@ class VoipRoom:
 		self.running = False
 		try:
 			self.send_thread.join(timeout=1.0)
-			self.receive_thread.join(timeout=1.0)
+			if self.receive_thread.is_alive():
+				self.receive_thread.join(timeout=1.0)
+			if self.playout_thread.is_alive():
+				self.playout_thread.join(timeout=1.0)
 		except Exception:
 			pass
-		self.input_stream.close()
-		self.output_stream.close()
-		self.audio.terminate()
+		# Os streams voltam parados para o engine e servem à próxima chamada
+		self.audio.release(self.input_stream)
+		self.audio.release(self.output_stream)
 		self.sock.close()
 		logging.info("VoIP encerrado.")
 
@@ -137,6 +536,7 @@ class VoipRoom:
 			return False
 		with self._vol_lock:
 			self._input_volume = value
+			self.input_dsp.gain = value
 		return True
 
 	def set_output_volume(self, percent):
@@ -146,6 +546,16 @@ class VoipRoom:
 			return False
 		with self._vol_lock:
 			self._output_volume = value
+			self.output_dsp.gain = value
+		return True
+
+	def set_muted(self, muted):
+		"""Mudo real: para de enviar mídia. Um último ruído de conforto silencioso avisa o outro lado."""
+		muted = bool(muted)
+		if muted and not self.muted:
+			self._send_comfort_noise(Vad.SILENCE_DBOV)
+			self._in_dtx = True
+		self.muted = muted
 		return True
 
 	def get_volumes(self):
@@ -154,3 +564,28 @@ class VoipRoom:
 				"input": int(round(self._input_volume * 100)),
 				"output": int(round(self._output_volume * 100)),
 			}
+
+	def get_call_stats(self):
+		"""Qualidade da chamada: o que enviamos e, por participante, perda, jitter, RTT, atraso e MOS."""
+		return {
+			"sent": {
+				"packets": self.packets_sent,
+				"octets": self.octets_sent,
+				"bitrate_kbps": round(self.send_bitrate_kbps, 1),
+				"codec": self.codec.name,
+				"frame_ms": round(self.frame_ms, 1),
+			},
+			"participants": {self._label(p): p.quality() for p in self.roster.all()},
+		}
+
+	@staticmethod
+	def _label(participant):
+		if participant.key[0] == "stream":
+			return f"stream:{participant.key[1]:08x}"
+		return f"{participant.addr[0]}:{participant.addr[1]}"
+
+	def get_jitter_stats(self):
+		return {
+			"participants": {self._label(p): p.stats() for p in self.roster.all()},
+			"dtx_frames": self.dtx_frames,
+		}
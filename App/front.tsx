@@ -15,6 +15,9 @@ const VolumeX = ({ className = '' }) => <span className={className}>🔈</span>;
 const ArrowLeft = ({ className = '' }) => <span className={className}>⬅️</span>;
 const ChevronDown = ({ className = '' }) => <span className={className}>▾</span>;
 
+// Nós que só anunciam um relay (Relay.py --announce) não têm porta de controle: não entram na lista de chamada
+const isCallable = (peer) => !!peer.control_port || !peer.relay_port;
+
 const VoiceChatApp = () => {
   const { useEffect, useState, memo } = React;
   const [currentScreen, setCurrentScreen] = React.useState('main');
@@ -31,6 +34,8 @@ const VoiceChatApp = () => {
   const [outputDeviceList, setOutputDeviceList] = React.useState([]); // raw from API
   const [peers, setPeers] = React.useState([]);
   const [pendingOffer, setPendingOffer] = React.useState(null);
+  const [outgoingCall, setOutgoingCall] = React.useState(null);
+  const [offers, setOffers] = React.useState([]);
   const [localInterfaces, setLocalInterfaces] = React.useState([]);
   const [selectedNetwork, setSelectedNetwork] = React.useState('all');
   const [directIp, setDirectIp] = React.useState('');
@@ -77,11 +82,24 @@ const VoiceChatApp = () => {
 
     // Subscribe to peer updates
     let peer_es;
-    const peerUrl = selectedNetwork === 'all' ? `${apiBase}/events/peers` : `${apiBase}/events/peers?network=${encodeURIComponent(selectedNetwork)}`;
+    const peerUrl = selectedNetwork === 'all' ? `${apiBase}/events/peers?deltas=1` : `${apiBase}/events/peers?deltas=1&network=${encodeURIComponent(selectedNetwork)}`;
     try {
       peer_es = new EventSource(peerUrl);
       peer_es.onmessage = (ev) => {
-        try { const list = JSON.parse(ev.data); if (Array.isArray(list)) { setPeers(list); } } catch (e) {}
+        try {
+          const msg = JSON.parse(ev.data);
+          if (Array.isArray(msg)) { setPeers(msg.filter(isCallable)); return; }
+          if (msg && msg.type === 'snapshot' && Array.isArray(msg.items)) { setPeers(msg.items.filter(isCallable)); return; }
+          if (msg && msg.type === 'delta') {
+            // Aplica só o que mudou: remove, substitui no lugar e acrescenta os novos
+            setPeers((prev) => {
+              const removed = new Set(msg.removed || []);
+              const updated = new Map((msg.updated || []).map((p) => [p.id, p]));
+              const next = prev.filter((p) => !removed.has(p.id)).map((p) => updated.get(p.id) || p);
+              return next.concat(msg.added || []).filter(isCallable);
+            });
+          }
+        } catch (e) {}
       };
     } catch (e) {}
 
@@ -94,6 +112,8 @@ const VoiceChatApp = () => {
           const data = JSON.parse(ev.data);
           if (Array.isArray(data.interfaces)) setLocalInterfaces(data.interfaces);
           setPendingOffer(data.pending_offer || null);
+          setOutgoingCall(data.outgoing_call || null);
+          setOffers(Array.isArray(data.offers) ? data.offers : []);
           setActiveCall(data.in_call ? data.current_call : null);
         } catch (e) {}
       };
@@ -324,6 +344,8 @@ const VoiceChatApp = () => {
           setDirectIp={setDirectIp}
           onCallIp={handleCallIp}
           pendingOffer={pendingOffer}
+          outgoingCall={outgoingCall}
+          offers={offers}
           onEndCall={handleEndCall}
           isMuted={isMuted}
           setIsMuted={setIsMuted}
@@ -394,7 +416,7 @@ const PeerList = React.memo(({ peers, onCall, activeCall }) => {
   );
 });
 
-const MainScreen = ({ peers, onCall, activeCall, localInterfaces, selectedNetwork, setSelectedNetwork, showDropdown, setShowDropdown, apiBase, directIp, setDirectIp, onCallIp, pendingOffer, onEndCall, isMuted, setIsMuted, isDeafened, setIsDeafened }) => {
+const MainScreen = ({ peers, onCall, activeCall, localInterfaces, selectedNetwork, setSelectedNetwork, showDropdown, setShowDropdown, apiBase, directIp, setDirectIp, onCallIp, pendingOffer, outgoingCall, offers, onEndCall, isMuted, setIsMuted, isDeafened, setIsDeafened }) => {
   return (
   <div className="flex h-full">
     {/* Left Panel - Peers */}
@@ -448,20 +470,33 @@ const MainScreen = ({ peers, onCall, activeCall, localInterfaces, selectedNetwor
       {/* Active Calls */}
       <div className="mb-8">
         <h2 className="text-2xl font-light text-white mb-6">Active Calls</h2>
-        {pendingOffer && !activeCall ? (
-          <div className="p-6 rounded-xl bg-gray-700/50 border border-yellow-600 mb-4">
+        {outgoingCall && (outgoingCall.state === 'dialing' || outgoingCall.state === 'ringing') ? (
+          <div className="p-6 rounded-xl bg-gray-700/50 border border-blue-600 mb-4">
+            <div className="flex items-center justify-between">
+              <div className="flex items-center gap-4">
+                <div className="w-12 h-12 rounded-full bg-blue-500 flex items-center justify-center"><Phone className="w-6 h-6 text-white" /></div>
+                <span className="text-xl text-white font-medium">{outgoingCall.state === 'ringing' ? 'Ringing' : 'Calling'}: {outgoingCall.remote_ip}</span>
+              </div>
+              <button onClick={async () => { try { await fetch(`${apiBase}/call/cancel`, { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ call_id: outgoingCall.call_id }) }); } catch (e) {} }} className="px-4 py-2 bg-red-600 hover:bg-red-700 rounded text-white">Cancel</button>
+            </div>
+          </div>
+        ) : null}
+        {(offers && offers.length ? offers : (pendingOffer ? [pendingOffer] : [])).map((offer) => (
+          <div key={offer.tid || offer.peer_ip} className="p-6 rounded-xl bg-gray-700/50 border border-yellow-600 mb-4">
             <div className="flex items-center justify-between">
               <div className="flex items-center gap-4">
                 <div className="w-12 h-12 rounded-full bg-yellow-500 flex items-center justify-center"><User className="w-6 h-6 text-white" /></div>
-                <span className="text-xl text-white font-medium">Incoming: {pendingOffer.peer_username || pendingOffer.peer_ip}</span>
+                <span className="text-xl text-white font-medium">{activeCall ? 'Waiting' : 'Incoming'}: {offer.peer_username || offer.peer_ip}</span>
               </div>
               <div className="flex gap-3">
-                <button onClick={async () => { try { await fetch(`${apiBase}/accept`, { method: 'POST' }); } catch (e) {} }} className="px-4 py-2 bg-green-600 hover:bg-green-700 rounded text-white">Accept</button>
-                <button onClick={async () => { try { await fetch(`${apiBase}/reject`, { method: 'POST' }); } catch (e) {} }} className="px-4 py-2 bg-red-600 hover:bg-red-700 rounded text-white">Reject</button>
+                {!activeCall ? (
+                  <button onClick={async () => { try { await fetch(`${apiBase}/accept`, { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ tid: offer.tid }) }); } catch (e) {} }} className="px-4 py-2 bg-green-600 hover:bg-green-700 rounded text-white">Accept</button>
+                ) : null}
+                <button onClick={async () => { try { await fetch(`${apiBase}/reject`, { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ tid: offer.tid }) }); } catch (e) {} }} className="px-4 py-2 bg-red-600 hover:bg-red-700 rounded text-white">Reject</button>
               </div>
             </div>
           </div>
-        ) : null}
+        ))}
         {activeCall ? (
           <div className="p-6 rounded-xl bg-gray-700/50 border border-gray-600">
             <div className="flex items-center justify-between">
@@ -38,17 +38,18 @@ const SettingsPage = () => {
 
 useEffect(() => {
     if (isChangingDevice || !micTestOn) return;
-    const id = setInterval(async () => {
+    // Nível empurrado pelo backend (SSE) a partir da captura da chamada ou de um stream de monitoramento
+    const pos = Number(inputDevicePos);
+    const idx = Number.isFinite(pos) && inputDeviceList[pos] ? Number(inputDeviceList[pos].index) : undefined;
+    const url = Number.isFinite(idx) ? `${apiBase}/events/mic-level?input=${idx}` : `${apiBase}/events/mic-level`;
+    const es = new EventSource(url);
+    es.onmessage = (ev) => {
         try {
-            const pos = Number(inputDevicePos);
-            const idx = Number.isFinite(pos) && inputDeviceList[pos] ? Number(inputDeviceList[pos].index) : undefined;
-            const url = Number.isFinite(idx) ? `${apiBase}/mic-level?input=${idx}` : `${apiBase}/mic-level`;
-            const r = await fetch(url);
-            const d = await r.json();
+            const d = JSON.parse(ev.data);
             if (typeof d.level === 'number') setMicLevel(d.level);
         } catch (e) {}
-    }, 500);
-    return () => clearInterval(id);
+    };
+    return () => { es.close(); setMicLevel(0); };
 }, [inputDevicePos, inputDeviceList, isChangingDevice, micTestOn]);
 
 	return (
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do App são importados sem pacote (como em Main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "App"))
@@ -0,0 +1,71 @@
+import json
+
+import Beacon
+
+
+def _beacon(**kw):
+	return Beacon.encode_beacon("node-1", "Ana", "ana", 38020, ["192.168.1.5/24", "10.0.0.7/8"], **kw)
+
+
+def test_beacon_round_trip():
+	msg = Beacon.decode(_beacon(relay_port=38030, reply=True))
+	assert msg == {
+		"type": "BEACON", "id": "node-1", "name": "Ana", "username": "ana", "control_port": 38020,
+		"nets": ["192.168.1.5/24", "10.0.0.7/8"], "relay_port": 38030, "reply": True,
+	}
+	assert "relay_port" not in Beacon.decode(_beacon())
+
+
+def test_bye_round_trip():
+	assert Beacon.decode(Beacon.encode_bye("node-1")) == {"type": "BYE", "id": "node-1"}
+
+
+def test_long_utf8_name_is_cut_on_a_character_boundary():
+	msg = Beacon.decode(Beacon.encode_beacon("node-1", "ç" * 200, "u", 1))
+	assert msg["name"] == "ç" * 127
+
+
+def test_every_truncation_of_the_base_format_is_rejected():
+	data = _beacon(relay_port=38030)
+	assert Beacon.decode(data) is not None
+	for cut in range(len(data)):
+		assert Beacon.decode(data[:cut]) is None, cut
+
+
+def test_foreign_datagrams_are_rejected():
+	legacy = json.dumps({"type": "BEACON", "id": "x"}).encode()
+	assert not Beacon.is_beacon(legacy)
+	assert Beacon.decode(legacy) is None
+	assert Beacon.decode(b"") is None
+	data = bytearray(_beacon())
+	data[1] = Beacon.VERSION + 1
+	assert Beacon.decode(bytes(data)) is None
+	data[1] = Beacon.VERSION
+	data[2] = 99  # tipo desconhecido
+	assert Beacon.decode(bytes(data)) is None
+	# Id vazio não identifica ninguém
+	assert Beacon.decode(Beacon.encode_beacon("", "a", "b", 1)) is None
+
+
+def test_query_round_trip_with_ttl_and_known():
+	known = [Beacon.peer_hash("node-2"), Beacon.peer_hash("node-3")]
+	data = Beacon.encode_query("node-1", "Ana", "ana", 38020, ["192.168.1.5/24"], ttl=105, known=known)
+	msg = Beacon.decode(data)
+	assert (msg["type"], msg["ttl"], msg["known"]) == ("QUERY", 105, known)
+	assert Beacon.decode(_beacon(ttl=105))["ttl"] == 105
+	assert Beacon.decode(Beacon.encode_query("node-1", "Ana", "ana", 38020))["known"] == []
+
+
+def test_truncated_trailer_is_rejected_or_drops_whole_fields():
+	known = [1, 2]
+	data = Beacon.encode_query("node-1", "Ana", "ana", 38020, ["192.168.1.5/24"], ttl=105, known=known)
+	base = len(Beacon.encode_beacon("node-1", "Ana", "ana", 38020, ["192.168.1.5/24"]))
+	for cut in range(base, len(data)):
+		msg = Beacon.decode(data[:cut])
+		if cut == base:
+			assert "ttl" not in msg and "known" not in msg
+		elif cut == base + 2:
+			assert msg["ttl"] == 105 and "known" not in msg
+		else:
+			# Metade de um campo de 16 bits ou lista de hashes incompleta
+			assert msg is None, cut
@@ -0,0 +1,112 @@
+import math
+import struct
+
+import pytest
+
+import Codec
+
+
+def _tone(samples, rate=Codec.DEVICE_RATE, amplitude=8000, freq=440.0):
+	return struct.pack(f"<{samples}h", *(int(amplitude * math.sin(2 * math.pi * freq * i / rate)) for i in range(samples)))
+
+
+def _samples(pcm):
+	return struct.unpack(f"<{len(pcm) // 2}h", pcm)
+
+
+def _max_error(a, b):
+	return max(abs(x - y) for x, y in zip(_samples(a), _samples(b)))
+
+
+def _mean_error(a, b):
+	pairs = list(zip(_samples(a), _samples(b)))
+	return sum(abs(x - y) for x, y in pairs) / len(pairs)
+
+
+def test_pcm_is_identity():
+	codec = Codec.create("pcm")
+	pcm = _tone(441)
+	assert codec.payload_type == 0
+	assert codec.encode(pcm) == pcm
+	assert codec.decode(codec.encode(pcm)) == pcm
+
+
+@pytest.mark.parametrize("name", ["pcmu", "pcma"])
+def test_g711_round_trip_at_device_rate(name):
+	codec = Codec.create(name, rate=Codec.DEVICE_RATE)
+	pcm = _tone(441)
+	payload = codec.encode(pcm)
+	assert len(payload) == 441  # 8 bits por amostra
+	decoded = codec.decode(payload)
+	assert len(decoded) == len(pcm)
+	# Quantização logarítmica: erro pequeno relativo à amplitude
+	assert _max_error(pcm, decoded) < 300
+
+
+def test_adpcm_round_trip_and_independent_packets():
+	encoder = Codec.create("adpcm")
+	decoder = Codec.create("adpcm")
+	first, second = _tone(441), _tone(441, freq=1000.0)
+	p1, p2 = encoder.encode(first), encoder.encode(second)
+	assert len(p1) == Codec.AdpcmCodec._HEADER.size + (441 + 1) // 2
+	# O segundo pacote carrega o estado do preditor: decodifica mesmo sem o primeiro
+	alone = decoder.decode(p2)
+	assert len(alone) == len(second)
+	# O passo adaptativo leva algumas amostras para convergir: compara o erro médio
+	assert _mean_error(second, alone) < 200
+	assert _mean_error(first, decoder.decode(p1)) < 200
+
+
+def test_g711_defaults_to_8k_and_resamples_back():
+	codec = Codec.create("pcmu")
+	assert codec.rate == 8000
+	assert codec.payload_type == Codec.payload_type_for("pcmu", 8000)
+	pcm = _tone(441 * 4)  # 40 ms a 44.1 kHz
+	payload = codec.encode(pcm)
+	assert abs(len(payload) - 320) <= 2  # ~40 ms a 8 kHz, 1 byte por amostra
+	decoded = codec.decode(payload)
+	# ratecv guarda algumas amostras de estado entre as chamadas
+	assert abs(len(decoded) - len(pcm)) <= 8 * Codec.SAMPLE_WIDTH
+
+
+def test_create_for_payload_type_matches_create():
+	for name in Codec.CODECS:
+		for rate in Codec.RATE_IDS:
+			codec = Codec.create_for_payload_type(Codec.payload_type_for(name, rate))
+			assert (codec.name, codec.rate) == (name, rate)
+	assert Codec.create_for_payload_type(0x3F) is None
+
+
+def test_unknown_codec_and_rate_are_rejected():
+	with pytest.raises(ValueError):
+		Codec.create("opus")
+	with pytest.raises(ValueError):
+		Codec.create("pcm", rate=22050)
+
+
+@pytest.mark.parametrize("payload", [b"", b"\x01", struct.pack("!HhB", 441, 0, 0) + b"\x00" * 10, struct.pack("!HhB", 2, 0, 99) + b"\x00"])
+def test_malformed_adpcm_decodes_to_none(payload):
+	assert Codec.create("adpcm").decode(payload) is None
+
+
+def test_odd_length_pcm_decodes_to_none():
+	assert Codec.create("pcm", rate=16000).decode(b"\x00" * 11) is None
+	assert Codec.create("pcm").decode(b"\x00" * 11) is None
+
+
+def test_malformed_payloads_are_concealed_not_raised():
+	import Conference
+
+	participant = Conference.Participant(("10.0.0.2", 5000), chunk=441)
+	adpcm = Codec.create("adpcm")
+	frames = [
+		(adpcm.payload_type, adpcm.encode(_tone(441))),
+		(adpcm.payload_type, b"\x01"),  # menor que o cabeçalho
+		(Codec.payload_type_for("pcm", 16000), b"\x00" * 161),  # PCM com número ímpar de bytes
+	]
+	for seq, (pt, payload) in enumerate(frames):
+		participant.receive(pt, False, seq, 0, 7, payload)
+	out = [participant.next_frame() for _ in frames]
+	assert all(len(frame) == 441 * Codec.SAMPLE_WIDTH for frame in out)
+	stats = participant.stats()
+	assert (stats["played"], stats["lost"], stats["concealed"]) == (1, 2, 2)
@@ -0,0 +1,137 @@
+import json
+
+import pytest
+
+import Discovery
+
+CALLER = ("10.0.0.2", 38020)
+OTHER = ("10.0.0.3", 38020)
+
+
+class FakeSocket:
+
+	def __init__(self):
+		self.sent = []
+
+	def sendto(self, data, addr):
+		self.sent.append((json.loads(data.decode("utf-8")), addr))
+
+
+class Clock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	c = Clock()
+	monkeypatch.setattr(Discovery.time, "monotonic", c)
+	monkeypatch.setattr(Discovery, "select_local_ip_for_peer", lambda ip: "10.0.0.1")
+	return c
+
+
+def _server(**kwargs):
+	updates = []
+	server = Discovery.ControlServer(0, on_update=lambda: updates.append(1), **kwargs)
+	server._sock = FakeSocket()
+	return server, updates
+
+
+def _offer(server, tid, addr=CALLER, username="ana"):
+	server._handle_message({"type": "OFFER", "tid": tid, "username": username, "caller_media_port": 40000}, addr)
+	return server._sock.sent[-1][0]["type"]
+
+
+def test_offer_rings_and_retransmission_is_deduplicated(clock):
+	server, updates = _server()
+	assert _offer(server, "t1") == "RINGING"
+	clock.now += 1
+	assert _offer(server, "t1") == "RINGING"
+	assert server.duplicates == 1
+	assert [o["tid"] for o in server.list_offers()] == ["t1"]
+	assert server.offers["t1"]["last_seen"] == clock.now
+	assert len(updates) == 1  # a retransmissão não avisa de novo
+
+
+def test_busy_above_capacity_and_repeated_to_retransmissions(clock):
+	capacity = [1]
+	server, _updates = _server(capacity_fn=lambda: capacity[0])
+	assert _offer(server, "t1") == "RINGING"
+	assert _offer(server, "t2", addr=OTHER, username="bia") == "BUSY"
+	capacity[0] = 3
+	# A mesma transação continua BUSY mesmo que a capacidade tenha aumentado
+	assert _offer(server, "t2", addr=OTHER, username="bia") == "BUSY"
+	assert server.busy_replies == 1
+	assert list(server.offers) == ["t1"]
+
+
+def test_max_pending_caps_capacity(clock):
+	server, _updates = _server(max_pending=2, capacity_fn=lambda: 10)
+	assert _offer(server, "t1", username="a") == "RINGING"
+	assert _offer(server, "t2", username="b") == "RINGING"
+	assert _offer(server, "t3", username="c") == "BUSY"
+
+
+def test_new_attempt_from_same_caller_replaces_the_old_offer(clock):
+	server, _updates = _server()
+	_offer(server, "t1")
+	_offer(server, "t2")
+	assert list(server.offers) == ["t2"]
+	assert server.pending_offer["tid"] == "t2"
+
+
+def test_cancel_removes_offer_and_late_offer_gets_reject(clock):
+	server, updates = _server()
+	_offer(server, "t1")
+	server._handle_message({"type": "CANCEL", "tid": "t1"}, CALLER)
+	assert server.offers == {}
+	assert server._sock.sent[-1] == ({"type": "REJECT", "tid": "t1"}, CALLER)
+	assert len(updates) == 2
+	# Retransmissão atrasada da oferta não volta a tocar
+	assert _offer(server, "t1") == "REJECT"
+	assert server.offers == {}
+	# CANCEL de transação desconhecida não faz nada
+	server._handle_message({"type": "CANCEL", "tid": "nope"}, CALLER)
+	assert len(updates) == 2
+
+
+def test_reject_pending_takes_the_oldest(clock):
+	server, _updates = _server()
+	_offer(server, "t1", username="a")
+	_offer(server, "t2", addr=OTHER, username="b")
+	assert server.reject_pending() is True
+	assert list(server.offers) == ["t2"]
+	assert server.reject_pending("missing") is False
+
+
+def test_idle_offer_expires_and_transactions_are_forgotten(clock):
+	server, updates = _server()
+	_offer(server, "t1")
+	clock.now += Discovery.OFFER_IDLE_TIMEOUT + 1
+	server._expire()
+	assert server.offers == {}
+	assert len(updates) == 2
+	clock.now += Discovery.TRANSACTION_TTL
+	server._expire()
+	assert server._transactions == {}
+	assert _offer(server, "t1") == "RINGING"
+
+
+def test_accept_answers_with_media_port_and_repeats_it(clock):
+	class Mux:
+		port = 38020
+
+	server, updates = _server(mux=Mux())
+	_offer(server, "t1")
+	accepted = server.accept_pending("t1")
+	assert (accepted["peer_ip"], accepted["peer_media_port"], accepted["my_media_port"]) == ("10.0.0.2", 40000, 38020)
+	assert accepted["media_socket"] is None
+	assert server._sock.sent[-1][0]["type"] == "ACCEPT"
+	assert server.offers == {}
+	# ACCEPT perdido: a retransmissão da oferta recebe o mesmo ACCEPT
+	assert _offer(server, "t1") == "ACCEPT"
+	assert server.accept_pending() is None
+	assert len(updates) == 2
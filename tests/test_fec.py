@@ -0,0 +1,96 @@
+import Fec
+import Jitter
+import Packet
+
+GROUP = 4
+
+
+def _frame(seq):
+	return bytes([seq]) * (8 + seq % 3)
+
+
+def _replay(schedule, ticks):
+	"""Entrega os pacotes no tick marcado e reproduz um quadro por tick. Devolve (reproduzidos, reconstruídos, decoder)."""
+	encoder = Fec.FecEncoder(GROUP)
+	decoder = Fec.FecDecoder()
+	jitter = Jitter.JitterBuffer(frame_ms=20, initial_frames=3)
+	packets = {}
+	for seq in range(max(s for _t, _k, s in schedule if _k == "media") + 1):
+		packets[("media", seq)] = _frame(seq)
+		parity = encoder.add(seq, Packet.PT_PCM, seq * 160, _frame(seq))
+		if parity is not None:
+			packets[("fec", parity[0])] = parity[1]
+	rebuilt = []
+
+	def recover(seq):
+		recovered = decoder.recover(seq)
+		if recovered is None:
+			return None
+		rebuilt.append(seq)
+		assert recovered[3] == _frame(seq)
+		assert recovered[2] == seq * 160
+		return recovered[3]
+
+	played = []
+	for tick in range(ticks):
+		for _t, kind, seq in [a for a in schedule if a[0] == tick]:
+			data = packets[(kind, seq)]
+			if kind == "media":
+				jitter.put(seq, data, measure=False)
+				decoder.add_media(seq, Packet.PT_PCM, seq * 160, data)
+			else:
+				decoder.add_parity(seq, data)
+		payload = jitter.get(recover=recover)
+		if payload is not None:
+			played.append(payload[0])
+	return played, rebuilt, decoder
+
+
+def _trace():
+	# Cada quadro chega no tick igual à sua sequência e é reproduzido 3 ticks depois; a paridade vai com o último do grupo
+	schedule = []
+	for seq in range(28):
+		schedule.append((seq, "media", seq))
+		if seq % GROUP == GROUP - 1:
+			schedule.append((seq, "fec", seq - GROUP + 1))
+	def move(kind, seq, tick):
+		schedule.remove(next(a for a in schedule if a[1:] == (kind, seq)))
+		if tick is not None:
+			schedule.append((tick, kind, seq))
+	move("media", 2, 3)  # fora de ordem, depois da paridade, mas antes do prazo: não é recuperação
+	move("media", 5, None)  # perdido sozinho no grupo: reconstruído
+	move("media", 9, None)
+	move("media", 10, None)  # dois perdidos no mesmo grupo: sem reconstrução
+	move("media", 13, 17)  # chega depois do prazo (tick 16): reconstruído, mas o original desconta
+	move("media", 19, None)
+	move("fec", 16, 30)  # paridade chega depois do prazo do quadro perdido
+	schedule.sort(key=lambda a: (a[0], a[1] == "media"))  # paridade antes da mídia no mesmo tick
+	return schedule
+
+
+def test_recovers_only_frames_missing_at_their_deadline():
+	played, rebuilt, decoder = _replay(_trace(), ticks=27)
+	assert rebuilt == [5, 13]
+	assert played == [s for s in range(24) if s not in (9, 10, 19)]
+	# O 13 chegou depois: só o 5 era perda de verdade
+	assert decoder.recovered == 1
+
+
+def test_reordered_frame_is_not_recovered():
+	schedule = [(0, "media", 0), (0, "media", 1), (0, "media", 3), (0, "fec", 0), (1, "media", 2)]
+	schedule += [(t, "media", s) for t, s in ((2, 4), (3, 5), (4, 6))]
+	played, rebuilt, decoder = _replay(schedule, ticks=5)
+	assert played[:4] == [0, 1, 2, 3]
+	assert rebuilt == []
+	assert decoder.recovered == 0
+
+
+def test_decoder_ignores_media_until_parity_seen():
+	decoder = Fec.FecDecoder()
+	decoder.add_media(0, Packet.PT_PCM, 0, b"abc")
+	assert decoder.recover(1) is None
+	assert decoder.recovered == 0
+
+
+def test_encoder_disabled_below_two():
+	assert Fec.FecEncoder(1).add(0, Packet.PT_PCM, 0, b"x") is None
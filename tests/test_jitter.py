@@ -0,0 +1,91 @@
+from Jitter import JitterBuffer
+
+FRAME_MS = 20.0
+
+
+def _put(buf, seq, payload=None):
+	# Chegada exatamente no ritmo da mídia: jitter zero
+	return buf.put(seq, payload if payload is not None else seq, arrival=seq * FRAME_MS / 1000.0)
+
+
+def _drain(buf, count, recover=None):
+	return [buf.get(recover=recover) for _ in range(count)]
+
+
+def test_prebuffers_then_plays_in_sequence_order():
+	buf = JitterBuffer(FRAME_MS, initial_frames=3)
+	for seq in (2, 0):
+		_put(buf, seq)
+	assert buf.get() is None  # ainda abaixo do alvo
+	_put(buf, 1)
+	assert _drain(buf, 3) == [0, 1, 2]
+	assert buf.played == 3
+
+
+def test_late_and_duplicate_frames_are_refused():
+	buf = JitterBuffer(FRAME_MS, initial_frames=1)
+	_put(buf, 0)
+	_put(buf, 1)
+	assert buf.get() == 0
+	assert _put(buf, 0) is False  # já passou do ponto de reprodução
+	assert _put(buf, 1) is False  # ainda no buffer
+	stats = buf.stats()
+	assert (stats["late"], stats["duplicates"], stats["received"]) == (1, 1, 4)
+
+
+def test_gap_counts_as_lost_unless_recovered():
+	buf = JitterBuffer(FRAME_MS, initial_frames=1)
+	for seq in (0, 2, 4):
+		_put(buf, seq)
+	asked = []
+
+	def recover(seq):
+		asked.append(seq)
+		return "fec" if seq == 1 else None
+
+	assert _drain(buf, 5, recover) == [0, "fec", 2, None, 4]
+	assert asked == [1, 3]
+	assert (buf.played, buf.lost) == (4, 1)
+
+
+def test_underrun_counted_once_and_not_during_silence():
+	buf = JitterBuffer(FRAME_MS, initial_frames=1)
+	_put(buf, 0)
+	assert buf.get() == 0
+	assert buf.get() is None
+	assert buf.get() is None  # ainda re-bufferizando, não conta de novo
+	assert buf.underruns == 1
+	_put(buf, 1)
+	assert buf.get() == 1
+	buf.mark_silence()
+	assert buf.get() is None
+	assert buf.underruns == 1
+
+
+def test_overflow_drops_oldest_frame():
+	buf = JitterBuffer(FRAME_MS, min_frames=1, max_frames=4, initial_frames=1, capacity=6)
+	for seq in range(7):
+		_put(buf, seq)
+	assert buf.dropped == 1
+	assert buf.depth == 6
+	# Acima de alvo + 2 a leitura também descarta o mais antigo para reduzir a latência
+	assert buf.get() == 2
+	assert buf.dropped == 2
+
+
+def test_jitter_grows_target_immediately():
+	buf = JitterBuffer(FRAME_MS, initial_frames=1, max_frames=25)
+	# Chegadas alternando 0 e 60 ms de atraso
+	for seq in range(20):
+		buf.put(seq, seq, arrival=(seq * FRAME_MS + (60 if seq % 2 else 0)) / 1000.0)
+	assert buf.target_frames > 1
+	assert buf.stats()["jitter_ms"] > 0
+
+
+def test_reset_forgets_position():
+	buf = JitterBuffer(FRAME_MS, initial_frames=1)
+	_put(buf, 10)
+	assert buf.get() == 10
+	buf.reset()
+	_put(buf, 3)
+	assert buf.get() == 3
@@ -0,0 +1,63 @@
+import Packet
+
+
+def test_pack_unpack_round_trip():
+	data = Packet.pack(Packet.PT_PCM, 70000, (1 << 32) + 5, 0xDEADBEEF, b"abc", marker=True, level=Packet.level_byte(-20))
+	pt, marker, seq, ts, stream_id, level, payload = Packet.unpack(data)
+	assert (pt, marker, seq, ts, stream_id, level) == (Packet.PT_PCM, True, 70000 % Packet.SEQ_MOD, 5, 0xDEADBEEF, 20)
+	assert bytes(payload) == b"abc"
+	assert len(data) == Packet.HEADER_SIZE + 3
+
+
+def test_unpack_rejects_foreign_and_short_datagrams():
+	assert Packet.unpack(b"") is None
+	assert Packet.unpack(b"{\"type\": \"OFFER\"}") is None
+	assert Packet.unpack(Packet.pack(Packet.PT_PCM, 1, 1, 1, b"")[:Packet.HEADER_SIZE - 1]) is None
+
+
+def test_level_byte_clamps():
+	assert Packet.level_byte(None) == Packet.LEVEL_SILENT
+	assert Packet.level_byte(3.0) == 0
+	assert Packet.level_byte(-200) == Packet.LEVEL_SILENT
+	assert Packet.level_byte(-19.6) == 20
+
+
+def test_control_round_trip_and_garbage():
+	data = Packet.pack_control({"type": "HANGUP"}, 1, 2, 3)
+	packet = Packet.unpack(data)
+	assert packet[0] == Packet.PT_CONTROL
+	assert Packet.parse_control(packet[6]) == {"type": "HANGUP"}
+	assert Packet.parse_control(b"\xff\xfe") is None
+	assert Packet.parse_control(b"[1, 2]") is None
+
+
+def test_unwrapper_crosses_wrap_and_keeps_late_packets_behind():
+	u = Packet.Unwrapper(16)
+	assert u.unwrap(65534) == 65534
+	assert u.unwrap(65535) == 65535
+	assert u.unwrap(1) == 65537  # atravessou o wrap
+	assert u.unwrap(0) == 65536  # atrasado: fica atrás sem mover a referência
+	assert u.unwrap(2) == 65538
+	assert u.extend(65535) == 65535
+	assert u.unwrap(3) == 65539
+
+
+def test_unwrapper_extend_does_not_move_reference():
+	u = Packet.Unwrapper(32)
+	assert u.extend(10) == 10  # sem referência: valor como veio
+	u.unwrap(100)
+	assert u.extend(90) == 90
+	assert u.extend(120) == 120
+	assert u.unwrap(101) == 101
+	u.reset()
+	assert u.unwrap(5) == 5
+
+
+def test_packet_pool_reuses_slots_and_copies_oversized():
+	pool = Packet.PacketPool(4, 8)
+	first = pool.store(1, b"aaaa")
+	assert bytes(first) == b"aaaa"
+	pool.store(5, b"bbbb")  # mesmo slot 4 quadros depois
+	assert bytes(first) == b"bbbb"
+	big = pool.store(2, b"x" * 9)
+	assert isinstance(big, bytes) and big == b"x" * 9
@@ -0,0 +1,87 @@
+import json
+import time
+
+from Publisher import Publisher
+
+
+class State:
+	def __init__(self):
+		self.peers = []
+		self.reads = 0
+
+	def __call__(self, net=None):
+		self.reads += 1
+		return [p for p in self.peers if net is None or p["net"] == net]
+
+
+def _drain(q):
+	out = []
+	while not q.empty():
+		out.append(json.loads(q.get_nowait()))
+	return out
+
+
+def test_full_and_delta_subscribers():
+	state = State()
+	state.peers = [{"id": "a", "net": 1}]
+	pub = Publisher(state, key="id", window=0)
+	full = pub.subscribe()
+	deltas = pub.subscribe(deltas=True)
+	assert _drain(full) == [[{"id": "a", "net": 1}]]
+	assert _drain(deltas) == [{"type": "snapshot", "version": 1, "items": [{"id": "a", "net": 1}]}]
+
+	state.peers = [{"id": "a", "net": 2}, {"id": "b", "net": 1}]
+	pub.notify()
+	state.peers = [{"id": "b", "net": 1}]
+	pub.notify()
+	assert _drain(full) == [[{"id": "a", "net": 2}, {"id": "b", "net": 1}], [{"id": "b", "net": 1}]]
+	assert _drain(deltas) == [
+		{"type": "delta", "version": 2, "added": [{"id": "b", "net": 1}], "updated": [{"id": "a", "net": 2}], "removed": []},
+		{"type": "delta", "version": 3, "added": [], "updated": [], "removed": ["a"]},
+	]
+
+
+def test_unchanged_state_is_not_published():
+	state = State()
+	pub = Publisher(state, key="id", window=0)
+	q = pub.subscribe()
+	_drain(q)
+	pub.notify()
+	pub.notify()
+	assert q.empty()
+	assert (pub.unchanged, pub.published) == (2, 0)
+
+
+def test_views_are_filtered_and_independent():
+	state = State()
+	state.peers = [{"id": "a", "net": 1}, {"id": "b", "net": 2}]
+	pub = Publisher(state, key="id", window=0)
+	one = pub.subscribe(view=1)
+	two = pub.subscribe(view=2, deltas=True)
+	assert _drain(one) == [[{"id": "a", "net": 1}]]
+	_drain(two)
+	state.peers.append({"id": "c", "net": 2})
+	pub.notify()
+	assert one.empty()  # nada mudou na rede 1
+	assert _drain(two)[0]["added"] == [{"id": "c", "net": 2}]
+	pub.unsubscribe(one)
+	pub.unsubscribe(two)
+	assert pub._views == {}
+
+
+def test_burst_is_coalesced_into_one_read():
+	state = State()
+	pub = Publisher(state, key="id", window=0.05)
+	q = pub.subscribe()
+	_drain(q)
+	reads = state.reads
+	for i in range(10):
+		state.peers = state.peers + [{"id": str(i), "net": 1}]
+		pub.notify()
+	published = json.loads(q.get(timeout=2.0))
+	assert len(published) == 10
+	time.sleep(0.1)
+	assert q.empty()
+	assert pub.flushes == 1
+	assert state.reads == reads + 1
+	pub.stop()
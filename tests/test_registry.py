@@ -0,0 +1,109 @@
+import pytest
+
+import Discovery
+from Discovery import PeerRegistry, PEER_JOIN, PEER_LEAVE, PEER_UPDATE
+
+
+class Clock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	c = Clock()
+	monkeypatch.setattr(Discovery.time, "monotonic", c)
+	return c
+
+
+def _upsert(reg, peer_id, name="peer", ttl=None):
+	return reg.upsert_peer(peer_id, "10.0.0.2", 38020, name, ttl=ttl)
+
+
+def test_events_and_versions(clock):
+	reg = PeerRegistry("self", ttl=10)
+	events = []
+	reg.subscribe(events.append)
+	assert _upsert(reg, "a") is True
+	assert _upsert(reg, "a") is False  # beacon igual: sem evento nem versão nova
+	_upsert(reg, "a", name="renamed")
+	assert _upsert(reg, "self") is False  # o próprio nó nunca entra
+	assert reg.remove_peer("a") is True
+	assert reg.remove_peer("a") is False
+	assert [(e.kind, e.peer["display_name"], e.version) for e in events] == [
+		(PEER_JOIN, "peer", 1),
+		(PEER_UPDATE, "renamed", 2),
+		(PEER_LEAVE, "renamed", 3),
+	]
+
+
+def test_snapshot_reused_until_version_changes(clock):
+	reg = PeerRegistry("self", ttl=10)
+	_upsert(reg, "a")
+	first = reg.snapshot()
+	_upsert(reg, "a")
+	assert reg.snapshot() is first
+	_upsert(reg, "b")
+	assert {p["id"] for p in reg.snapshot()} == {"a", "b"}
+
+
+def test_expiry_respects_touch_and_keeps_one_heap_entry(clock):
+	reg = PeerRegistry("self", ttl=10)
+	events = []
+	reg.subscribe(events.append)
+	_upsert(reg, "a")
+	for _ in range(5):
+		clock.now += 8
+		assert reg.touch("a")
+		reg.expire()
+	assert [p["id"] for p in reg.snapshot()] == ["a"]
+	assert len(reg._heap) == 1
+	clock.now += 10
+	reg.expire()
+	assert reg.snapshot() == ()
+	assert events[-1].kind == PEER_LEAVE
+	assert reg._heap == [] and reg._queued == {}
+	assert reg.touch("a") is False
+
+
+def test_per_peer_ttl(clock):
+	reg = PeerRegistry("self", ttl=10)
+	_upsert(reg, "short", ttl=2)
+	_upsert(reg, "long", ttl=60)
+	clock.now += 11
+	assert [p["id"] for p in reg.snapshot()] == ["long"]
+	clock.now += 50
+	assert reg.snapshot() == ()
+
+
+def test_bye_then_rejoin_leaves_single_heap_entry(clock):
+	reg = PeerRegistry("self", ttl=10)
+	_upsert(reg, "a")
+	reg.remove_peer("a")
+	clock.now += 1
+	assert _upsert(reg, "a") is True
+	assert len(reg._heap) == 1
+	# O prazo antigo vence antes do novo: o peer continua até o prazo do novo beacon
+	clock.now += 9.5
+	assert [p["id"] for p in reg.snapshot()] == ["a"]
+	assert len(reg._heap) == 1
+	clock.now += 1
+	assert reg.snapshot() == ()
+	assert reg._heap == [] and reg._queued == {}
+
+
+def test_subscriber_errors_do_not_break_others(clock):
+	reg = PeerRegistry("self")
+	seen = []
+
+	def broken(_event):
+		raise RuntimeError("boom")
+
+	reg.subscribe(broken)
+	reg.subscribe(seen.append)
+	_upsert(reg, "a")
+	reg.unsubscribe(broken)
+	assert [e.kind for e in seen] == [PEER_JOIN]
@@ -0,0 +1,133 @@
+import Packet
+import Relay
+
+A = ("10.0.0.1", 5000)
+B = ("10.0.0.2", 5000)
+C = ("10.0.0.3", 5000)
+
+
+class FakeSocket:
+
+	def __init__(self):
+		self.sent = []
+
+	def sendto(self, data, addr):
+		self.sent.append((bytes(data), addr))
+
+
+def _relay(**kwargs):
+	relay = Relay.RelayServer(**kwargs)
+	relay._sock = FakeSocket()
+	return relay
+
+
+def _join(relay, addr, now, stream_id=1):
+	relay.handle(Packet.pack_control({"type": "JOIN", "stream_id": stream_id, "username": str(addr)}, 0, 0, 0), addr, now=now)
+
+
+def _media(level, seq=0):
+	return Packet.pack(Packet.PT_PCM, seq, 0, 7, b"\x00" * 32, level=level)
+
+
+def _controls(relay, kind):
+	out = []
+	for data, addr in relay._sock.sent:
+		packet = Packet.unpack(data)
+		if packet[0] == Packet.PT_CONTROL and Packet.parse_control(packet[6]).get("type") == kind:
+			out.append((Packet.parse_control(packet[6]), addr))
+	return out
+
+
+def test_join_publishes_members_to_everyone():
+	relay = _relay()
+	_join(relay, A, 0.0, 1)
+	_join(relay, B, 0.0, 2)
+	last = [m for m, addr in _controls(relay, "MEMBERS")][-2:]
+	assert all([x["stream_id"] for x in m["members"]] == [1, 2] for m in last)
+	assert relay.stats()["participants"] == 2
+
+
+def test_forwards_only_top_k_speakers():
+	relay = _relay(top_k=1)
+	for addr in (A, B, C):
+		_join(relay, addr, 0.0)
+	relay._sock.sent.clear()
+	relay.handle(_media(level=10), A, now=1.0)  # -10 dBov: mais alto
+	relay.handle(_media(level=40), B, now=1.0)
+	forwarded = [(addr, data) for data, addr in relay._sock.sent]
+	assert sorted(addr for addr, _d in forwarded) == [B, C]
+	assert relay.forwarded == 2
+
+
+def test_ignores_media_from_non_members():
+	relay = _relay()
+	relay.handle(_media(level=10), A, now=0.0)
+	assert relay._sock.sent == []
+
+
+def test_hangup_removes_member():
+	relay = _relay()
+	_join(relay, A, 0.0)
+	_join(relay, B, 0.0)
+	relay.handle(Packet.pack_control({"type": "HANGUP"}, 0, 0, 0), A, now=1.0)
+	assert relay.stats()["participants"] == 1
+
+
+def test_idle_member_expires_while_others_keep_sending():
+	relay = _relay(idle_timeout=2.0, top_k=3)
+	_join(relay, A, 0.0)
+	_join(relay, B, 0.0)
+	# B some sem HANGUP; A continua falando e o tick roda a cada pacote
+	now = 0.0
+	while now < 5.0:
+		relay.handle(_media(level=20), A, now=now)
+		relay.tick(now)
+		now += 0.02
+	assert relay.stats()["participants"] == 1
+	relay._sock.sent.clear()
+	relay.handle(_media(level=20), A, now=now)
+	assert [addr for _d, addr in relay._sock.sent] == []
+
+
+def test_tick_runs_expiry_on_interval():
+	relay = _relay(idle_timeout=1.0)
+	_join(relay, A, 0.0)
+	relay.tick(0.5)
+	assert relay.stats()["participants"] == 1
+	relay.tick(1.2)  # antes do próximo prazo da verificação (0.5 + EXPIRE_INTERVAL)
+	assert relay.stats()["participants"] == 1
+	relay.tick(0.5 + Relay.EXPIRE_INTERVAL)
+	assert relay.stats()["participants"] == 0
+
+
+def test_elect_prefers_choice_then_lowest_id():
+	peers = [{"id": "b", "ip": "1", "relay_port": 9}, {"id": "a", "ip": "2", "relay_port": 8}, {"id": "0", "ip": "3"}]
+	assert Relay.elect(peers) == {"id": "a", "ip": "2", "port": 8}
+	assert Relay.elect(peers, preferred={"id": "x"}) == {"id": "x"}
+	assert Relay.elect([{"id": "a"}]) is None
+
+
+def test_relay_only_announcer_is_an_election_candidate_not_a_callable_peer(monkeypatch):
+	import Beacon
+	import Discovery
+
+	class FakeMux:
+
+		def __init__(self):
+			self.sent = []
+
+		def sendto(self, data, addr):
+			self.sent.append(addr)
+
+	monkeypatch.setattr(Discovery, "get_local_ipv4_interfaces", lambda: [])
+	mux = FakeMux()
+	service = Discovery.DiscoveryService("self", mux=mux)
+	# Relay.py --announce: porta de controle 0 e só a porta do relay
+	service._handle_datagram(Beacon.encode_beacon("relay", "Concord Relay", "Concord Relay", 0, relay_port=39000), "10.0.0.9")
+	service._handle_datagram(Beacon.encode_beacon("peer", "Ana", "ana", 38020), "10.0.0.2")
+	assert [p["id"] for p in service.get_peers()] == ["peer"]
+	assert service.get_peers() is service.get_peers()  # reaproveitado até o registro mudar
+	assert [p["id"] for p in service.get_relays()] == ["relay"]
+	assert Relay.elect(service.get_relays()) == {"id": "relay", "ip": "10.0.0.9", "port": 39000}
+	# O beacon de resposta só vai para quem tem porta de controle
+	assert mux.sent == [("10.0.0.2", 38020)]